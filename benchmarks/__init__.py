@@ -0,0 +1,4 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of scriba decision passes, see benchmarks.run."""
@@ -0,0 +1,87 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Generate synthetic game states in the farnsworth database."""
+
+from __future__ import absolute_import, unicode_literals
+
+import random
+
+from farnsworth.models import (ChallengeBinaryNode,
+                               ChallengeSet,
+                               ChallengeSetFielding,
+                               Exploit,
+                               IDSRule,
+                               Job,
+                               PatchScore,
+                               PatchType,
+                               PollFeedback,
+                               Round,
+                               Team)
+
+PERF_SCORE = {
+    'score': {
+        'ref': {'task_clock': 1.0, 'rss': 1.0, 'flt': 1.0, 'file_size': 1.0},
+        'rep': {'task_clock': 1.1, 'rss': 1.1, 'flt': 1.1, 'file_size': 1.1},
+    }
+}
+
+
+def generate(teams=7, cses=30, patch_types=5, exploits=3, rounds=5, seed=0, blob_size=8192):
+    """
+    Fill the database with a game of rounds rounds: our team and teams - 1
+    opponents, cses ChallengeSets fielded from the first round on, each with
+    an original CBN, one patched CBN per patch type, poll feedback for every
+    round and exploits exploits. CBN blobs are up to blob_size bytes.
+    Returns the last round.
+    """
+    rng = random.Random(seed)
+
+    try:
+        our = Team.get_our()
+    except Team.DoesNotExist:
+        our = Team.create(name=Team.OUR_NAME)
+    opponents = [Team.create(name='bench_team_%d' % i) for i in range(teams - 1)]
+
+    pts = [PatchType.create(name='bench_pt_%d' % i,
+                            functionality_risk=rng.random(),
+                            exploitability=rng.random())
+           for i in range(patch_types)]
+
+    challenge_sets = []
+    for i in range(cses):
+        cs = ChallengeSet.create(name='bench_cs_%d' % i)
+        original = ChallengeBinaryNode.create(cs=cs, name='%s_orig' % cs.name,
+                                              blob=b'X' * rng.randint(blob_size // 8, blob_size))
+        for pt in pts:
+            ids = IDSRule.create(cs=cs, rules='')
+            ChallengeBinaryNode.create(cs=cs, name='%s_%s' % (cs.name, pt.name),
+                                       blob=b'Y' * rng.randint(blob_size // 8, blob_size),
+                                       patch_type=pt, ids_rule=ids)
+        for _ in range(exploits):
+            job = Job.create(cs=cs, worker='rex')
+            Exploit.create(cs=cs, job=job, pov_type='type1', method='rop',
+                           blob=b'Z', c_code='', reliability=rng.random())
+        challenge_sets.append((cs, original))
+
+    round_ = None
+    for num in range(rounds):
+        round_ = Round.create(num=num)
+        for cs, original in challenge_sets:
+            cs.seen_in_round(round_)
+            for team in [our] + opponents:
+                feedback = None
+                if team is our:
+                    feedback = PollFeedback.create(cs=cs, round=round_,
+                                                   success=rng.uniform(0.8, 1.0), timeout=0,
+                                                   connect=0, function=0,
+                                                   time_overhead=rng.uniform(0, 0.2),
+                                                   memory_overhead=rng.uniform(0, 0.2))
+                ChallengeSetFielding.create(cs=cs, cbns=[original], team=team,
+                                            available_round=round_, poll_feedback=feedback)
+            if num == 0:
+                for pt in pts:
+                    PatchScore.create(cs=cs, patch_type=pt, num_polls=10,
+                                      has_failed_polls=False, failed_polls=0,
+                                      round=round_, perf_score=PERF_SCORE)
+    return round_
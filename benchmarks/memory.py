@@ -0,0 +1,104 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Peak RSS of scriba decision passes, with and without CBN blobs.
+
+    python -m benchmarks.memory --env .env.test --cses 40 --blob-size 1048576
+
+Generates a synthetic game (wiping the database!) unless --replay is
+given, then runs the same passes in one fresh process per loading mode,
+SCRIBA_CBN_METADATA_ONLY=0 and 1, and reports how much the resident set
+grew while they ran.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+MODES = (('full', '0'), ('metadata', '1'))
+
+
+def peak_rss_kb():
+    """Peak resident set of this process, in kB on Linux."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(options):
+    """Run the passes in this process, print the peak RSS as JSON."""
+    load_dotenv(options.env)
+    import farnsworth.config
+    from farnsworth.models import Round
+
+    from benchmarks.run import run_passes
+    from scriba.instrumentation import Instrumentation
+
+    database = farnsworth.config.master_db
+    database.set_autocommit(False)
+    rounds = list(Round.select().order_by(Round.num.desc()).limit(options.rounds))[::-1]
+
+    before = peak_rss_kb()
+    start = time.time()
+    run_passes(rounds, options.passes, Instrumentation(enabled=False), database)
+    json.dump({'before_kb': before, 'peak_kb': peak_rss_kb(),
+               'seconds': time.time() - start}, sys.stdout)
+    return 0
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Peak RSS of scriba decision passes")
+    parser.add_argument('--env', default=os.path.join(os.path.dirname(__file__), '../.env.test'),
+                        help="dotenv file with the database settings")
+    parser.add_argument('--replay', action='store_true',
+                        help="run against the rounds already in the database")
+    parser.add_argument('--teams', type=int, default=7)
+    parser.add_argument('--cses', type=int, default=30)
+    parser.add_argument('--patch-types', type=int, default=5)
+    parser.add_argument('--blob-size', type=int, default=1024 * 1024,
+                        help="largest CBN blob to generate, in bytes")
+    parser.add_argument('--rounds', type=int, default=3,
+                        help="rounds to generate, or latest rounds to replay")
+    parser.add_argument('--passes', type=int, default=3, help="passes per round")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+
+    if options.child:
+        return child(options)
+
+    if not options.replay:
+        load_dotenv(options.env)
+        import farnsworth
+        import farnsworth.config
+        from benchmarks.gamestate import generate
+
+        farnsworth.drop_tables()
+        farnsworth.create_tables()
+        with farnsworth.config.master_db.atomic():
+            generate(teams=options.teams, cses=options.cses, patch_types=options.patch_types,
+                     rounds=options.rounds, seed=options.seed, blob_size=options.blob_size)
+
+    print('%-10s %12s %12s %12s %10s' % ('mode', 'before kB', 'peak kB', 'growth kB', 'seconds'))
+    for mode, metadata_only in MODES:
+        env = dict(os.environ, SCRIBA_CBN_METADATA_ONLY=metadata_only)
+        output = subprocess.check_output([sys.executable, '-m', 'benchmarks.memory', '--child',
+                                          '--env', options.env,
+                                          '--rounds', str(options.rounds),
+                                          '--passes', str(options.passes)], env=env)
+        result = json.loads(output.strip().splitlines()[-1])
+        print('%-10s %12d %12d %12d %10.2f' % (mode, result['before_kb'], result['peak_kb'],
+                                                result['peak_kb'] - result['before_kb'],
+                                                result['seconds']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
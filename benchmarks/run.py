@@ -0,0 +1,132 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark scriba decision passes.
+
+    python -m benchmarks.run --env .env.bench --teams 7 --cses 40
+    python -m benchmarks.run --env .env.replay --replay --rounds 3
+
+Without --replay the database is wiped and filled with a synthetic game.
+With --replay the passes run against whatever the database holds, e.g. a
+restored dump of a real game. The writes of every pass are rolled back,
+so passes are repeatable and a replayed dump is left untouched.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    return values[max(int(math.ceil(pct / 100. * len(values))) - 1, 0)]
+
+
+def report(records, out):
+    by_span = defaultdict(list)
+    for record in records:
+        by_span[record['span']].append(record)
+
+    out.write('%-32s %6s %10s %10s %10s %10s %10s\n' %
+              ('span', 'count', 'p50 ms', 'p90 ms', 'p99 ms', 'queries', 'rows'))
+    for name in sorted(by_span):
+        spans = by_span[name]
+        seconds = [s['seconds'] * 1000 for s in spans]
+        out.write('%-32s %6d %10.2f %10.2f %10.2f %10.1f %10.1f\n' % (
+            name, len(spans),
+            percentile(seconds, 50), percentile(seconds, 90), percentile(seconds, 99),
+            float(sum(s['queries'] for s in spans)) / len(spans),
+            float(sum(s['rows'] for s in spans)) / len(spans)))
+
+
+def cable_counts():
+    """Rows of the tables a pass writes to."""
+    # pylint: disable=import-error
+    from farnsworth.models import CSSubmissionCable, ExploitSubmissionCable, IDSRule
+    # pylint: enable=import-error
+    return dict((m.__name__, m.select().count())
+                for m in (CSSubmissionCable, ExploitSubmissionCable, IDSRule))
+
+
+def run_passes(rounds, passes, metrics, database):
+    # pylint: disable=import-error
+    from scriba.snapshot import RoundSnapshot
+    from scriba.submitters.cb import CBSubmitter
+    from scriba.submitters.pov import POVSubmitter
+    # pylint: enable=import-error
+
+    for round_ in rounds:
+        for _ in range(passes):
+            # The atomic() blocks of the pass nest into this transaction as savepoints
+            with database.atomic() as transaction:
+                with metrics.span('pass', round=round_.num):
+                    snapshot = RoundSnapshot(round_).load()
+                    with metrics.span('submitter', submitter='POVSubmitter'):
+                        POVSubmitter().run(round_.num, snapshot=snapshot)
+                    with metrics.span('submitter', submitter='CBSubmitter'):
+                        CBSubmitter().submit(snapshot)
+                transaction.rollback()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark scriba decision passes")
+    parser.add_argument('--env', default=os.path.join(os.path.dirname(__file__), '../.env.test'),
+                        help="dotenv file with the database settings")
+    parser.add_argument('--replay', action='store_true',
+                        help="run against the rounds already in the database")
+    parser.add_argument('--teams', type=int, default=7)
+    parser.add_argument('--cses', type=int, default=30)
+    parser.add_argument('--patch-types', type=int, default=5)
+    parser.add_argument('--exploits', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=5,
+                        help="rounds to generate, or latest rounds to replay")
+    parser.add_argument('--passes', type=int, default=10, help="passes per round")
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(args)
+
+    # farnsworth reads its configuration at import time
+    load_dotenv(options.env)
+    import farnsworth
+    import farnsworth.config
+    from farnsworth.models import Round
+    from scriba.instrumentation import METRICS
+
+    from benchmarks.gamestate import generate
+
+    database = farnsworth.config.master_db
+    if not options.replay:
+        farnsworth.drop_tables()
+        farnsworth.create_tables()
+        start = time.time()
+        with database.atomic():
+            generate(teams=options.teams, cses=options.cses, patch_types=options.patch_types,
+                     exploits=options.exploits, rounds=options.rounds, seed=options.seed)
+        print("Generated the game state in %.2fs" % (time.time() - start))
+
+    rounds = list(Round.select().order_by(Round.num.desc()).limit(options.rounds))[::-1]
+
+    METRICS.enabled = True
+    METRICS.hook(database)
+    database.set_autocommit(False)
+    counts = cable_counts()
+    run_passes(rounds, options.passes, METRICS, database)
+    if cable_counts() != counts:
+        sys.stderr.write("The passes were not rolled back: %s rows before, %s after\n" %
+                         (counts, cable_counts()))
+        return 1
+
+    report(METRICS.drain(), sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
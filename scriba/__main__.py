@@ -6,37 +6,96 @@
 from __future__ import absolute_import, unicode_literals
 
 import sys
-import time
 
 # leave this import before everything else!
 import scriba.settings
 
-from farnsworth.models import Round
+import farnsworth.config
 
+import scriba.checkpoint
 import scriba.log
+from scriba.executor import SubmitterExecutor
+from scriba.instrumentation import METRICS
+from scriba.notifier import RoundNotifier
+from scriba.scheduler import RoundScheduler, SCHEDULER_IDLE
+from scriba.sharding import ShardRouter
+from scriba.snapshot import RoundSnapshot
 from scriba.submitters.cb import CBSubmitter
 from scriba.submitters.pov import POVSubmitter
 
 LOG = scriba.log.LOG.getChild('main')
 
 
-def wait_for_ambassador():
-    POLL_INTERVAL = 3
-    while not (Round.current_round() and Round.current_round().is_ready()):
-        LOG.info("Round data not available, waiting %d seconds", POLL_INTERVAL)
-        time.sleep(POLL_INTERVAL)
+def wait_for_ambassador(notifier, after=None):
+    return notifier.wait_for_ready(after=after)
+
+
+def run_pass(executor, scheduler, due, snapshot):
+    for submitter, token in executor.run(due, snapshot):
+        scheduler.done(submitter, snapshot.num, token)
+
+
+def forget(submitters, cs_ids):
+    """Drop what submitters know of cs_ids this round, see ShardRouter.claim."""
+    if not cs_ids:
+        return
+    LOG.info("Took over %d CSes, forgetting their cables", len(cs_ids))
+    for submitter in submitters:
+        for state in (getattr(submitter, 'cable_view', None), getattr(submitter, 'tracker', None)):
+            if state is not None:
+                state.forget(cs_ids)
 
 
 def main(args=None):
     submitters = [POVSubmitter(), CBSubmitter()]
+    notifier = RoundNotifier.from_env()
+    scheduler = RoundScheduler()
+    executor = SubmitterExecutor()
+    snapshot = None
+    resumed = False
+    shards = ShardRouter.from_env()
+    if shards is not None:
+        shards.join()
+    METRICS.hook(farnsworth.config.master_db)
 
     while True:
-        wait_for_ambassador()
-
-        LOG.info("Round #%d", Round.current_round().num)
-
-        for submitter in submitters:
-            submitter.run(Round.current_round().num)
+        round_ = wait_for_ambassador(notifier)
+
+        # Drop the snapshot as soon as the round moves on
+        if snapshot is None or not snapshot.is_current(round_):
+            snapshot = RoundSnapshot(round_).load()
+
+        # Warm restart, only for the round we were in when we stopped
+        if not resumed:
+            scriba.checkpoint.restore(snapshot.num, submitters)
+            resumed = True
+
+        # Past the submission window, changes can only make it into the next round
+        if executor.closed(snapshot.round):
+            notifier.idle(SCHEDULER_IDLE)
+            continue
+
+        # Other processes joined or left, our share of the CSes changed
+        if shards is not None and shards.rebalanced():
+            scheduler.forget()
+
+        due = scheduler.due(submitters, snapshot.num)
+        if not due:
+            notifier.idle(SCHEDULER_IDLE)
+            continue
+
+        LOG.info("Round #%d", snapshot.num)
+
+        with METRICS.span('pass', round=snapshot.num):
+            if shards is None:
+                run_pass(executor, scheduler, due, snapshot)
+            else:
+                with shards.claim(snapshot.fielded_ids()) as shard:
+                    snapshot.shard = shard
+                    forget(submitters, shards.gained)
+                    run_pass(executor, scheduler, due, snapshot)
+        scriba.checkpoint.save(snapshot.num, submitters)
+        METRICS.flush()
 
     return 0
 
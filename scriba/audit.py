@@ -0,0 +1,191 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Append-only audit log of the submission decisions.
+
+Every decision is one length-prefixed binary record: a little-endian
+uint32 with the size of the record, then
+
+    kind     B   CB or POV
+    ts       d   unix time of the decision
+    round    I   round number
+    cs       I   ChallengeSet id
+    team     I   Team id, our team for CB decisions
+    reason   B   reason code, decision.REASONS or pov.POV_REASONS
+    choice   B   decision choice for CB, 1 if a PoV is submitted
+    flags    H   CB: CSFeatures booleans as a bitmask; POV: ranked exploits
+    value    d   CB: min_score; POV: reliability of the exploit; NaN if none
+    count    H   number of ids
+    ids      I*  CB: ids of the chosen CBNs; POV: id of the exploit
+
+Read them back with
+
+    python -m scriba.audit /var/log/scriba/audit.bin --summary
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import os
+import struct
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+
+import scriba.log
+
+LOG = scriba.log.LOG.getChild('audit')
+
+
+# Append the decision records to this file.
+AUDIT_LOG = os.environ.get('SCRIBA_AUDIT_LOG')
+
+CB = 1
+POV = 2
+KINDS = {CB: 'cb', POV: 'pov'}
+
+LENGTH = struct.Struct(b'<I')
+RECORD = struct.Struct(b'<BdIIIBBHdH')
+ID = struct.Struct(b'<I')
+
+NAN = float('nan')
+
+AuditRecord = namedtuple('AuditRecord', [
+    'kind', 'ts', 'round', 'cs', 'team', 'reason', 'choice', 'flags', 'value', 'ids',
+])
+
+
+def pack(kind, round_num, cs_id, team_id, reason, choice, flags=0, value=None, ids=(), ts=None):
+    ids = list(ids)
+    body = RECORD.pack(kind, time.time() if ts is None else ts, round_num, cs_id, team_id,
+                       reason, choice, flags, NAN if value is None else value, len(ids)) + \
+           b''.join(ID.pack(i) for i in ids)
+    return LENGTH.pack(len(body)) + body
+
+
+def unpack(body):
+    fields = RECORD.unpack_from(body)
+    ids = [ID.unpack_from(body, RECORD.size + i * ID.size)[0] for i in range(fields[-1])]
+    return AuditRecord(*(fields[:-1] + (ids,)))
+
+
+def features_flags(features):
+    """The boolean CSFeatures as a bitmask, in field order, min_score left out."""
+    values = [v for f, v in zip(features._fields, features) if f != 'min_score']
+    return sum(1 << bit for bit, value in enumerate(values) if value)
+
+
+class AuditLog(object):
+    """
+    Buffers packed records in memory; flush() appends them to the file in
+    a single write. Without a path, recording does nothing.
+    """
+
+    def __init__(self, path=AUDIT_LOG):
+        self.path = path
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def record(self, *args, **kwargs):
+        """Record a decision, see pack()."""
+        if not self.path:
+            return
+        record = pack(*args, **kwargs)
+        with self._lock:
+            self._buffer.append(record)
+
+    def cb(self, round_num, cs_id, team_id, features, reason, choice, cbns):
+        if not self.path:
+            return
+        self.record(CB, round_num, cs_id, team_id, reason, choice, features_flags(features),
+                    features.min_score, [c.id for c in cbns] if cbns else ())
+
+    def pov(self, round_num, cs_id, team_id, reason, candidates, exploit=None):
+        if not self.path:
+            return
+        self.record(POV, round_num, cs_id, team_id, reason, 1 if exploit is not None else 0,
+                    min(candidates, 0xffff),
+                    exploit.reliability if exploit is not None else None,
+                    [exploit.id] if exploit is not None else ())
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, b''.join(records))
+            finally:
+                os.close(fd)
+        except OSError:
+            LOG.exception("Could not write %d audit records", len(records))
+
+
+def read(path):
+    """Iterate over the AuditRecords of path, stop at a truncated record."""
+    with open(path, 'rb') as audit:
+        while True:
+            header = audit.read(LENGTH.size)
+            if len(header) < LENGTH.size:
+                return
+            length, = LENGTH.unpack(header)
+            body = audit.read(length)
+            if len(body) < length:
+                LOG.warning("Truncated record at the end of %s", path)
+                return
+            yield unpack(body)
+
+
+AUDIT = AuditLog()
+
+
+def _reason_names():
+    # pylint: disable=import-error
+    from scriba.submitters import decision
+    from scriba.submitters.pov import POV_REASONS
+    # pylint: enable=import-error
+    return {CB: decision.REASONS, POV: POV_REASONS}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Read a scriba decision audit log")
+    parser.add_argument('path')
+    parser.add_argument('--kind', choices=sorted(KINDS.values()))
+    parser.add_argument('--round', type=int)
+    parser.add_argument('--cs', type=int)
+    parser.add_argument('--summary', action='store_true',
+                        help="count the decisions per kind and reason")
+    options = parser.parse_args(args)
+
+    names = _reason_names()
+    counts = Counter()
+    for r in read(options.path):
+        if options.kind is not None and KINDS.get(r.kind) != options.kind:
+            continue
+        if options.round is not None and r.round != options.round:
+            continue
+        if options.cs is not None and r.cs != options.cs:
+            continue
+        reason = names.get(r.kind, {}).get(r.reason, str(r.reason))
+        if options.summary:
+            counts[(KINDS.get(r.kind, r.kind), reason)] += 1
+            continue
+        print('%.3f\t%s\t%d\t%d\t%d\t%s\t%d\t%#06x\t%s\t%s' % (
+            r.ts, KINDS.get(r.kind, r.kind), r.round, r.cs, r.team, reason, r.choice, r.flags,
+            r.value, ','.join(str(i) for i in r.ids)))
+
+    for (kind, reason), count in sorted(counts.items()):
+        print('%s\t%s\t%d' % (kind, reason, count))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
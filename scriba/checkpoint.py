@@ -0,0 +1,218 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Checkpoint of the round-scoped state of the submitters, for warm restarts.
+
+After every pass the state is written to a small file, atomically:
+
+    header   8s H H I I I I Q
+             magic, version, 0, round number, number of marks, exploit
+             cables and CBNs, then a digest of the cables of the round
+    marks    B I Q       submitter, cs, digest of the inputs of the last decision
+    exploits B I I I     submitter, team, cs, exploit of the last cable
+    cbns     B I I I     submitter, cs, IDS rule (0 if none), CBN of the last cable
+
+Fixed-size records, so a restart maps the file and reads it in place. The
+checkpoint is only taken back if it is from the current round and no
+cable of the round was written or updated since, otherwise the submitters
+start cold. The CB rotation keeps its own state, see SCRIBA_ROTATION_FILE.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+import mmap
+import os
+import struct
+from collections import defaultdict
+
+import scriba.log
+from scriba.audit import KINDS
+from scriba.dirty import digest
+
+LOG = scriba.log.LOG.getChild('checkpoint')
+
+
+# Checkpoint the round-scoped state of the submitters to this file, and resume from it.
+CHECKPOINT = os.environ.get('SCRIBA_CHECKPOINT')
+
+MAGIC = b'SCRIBACK'
+VERSION = 2
+
+HEADER = struct.Struct(b'<8sHHIIIIQ')
+MARK = struct.Struct(b'<BIQ')
+EXPLOIT = struct.Struct(b'<BIII')
+CBN = struct.Struct(b'<BIII')
+
+
+class Checkpoint(object):
+    """
+    marks, exploits and cbns are keyed by the AUDIT_KIND of the submitter,
+    with the values of DirtyTracker.state(), CableView.exploits and
+    CableView.cbns. cables is the cable_digest() of the round.
+    """
+
+    def __init__(self, round_num, marks=None, exploits=None, cbns=None, cables=0):
+        self.round_num = round_num
+        self.marks = marks or {}
+        self.exploits = exploits or {}
+        self.cbns = cbns or {}
+        self.cables = cables
+
+    def pack(self):
+        marks = [MARK.pack(kind, cs_id, mark)
+                 for kind, seen in sorted(self.marks.items())
+                 for cs_id, mark in sorted(seen.items())]
+        exploits = [EXPLOIT.pack(kind, team_id, cs_id, exploit_id)
+                    for kind, cables in sorted(self.exploits.items())
+                    for (team_id, cs_id), exploit_id in sorted(cables.items())]
+        cbns = [CBN.pack(kind, cs_id, ids_id or 0, cbn_id)
+                for kind, cables in sorted(self.cbns.items())
+                for cs_id, (ids_id, cbn_ids) in sorted(cables.items())
+                for cbn_id in sorted(cbn_ids)]
+        header = HEADER.pack(MAGIC, VERSION, 0, self.round_num, len(marks), len(exploits),
+                             len(cbns), self.cables)
+        return header + b''.join(marks) + b''.join(exploits) + b''.join(cbns)
+
+    @classmethod
+    def unpack(cls, buf):
+        """The Checkpoint in buf, None if it is not a complete checkpoint."""
+        if len(buf) < HEADER.size:
+            return None
+        magic, version, _, round_num, n_marks, n_exploits, n_cbns, cables = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            return None
+        if len(buf) != HEADER.size + n_marks * MARK.size + n_exploits * EXPLOIT.size + \
+                n_cbns * CBN.size:
+            return None
+
+        marks = defaultdict(dict)
+        exploits = defaultdict(dict)
+        cbn_ids = defaultdict(lambda: defaultdict(set))
+        offset = HEADER.size
+        for _ in range(n_marks):
+            kind, cs_id, mark = MARK.unpack_from(buf, offset)
+            marks[kind][cs_id] = mark
+            offset += MARK.size
+        for _ in range(n_exploits):
+            kind, team_id, cs_id, exploit_id = EXPLOIT.unpack_from(buf, offset)
+            exploits[kind][(team_id, cs_id)] = exploit_id
+            offset += EXPLOIT.size
+        for _ in range(n_cbns):
+            kind, cs_id, ids_id, cbn_id = CBN.unpack_from(buf, offset)
+            cbn_ids[kind][(cs_id, ids_id or None)].add(cbn_id)
+            offset += CBN.size
+
+        cbns = dict((kind, dict((cs_id, (ids_id, frozenset(ids)))
+                                for (cs_id, ids_id), ids in keys.items()))
+                    for kind, keys in cbn_ids.items())
+        return cls(round_num, dict(marks), dict(exploits), cbns, cables)
+
+    def write(self, path):
+        tmp = '%s.tmp' % path
+        with open(tmp, 'wb') as checkpoint:
+            checkpoint.write(self.pack())
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.rename(tmp, path)
+
+    @classmethod
+    def read(cls, path):
+        """The Checkpoint in path, None if there is none or it is unusable."""
+        try:
+            with open(path, 'rb') as checkpoint:
+                if os.fstat(checkpoint.fileno()).st_size == 0:
+                    return None
+                buf = mmap.mmap(checkpoint.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    result = cls.unpack(buf)
+                finally:
+                    buf.close()
+        except (IOError, OSError):
+            return None
+        if result is None:
+            LOG.warning("Ignoring the invalid checkpoint %s", path)
+        return result
+
+
+def cable_digest(round_num):
+    """
+    Digest of the CSSubmissionCables and ExploitSubmissionCables of
+    round_num, which moves when exploit cables are updated in place too.
+    """
+    # pylint: disable=import-error
+    from farnsworth.models import CSSubmissionCable, ExploitSubmissionCable, Round
+    # pylint: enable=import-error
+    cs_cables = CSSubmissionCable.select(CSSubmissionCable.id, CSSubmissionCable.cs,
+                                         CSSubmissionCable.ids) \
+                                 .join(Round).where(Round.num == round_num) \
+                                 .order_by(CSSubmissionCable.id)
+    exploit_cables = ExploitSubmissionCable.select(ExploitSubmissionCable.id,
+                                                   ExploitSubmissionCable.team,
+                                                   ExploitSubmissionCable.cs,
+                                                   ExploitSubmissionCable.exploit,
+                                                   ExploitSubmissionCable.throws) \
+                                           .join(Round).where(Round.num == round_num) \
+                                           .order_by(ExploitSubmissionCable.id)
+    return digest((list(cs_cables.tuples()), list(exploit_cables.tuples())))
+
+
+def _kinds(submitters):
+    for submitter in submitters:
+        kind = getattr(submitter, 'AUDIT_KIND', None)
+        if kind in KINDS:
+            yield kind, submitter
+
+
+def take(round_num, submitters):
+    """Checkpoint the state of submitters during round_num."""
+    checkpoint = Checkpoint(round_num, cables=cable_digest(round_num))
+    for kind, submitter in _kinds(submitters):
+        tracker = getattr(submitter, 'tracker', None)
+        if tracker is not None and tracker.round_num == round_num:
+            checkpoint.marks[kind] = tracker.state()
+        view = getattr(submitter, 'cable_view', None)
+        if view is not None and view.round_num == round_num:
+            checkpoint.exploits[kind] = dict(view.exploits)
+            checkpoint.cbns[kind] = dict(view.cbns)
+    return checkpoint
+
+
+def save(round_num, submitters, path=CHECKPOINT):
+    if not path:
+        return
+    try:
+        take(round_num, submitters).write(path)
+    except (IOError, OSError):
+        LOG.exception("Could not write the checkpoint %s", path)
+
+
+def restore(round_num, submitters, path=CHECKPOINT):
+    """
+    Hand the state checkpointed in path back to submitters, if it still
+    holds: same round, and the same cables. Returns True if it did.
+    """
+    if not path:
+        return False
+    checkpoint = Checkpoint.read(path)
+    if checkpoint is None:
+        return False
+    if checkpoint.round_num != round_num:
+        LOG.info("Checkpoint is from round #%d, starting cold", checkpoint.round_num)
+        return False
+    if checkpoint.cables != cable_digest(round_num):
+        LOG.info("Cables were written since the checkpoint, starting cold")
+        return False
+
+    for kind, submitter in _kinds(submitters):
+        tracker = getattr(submitter, 'tracker', None)
+        if tracker is not None:
+            tracker.restore(round_num, checkpoint.marks.get(kind, {}))
+        view = getattr(submitter, 'cable_view', None)
+        if view is not None:
+            view.for_round(round_num)
+            view.exploits.update(checkpoint.exploits.get(kind, {}))
+            view.cbns.update(checkpoint.cbns.get(kind, {}))
+    LOG.info("Resumed round #%d from the checkpoint, %d CS decisions",
+             round_num, sum(len(m) for m in checkpoint.marks.values()))
+    return True
@@ -0,0 +1,111 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Which ChallengeSets changed since a submitter last decided on them?"""
+
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import os
+import struct
+
+from peewee import fn
+
+import scriba.log
+from scriba.watermarks import aggregates
+
+LOG = scriba.log.LOG.getChild('dirty')
+
+
+# Only re-evaluate the CSes whose inputs changed during a round, 0 evaluates all of them.
+DIRTY_TRACKING = os.environ.get('SCRIBA_DIRTY_TRACKING', '1') != '0'
+
+
+def _spec(spec):
+    """
+    A spec is (model, cs_field) or (model, cs_field, mark_field), marked
+    per value of cs_field: by the highest mark_field if given, otherwise
+    like scriba.watermarks marks a whole model, so that deletes and
+    updates through save() move the mark too. cs_field may belong to a
+    model that model has a foreign key to, e.g. IDSRule.cs for
+    IDSRuleFielding. Returns (model, cs_field, aggregates).
+    """
+    if len(spec) == 2:
+        model, cs_field = spec
+        return model, cs_field, aggregates(model)
+    model, cs_field, mark_field = spec
+    return model, cs_field, [('MAX', mark_field)]
+
+
+def digest(marks):
+    """64 bits digest of the marks of a CS, which is what the tracker keeps."""
+    return struct.unpack(b'<Q', hashlib.md5(repr(marks).encode('utf-8')).digest()[:8])[0]
+
+
+class DirtyTracker(object):
+    """
+    Remembers, for every CS, the marks of the inputs of the last decision
+    taken on it during the current round. changed() reads the current
+    marks with one grouped query per input and returns the CSes whose
+    marks moved; once the decisions are taken, done() records the marks
+    they were taken with. Everything is dirty again when the round changes.
+    """
+
+    def __init__(self, specs, enabled=DIRTY_TRACKING):
+        self.specs = [_spec(s) for s in specs]
+        self.enabled = enabled
+        self.round_num = None
+        self._seen = {}
+
+    def marks(self, cs_ids):
+        """{cs id: tuple of the marks of every spec} for cs_ids."""
+        cs_ids = list(cs_ids)
+        marks = dict((cs_id, [None] * len(self.specs)) for cs_id in cs_ids)
+        if not cs_ids:
+            return {}
+        for i, (model, cs_field, marked) in enumerate(self.specs):
+            query = model.select(cs_field, *[getattr(fn, func)(f) for func, f in marked])
+            if cs_field.model_class is not model:
+                query = query.join(cs_field.model_class)
+            query = query.where(cs_field << cs_ids).group_by(cs_field)
+            for row in query.tuples():
+                marks[row[0]][i] = row[1:]
+        return dict((cs_id, tuple(m)) for cs_id, m in marks.items())
+
+    def changed(self, cs_ids, round_num):
+        """
+        Return the ids of the CSes of cs_ids to evaluate, and the marks to
+        hand to done() once they are.
+        """
+        cs_ids = set(cs_ids)
+        if round_num != self.round_num:
+            self.round_num = round_num
+            self._seen = {}
+        if not self.enabled:
+            return cs_ids, {}
+
+        marks = self.marks(cs_ids)
+        dirty = set(cs_id for cs_id in cs_ids
+                    if cs_id not in self._seen or self._seen[cs_id] != digest(marks.get(cs_id)))
+        if len(dirty) < len(cs_ids):
+            LOG.debug("%d of %d CSes changed", len(dirty), len(cs_ids))
+        return dirty, marks
+
+    def done(self, cs_id, marks):
+        """The decision on cs_id was taken with marks, see changed()."""
+        if cs_id in marks:
+            self._seen[cs_id] = digest(marks[cs_id])
+
+    def forget(self, cs_ids):
+        """Make cs_ids dirty again, whatever their marks."""
+        for cs_id in cs_ids:
+            self._seen.pop(cs_id, None)
+
+    def state(self):
+        """{cs id: digest of its marks} of the CSes decided on this round."""
+        return dict(self._seen)
+
+    def restore(self, round_num, seen):
+        """Take back a state() saved during round_num."""
+        self.round_num = round_num
+        self._seen = dict(seen)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Run the submitters of a pass, sequentially or concurrently, with deadlines."""
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+from farnsworth.models import Round
+
+import scriba.log
+from scriba.instrumentation import METRICS, span
+
+LOG = scriba.log.LOG.getChild('executor')
+
+
+# How submitters run in a pass: sequential or concurrent.
+EXECUTION_MODE = os.environ.get('SCRIBA_EXECUTION', 'sequential')
+
+# Hard cut-off for all submitters, in seconds after the start of the round.
+HARD_DEADLINE = float(os.environ.get('SCRIBA_HARD_DEADLINE', 240))
+
+
+def submitter_deadline(submitter):
+    """Seconds a run of a submitter has from the start of the pass, SCRIBA_<NAME>_DEADLINE."""
+    name = type(submitter).__name__.upper().replace('SUBMITTER', '')
+    return float(os.environ.get('SCRIBA_%s_DEADLINE' % name,
+                                getattr(submitter, 'DEADLINE', HARD_DEADLINE)))
+
+
+class Deadline(object):
+    """A wall-clock deadline, None means there is none."""
+
+    def __init__(self, at=None):
+        self.at = at
+
+    @classmethod
+    def after(cls, start, seconds):
+        return cls(start + timedelta(seconds=seconds))
+
+    def remaining(self):
+        if self.at is None:
+            return None
+        return max((self.at - datetime.now()).total_seconds(), 0.)
+
+    def expired(self):
+        return self.at is not None and datetime.now() >= self.at
+
+    def __repr__(self):
+        return "<Deadline %s>" % self.at
+
+
+class SubmitterExecutor(object):
+    """
+    Runs the submitters due in a pass. Every run gets a deadline, its
+    submitter's seconds from the start of the pass, that it checks between
+    decisions; once it expires the submitter writes what it has decided so
+    far and returns. No deadline goes past the hard deadline, HARD_DEADLINE
+    seconds after the start of the round, when the submission window
+    closes: from then on nothing runs, and run() reports no run as
+    completed. In concurrent mode, every submitter runs in its own thread
+    with its own database connection, and the pass returns at the hard
+    deadline even if a straggler is still running.
+    """
+
+    def __init__(self, mode=EXECUTION_MODE, hard_deadline=HARD_DEADLINE, database=None):
+        if mode not in ('sequential', 'concurrent'):
+            raise ValueError("Unknown execution mode %s" % mode)
+        self.mode = mode
+        self.hard_deadline = hard_deadline
+        self.database = database if database is not None else Round._meta.database
+        self._running = {}
+
+    def cutoff(self, round_):
+        """The hard deadline of round_."""
+        return Deadline.after(round_.created_at, self.hard_deadline)
+
+    def closed(self, round_):
+        """Is the submission window of round_ over?"""
+        return self.cutoff(round_).expired()
+
+    def deadline(self, submitter, round_, start=None):
+        """Deadline of a run of submitter in a pass that started at start, now by default."""
+        if start is None:
+            start = datetime.now()
+        return Deadline(min(start + timedelta(seconds=submitter_deadline(submitter)),
+                            self.cutoff(round_).at))
+
+    def running(self, submitter):
+        thread = self._running.get(type(submitter).__name__)
+        return thread is not None and thread.is_alive()
+
+    def run(self, due, snapshot):
+        """
+        Run the (submitter, token) pairs in due, return the pairs that
+        completed.
+        """
+        start = datetime.now()
+        due = [(s, t) for s, t in due if not self.running(s)]
+        if self.mode == 'sequential':
+            return [(s, t) for s, t in due if self._run_one(s, snapshot, start)]
+
+        done = []
+        threads = []
+        parents = METRICS.current()
+        for submitter, token in due:
+            thread = threading.Thread(target=self._worker,
+                                      args=(submitter, snapshot, start, token, done, parents),
+                                      name=type(submitter).__name__)
+            thread.daemon = True
+            self._running[thread.name] = thread
+            threads.append(thread)
+            thread.start()
+
+        hard = self.cutoff(snapshot.round)
+        for thread in threads:
+            thread.join(hard.remaining())
+            if thread.is_alive():
+                LOG.warning("%s missed the hard deadline, leaving it behind", thread.name)
+        return list(done)
+
+    def _worker(self, submitter, snapshot, start, token, done, parents=()):
+        try:
+            with METRICS.adopt(parents):
+                if self._run_one(submitter, snapshot, start):
+                    done.append((submitter, token))
+        except Exception: # pylint:disable=broad-except
+            LOG.exception("%s failed", type(submitter).__name__)
+        finally:
+            # Every worker thread uses its own connection, give it back
+            self.database.close()
+
+    def _run_one(self, submitter, snapshot, start):
+        """Run submitter, False if its deadline expired before it could start."""
+        deadline = self.deadline(submitter, snapshot.round, start)
+        name = type(submitter).__name__
+        if deadline.expired():
+            LOG.warning("No time left for %s in round #%d, not running it", name, snapshot.num)
+            return False
+        LOG.debug("Running %s, deadline %s", name, deadline)
+        with span('submitter', submitter=name, round=snapshot.num):
+            submitter.run(snapshot.num, snapshot=snapshot, deadline=deadline)
+        return True
@@ -0,0 +1,176 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Wall time, query and row counts of the steps of a scriba pass."""
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import scriba.log
+
+LOG = scriba.log.LOG.getChild('instrumentation')
+
+
+# Append one JSON record per measured step to this file.
+METRICS_JSONL = os.environ.get('SCRIBA_METRICS_JSONL')
+
+# Keep Prometheus-style totals in this file, e.g. for the node exporter textfile collector.
+METRICS_PROM = os.environ.get('SCRIBA_METRICS_PROM')
+
+
+class Span(object):
+    __slots__ = ('name', 'labels', 'start', 'queries', 'rows')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.start = time.time()
+        self.queries = 0
+        self.rows = 0
+
+
+class Instrumentation(object):
+    """
+    Measures named spans: wall time, plus the SQL queries and rows issued
+    while the span is open, counted by hooking execute_sql of the peewee
+    database. Spans nest and are tracked per thread, so parallel workers
+    are accounted for separately; a worker that adopt()s the spans of the
+    thread that started it counts its queries in them too. When disabled,
+    span() costs a generator and nothing else.
+
+    The Prometheus totals are kept per span name and submitter label.
+    """
+
+    def __init__(self, jsonl_path=METRICS_JSONL, prom_path=METRICS_PROM, enabled=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.enabled = bool(jsonl_path or prom_path) if enabled is None else enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._records = []
+        self._totals = defaultdict(lambda: [0, 0., 0, 0])
+        self._hooked = set()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def hook(self, database):
+        """Count the queries and rows of database."""
+        if not self.enabled or id(database) in self._hooked:
+            return
+        self._hooked.add(id(database))
+        execute_sql = database.execute_sql
+
+        def counting_execute_sql(*args, **kwargs):
+            cursor = execute_sql(*args, **kwargs)
+            stack = self._stack()
+            if stack:
+                rows = max(getattr(cursor, 'rowcount', 0) or 0, 0)
+                # adopted spans are shared with other threads
+                with self._lock:
+                    for span in stack:
+                        span.queries += 1
+                        span.rows += rows
+            return cursor
+
+        database.execute_sql = counting_execute_sql
+
+    @contextmanager
+    def span(self, name, **labels):
+        if not self.enabled:
+            yield
+            return
+
+        span = Span(name, labels)
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+            self._record(span, time.time() - span.start)
+
+    def current(self):
+        """The open spans of this thread, to hand to adopt() in a worker thread."""
+        return tuple(self._stack()) if self.enabled else ()
+
+    @contextmanager
+    def adopt(self, spans):
+        """Count the queries of this thread in spans too, see current()."""
+        if not spans:
+            yield
+            return
+        stack = self._stack()
+        self._local.stack = list(spans) + stack
+        try:
+            yield
+        finally:
+            self._local.stack = stack
+
+    def _record(self, span, seconds):
+        record = {'ts': span.start, 'span': span.name, 'seconds': seconds,
+                  'queries': span.queries, 'rows': span.rows}
+        record.update(span.labels)
+        with self._lock:
+            self._records.append(record)
+            totals = self._totals[(span.name, span.labels.get('submitter'))]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += span.queries
+            totals[3] += span.rows
+
+    def drain(self):
+        """Return and forget the records collected so far."""
+        with self._lock:
+            records, self._records = self._records, []
+        return records
+
+    def flush(self):
+        """Write out the records collected since the last flush."""
+        if not self.enabled:
+            return
+        records = self.drain()
+        with self._lock:
+            totals = dict((k, list(v)) for k, v in self._totals.items())
+
+        try:
+            if self.jsonl_path and records:
+                with open(self.jsonl_path, 'a') as jsonl:
+                    for record in records:
+                        jsonl.write(json.dumps(record, sort_keys=True) + '\n')
+            if self.prom_path:
+                self._write_prom(totals)
+        except (IOError, OSError):
+            LOG.exception("Could not write metrics")
+
+    def _write_prom(self, totals):
+        lines = []
+        for metric, index, kind in (('scriba_span_count', 0, 'counter'),
+                                    ('scriba_span_seconds_total', 1, 'counter'),
+                                    ('scriba_span_queries_total', 2, 'counter'),
+                                    ('scriba_span_rows_total', 3, 'counter')):
+            lines.append('# TYPE %s %s' % (metric, kind))
+            for name, submitter in sorted(totals):
+                labels = 'span="%s"' % name
+                if submitter is not None:
+                    labels += ',submitter="%s"' % submitter
+                lines.append('%s{%s} %s' % (metric, labels, totals[(name, submitter)][index]))
+
+        # Write and rename, so that collectors never read half a file
+        tmp_path = self.prom_path + '.tmp'
+        with open(tmp_path, 'w') as prom:
+            prom.write('\n'.join(lines) + '\n')
+        os.rename(tmp_path, self.prom_path)
+
+
+METRICS = Instrumentation()
+span = METRICS.span
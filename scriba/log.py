@@ -5,15 +5,125 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import atexit
 import logging
 import os
 import sys
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 DEFAULT_FORMAT = '%(asctime)s - %(name)-30s - %(levelname)-10s - %(message)s'
 
+# How records reach stdout: sync, or async through a background thread.
+LOG_MODE = os.environ.get('SCRIBA_LOG_MODE', 'sync')
+
+# Records waiting for the background thread before new ones are dropped.
+LOG_QUEUE_SIZE = int(os.environ.get('SCRIBA_LOG_QUEUE_SIZE', 10000))
+
+# Let through at most this many records of the same message per interval, 0 for all.
+LOG_RATE_LIMIT = int(os.environ.get('SCRIBA_LOG_RATE_LIMIT', 0))
+LOG_RATE_INTERVAL = float(os.environ.get('SCRIBA_LOG_RATE_INTERVAL', 60))
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through limit records per interval for every message template, a
+    log call site in practice. The first record of the next interval
+    tells how many were suppressed.
+    """
+
+    def __init__(self, limit, interval):
+        super(RateLimitFilter, self).__init__()
+        self.limit = limit
+        self.interval = interval
+        self.suppressed = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        with self._lock:
+            start, count, suppressed = self._windows.get(key, (record.created, 0, 0))
+            if record.created - start >= self.interval:
+                start, count = record.created, 0
+            if count >= self.limit:
+                self._windows[key] = (start, count, suppressed + 1)
+                self.suppressed += 1
+                return False
+            self._windows[key] = (start, count + 1, 0)
+
+        if suppressed:
+            record.msg, record.args = '%s [%d similar messages suppressed]', \
+                                      (record.getMessage(), suppressed)
+        return True
+
+
+class AsyncHandler(logging.Handler):
+    """
+    Hands records to target from a background thread, through a bounded
+    queue, so logging never waits for a slow stdout. When the queue is
+    full, records are dropped and counted; the thread reports the count
+    once it catches up.
+    """
+
+    def __init__(self, target, maxsize=LOG_QUEUE_SIZE):
+        super(AsyncHandler, self).__init__()
+        self.target = target
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._reported = 0
+        self._thread = threading.Thread(target=self._run, name='scriba-log')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def emit(self, record):
+        if record.exc_info:
+            # tracebacks hold frames that are gone by the time the thread formats
+            record.exc_text = self.target.formatter.formatException(record.exc_info) \
+                              if self.target.formatter else None
+            record.exc_info = None
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            if self.dropped != self._reported:
+                dropped, self._reported = self.dropped - self._reported, self.dropped
+                self.target.handle(logging.makeLogRecord({
+                    'name': 'scriba.log', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': "Log queue full, dropped %d records", 'args': (dropped,),
+                }))
+            self.target.handle(record)
+
+    def close(self, timeout=5.):
+        """Write out what is queued, for at most timeout seconds."""
+        if self._thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+        self.target.close()
+        super(AsyncHandler, self).close()
+
+
 LOG = logging.getLogger('scriba')
 LOG.setLevel(os.environ.get('SCRIBA_LOG_LEVEL', 'DEBUG'))
 
 HANDLER = logging.StreamHandler(sys.stdout)
 HANDLER.setFormatter(logging.Formatter(os.environ.get('SCRIBA_LOG_FORMAT', DEFAULT_FORMAT)))
+if LOG_MODE == 'async':
+    HANDLER = AsyncHandler(HANDLER)
+    atexit.register(HANDLER.close)
+if LOG_RATE_LIMIT > 0:
+    HANDLER.addFilter(RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_INTERVAL))
 LOG.addHandler(HANDLER)
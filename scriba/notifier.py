@@ -0,0 +1,156 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Round change notifications, to start a pass as soon as a round is ready."""
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import select
+import time
+
+from farnsworth.models import Round
+
+import scriba.log
+
+LOG = scriba.log.LOG.getChild('notifier')
+
+
+# Backend used to wait for round changes: poll, postgres or file.
+NOTIFIER_BACKEND = os.environ.get('SCRIBA_ROUND_NOTIFIER', 'poll')
+
+# Channel the ambassador NOTIFYs when a round is ready.
+NOTIFY_CHANNEL = os.environ.get('SCRIBA_ROUND_CHANNEL', 'scriba_round')
+
+# File touched when a round is ready, for the file backend.
+NOTIFY_FILE = os.environ.get('SCRIBA_ROUND_FILE', '/tmp/scriba_round')
+
+# Bounds of the exponential backoff between two round checks, in seconds.
+MIN_POLL_INTERVAL = float(os.environ.get('SCRIBA_MIN_POLL_INTERVAL', 0.05))
+MAX_POLL_INTERVAL = float(os.environ.get('SCRIBA_MAX_POLL_INTERVAL', 3))
+
+
+class PollBackend(object):
+    """No notifications at all, only the backoff between checks."""
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+class PostgresBackend(object):
+    """LISTEN on a channel, on a dedicated autocommit connection."""
+
+    def __init__(self, channel=NOTIFY_CHANNEL, database=None):
+        # pylint: disable=import-error
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+        # pylint: enable=import-error
+
+        if database is None:
+            database = Round._meta.database
+        self.channel = channel
+        self.conn = database._connect(database.database, **database.connect_kwargs)
+        self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        self.conn.cursor().execute('LISTEN "%s"' % self.channel)
+
+    def wait(self, timeout):
+        if select.select([self.conn], [], [], timeout) == ([], [], []):
+            return False
+        self.conn.poll()
+        notified = bool(self.conn.notifies)
+        del self.conn.notifies[:]
+        return notified
+
+    def close(self):
+        self.conn.close()
+
+
+class FileBackend(object):
+    """Watch the modification time of a file, a local stand-in for NOTIFY."""
+
+    CHECK_INTERVAL = 0.01
+
+    def __init__(self, path=NOTIFY_FILE):
+        self.path = path
+        self.mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def wait(self, timeout):
+        deadline = time.time() + timeout
+        while True:
+            mtime = self._mtime()
+            if mtime != self.mtime:
+                self.mtime = mtime
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.CHECK_INTERVAL, remaining))
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'poll': PollBackend,
+    'postgres': PostgresBackend,
+    'file': FileBackend,
+}
+
+
+class RoundNotifier(object):
+    """
+    Waits for a ready round. The backend wakes us up when the ambassador
+    signals a new round; checks back off exponentially between
+    MIN_POLL_INTERVAL and MAX_POLL_INTERVAL, so a missed notification only
+    costs one interval.
+    """
+
+    def __init__(self, backend=None, current_round=Round.current_round,
+                 min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+        self.backend = backend if backend is not None else PollBackend()
+        self.current_round = current_round
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    @classmethod
+    def from_env(cls):
+        try:
+            backend = BACKENDS[NOTIFIER_BACKEND]()
+        except Exception: # pylint:disable=broad-except
+            LOG.exception("Could not set up the %s notifier, falling back to polling",
+                          NOTIFIER_BACKEND)
+            backend = PollBackend()
+        return cls(backend)
+
+    def wait_for_ready(self, after=None):
+        """
+        Return the current round once it is ready. If after is given, wait
+        for a ready round with a number greater than after.
+        """
+        interval = self.min_interval
+        while True:
+            round_ = self.current_round()
+            if round_ and round_.is_ready() and (after is None or round_.num > after):
+                return round_
+
+            LOG.debug("Round data not available, waiting up to %.2f seconds", interval)
+            if self.backend.wait(interval):
+                interval = self.min_interval
+            else:
+                interval = min(interval * 2, self.max_interval)
+
+    def idle(self, seconds):
+        """Sleep up to seconds, returns early on a round notification."""
+        return self.backend.wait(seconds)
+
+    def close(self):
+        self.backend.close()
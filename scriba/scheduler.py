@@ -0,0 +1,125 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Decide when a submitter has to run again during a round."""
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import time
+
+import scriba.log
+from scriba.watermarks import watermarks
+
+LOG = scriba.log.LOG.getChild('scheduler')
+
+
+# When to re-run a submitter during a round: once, on-change or periodic.
+SCHEDULER_POLICY = os.environ.get('SCRIBA_SCHEDULER_POLICY', 'on-change')
+
+# Seconds between two runs of a submitter with the periodic policy.
+SCHEDULER_PERIOD = float(os.environ.get('SCRIBA_SCHEDULER_PERIOD', 10))
+
+# Seconds to idle when no submitter is due, a new round interrupts it.
+SCHEDULER_IDLE = float(os.environ.get('SCRIBA_SCHEDULER_IDLE', 1))
+
+# Seconds between two full checks of the inputs with the on-change policy.
+SCHEDULER_RECHECK = float(os.environ.get('SCRIBA_SCHEDULER_RECHECK', 15))
+
+POLICIES = ('once', 'on-change', 'periodic')
+
+
+class RoundScheduler(object):
+    """
+    Tracks which submitters ran for which round. Every submitter runs once
+    per round; after that, the policy decides whether it runs again:
+
+    - once: never;
+    - on-change: when the watermark of one of the submitter INPUTS moved
+      since its last run, e.g. a new exploit, poll feedback or patch, or a
+      re-scored exploit, see scriba.watermarks;
+    - periodic: every SCHEDULER_PERIOD seconds.
+
+    due() is called every SCHEDULER_IDLE seconds. The full watermarks of
+    the inputs scan their tables, so due() only reads them every recheck
+    seconds. In between, it reads the highest primary key of every input
+    model from its index, which catches new rows right away.
+    """
+
+    def __init__(self, policy=SCHEDULER_POLICY, period=SCHEDULER_PERIOD,
+                 recheck=SCHEDULER_RECHECK):
+        if policy not in POLICIES:
+            raise ValueError("Unknown scheduler policy %s" % policy)
+        self.policy = policy
+        self.period = period
+        self.recheck = recheck
+        self._runs = {}
+        self._checked = None
+
+    @staticmethod
+    def name(submitter):
+        return type(submitter).__name__
+
+    @staticmethod
+    def inputs(submitter):
+        return tuple(getattr(submitter, 'INPUTS', ()))
+
+    @staticmethod
+    def _indexed(spec):
+        """The (model, primary key) spec of a model spec, None for (model, field) ones."""
+        if isinstance(spec, tuple):
+            return None
+        return (spec, spec._meta.primary_key)
+
+    def marks(self, specs):
+        """
+        {spec: token} for specs: the highest primary key of the model specs,
+        and their full watermarks as of the last full check.
+        """
+        indexed = dict((s, self._indexed(s)) for s in specs)
+        query = set(i for i in indexed.values() if i is not None)
+        now = time.time()
+        full = self._checked is None or now - self._checked[0] >= self.recheck or \
+            not set(specs) <= set(self._checked[1])
+        if full:
+            query |= set(specs)
+        marks = watermarks(query)
+        if full:
+            self._checked = (now, dict((s, marks[s]) for s in specs))
+        return dict((s, (marks.get(indexed[s]), self._checked[1][s])) for s in specs)
+
+    def due(self, submitters, round_num):
+        """
+        Return the (submitter, token) pairs that have to run for round_num,
+        the token is handed back to done() once the run is over.
+        """
+        tokens = {}
+        if self.policy == 'on-change':
+            specs = set(s for submitter in submitters for s in self.inputs(submitter))
+            marks = self.marks(specs)
+            tokens = {self.name(sub): tuple(marks[s] for s in self.inputs(sub)) for sub in submitters}
+
+        due = []
+        for submitter in submitters:
+            name = self.name(submitter)
+            token = tokens.get(name)
+            last = self._runs.get(name)
+            if last is None or last[0] != round_num:
+                due.append((submitter, token))
+            elif self.policy == 'on-change' and last[1] != token:
+                LOG.debug("Inputs of %s changed, running again", name)
+                due.append((submitter, token))
+            elif self.policy == 'periodic' and time.time() - last[2] >= self.period:
+                due.append((submitter, token))
+        return due
+
+    def forget(self):
+        """Make every submitter due again, e.g. when its CSes changed."""
+        self._runs = {}
+
+    def done(self, submitter, round_num, token=None):
+        self._runs[self.name(submitter)] = (round_num, token, time.time())
+
+    def finished(self, submitter, round_num):
+        last = self._runs.get(self.name(submitter))
+        return last is not None and last[0] == round_num
@@ -0,0 +1,233 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Split the fielded ChallengeSets between several scriba processes.
+
+Every process holds one of SHARD_SLOTS membership leases for as long as it
+lives; the live members are the leases currently held. Every CS belongs to
+one member by rendezvous hashing over the live members, so when a process
+joins or dies, only the CSes of that process move. Members can briefly
+disagree while the membership changes, so a process also takes a lease on
+every CS it decides on for the duration of the pass, and skips the CSes
+leased by someone else. The cables of a CS are only written while holding
+its lease, after reading back what the previous holder wrote, which keeps
+them at one per (CS, round) and (team, CS, round).
+
+Leases are Postgres advisory locks, or flock()ed files for local runs and
+tests; both go away with the process that holds them.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+import errno
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+import scriba.log
+
+LOG = scriba.log.LOG.getChild('sharding')
+
+
+# Split the CSes between processes: off, postgres or file.
+SHARDING = os.environ.get('SCRIBA_SHARDING', 'off')
+
+# Maximum number of processes sharing the CSes.
+SHARD_SLOTS = int(os.environ.get('SCRIBA_SHARD_SLOTS', 16))
+
+# First of the two advisory lock namespaces used: membership, then CSes.
+SHARD_LOCK_NAMESPACE = int(os.environ.get('SCRIBA_SHARD_LOCK_NAMESPACE', 0x5c1b))
+
+# Directory of the lock files, for the file backend.
+SHARD_DIR = os.environ.get('SCRIBA_SHARD_DIR', '/tmp/scriba_shards')
+
+
+class PostgresLeases(object):
+    """Session-level advisory locks, on a dedicated autocommit connection."""
+
+    def __init__(self, namespace=SHARD_LOCK_NAMESPACE, database=None):
+        # pylint: disable=import-error
+        from farnsworth.models import Round
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+        # pylint: enable=import-error
+
+        if database is None:
+            database = Round._meta.database
+        self.member_ns = namespace
+        self.cs_ns = namespace + 1
+        self.conn = database._connect(database.database, **database.connect_kwargs)
+        self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+
+    def _fetch(self, sql, args):
+        cursor = self.conn.cursor()
+        cursor.execute(sql, args)
+        return cursor.fetchall()
+
+    def try_lock(self, kind, key):
+        ns = self.member_ns if kind == 'member' else self.cs_ns
+        return self._fetch('SELECT pg_try_advisory_lock(%s, %s)', (ns, key))[0][0]
+
+    def unlock(self, kind, key):
+        ns = self.member_ns if kind == 'member' else self.cs_ns
+        self._fetch('SELECT pg_advisory_unlock(%s, %s)', (ns, key))
+
+    def members(self):
+        rows = self._fetch("SELECT objid FROM pg_locks "
+                           "WHERE locktype = 'advisory' AND granted AND objsubid = 2 "
+                           "AND classid = %s AND database = "
+                           "(SELECT oid FROM pg_database WHERE datname = current_database())",
+                           (self.member_ns,))
+        return sorted(set(int(r[0]) for r in rows))
+
+    def close(self):
+        self.conn.close()
+
+
+class FileLeases(object):
+    """flock()ed files in a directory, for processes of one host."""
+
+    def __init__(self, directory=SHARD_DIR):
+        self.directory = directory
+        self._held = {}
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _path(self, kind, key):
+        return os.path.join(self.directory, '%s-%d.lock' % (kind, key))
+
+    def try_lock(self, kind, key):
+        if (kind, key) in self._held:
+            return True
+        lock = open(self._path(kind, key), 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            lock.close()
+            return False
+        self._held[(kind, key)] = lock
+        return True
+
+    def unlock(self, kind, key):
+        lock = self._held.pop((kind, key), None)
+        if lock is not None:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+
+    def members(self):
+        members = []
+        for name in os.listdir(self.directory):
+            if not name.startswith('member-') or not name.endswith('.lock'):
+                continue
+            slot = int(name[len('member-'):-len('.lock')])
+            if ('member', slot) in self._held:
+                members.append(slot)
+                continue
+            with open(os.path.join(self.directory, name), 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                except IOError:
+                    members.append(slot)
+        return sorted(members)
+
+    def close(self):
+        for kind, key in list(self._held):
+            self.unlock(kind, key)
+
+
+BACKENDS = {
+    'postgres': PostgresLeases,
+    'file': FileLeases,
+}
+
+
+def _weight(slot, cs_id):
+    return hashlib.md5(b'%d:%d' % (slot, cs_id)).digest()
+
+
+class ShardRouter(object):
+    """Membership of this process, and the CSes it decides on."""
+
+    def __init__(self, leases, slots=SHARD_SLOTS):
+        self.leases = leases
+        self.slots = slots
+        self.slot = None
+        self._members = None
+        self._contended = False
+        self._held = None
+        self.gained = frozenset()
+
+    @classmethod
+    def from_env(cls):
+        """The router configured by SCRIBA_SHARDING, None when it is off."""
+        if SHARDING == 'off':
+            return None
+        if SHARDING not in BACKENDS:
+            raise ValueError("Unknown sharding backend %s" % SHARDING)
+        return cls(BACKENDS[SHARDING]())
+
+    def join(self):
+        for slot in range(self.slots):
+            if self.leases.try_lock('member', slot):
+                self.slot = slot
+                LOG.info("Joined the shards in slot %d", slot)
+                return self
+        raise RuntimeError("All %d shard slots are taken" % self.slots)
+
+    def owner(self, cs_id, members):
+        return max(members, key=lambda slot: _weight(slot, cs_id))
+
+    def owned(self, cs_ids):
+        """The CSes of cs_ids that belong to this process."""
+        members = self.leases.members()
+        if self.slot not in members:
+            # our lease is gone, e.g. the connection was reset
+            LOG.warning("Lost shard slot %s, joining again", self.slot)
+            self.join()
+            members = self.leases.members()
+        if members != self._members:
+            LOG.info("Shard members are now %s, we are %d", members, self.slot)
+            self._members = members
+        return set(cs_id for cs_id in cs_ids if self.owner(cs_id, members) == self.slot)
+
+    def rebalanced(self):
+        """
+        Did the members change since the last claim, or did the last claim
+        skip CSes leased by another process? Either way, the CSes of this
+        process have to be decided on again.
+        """
+        return self._contended or self.leases.members() != self._members
+
+    @contextmanager
+    def claim(self, cs_ids):
+        """
+        Lease the CSes of cs_ids that belong to this process, yield their
+        ids. gained is then the CSes that were not held in the previous
+        claim: another process may have written their cables in between.
+        Nothing is gained by the first claim, whatever this process knew
+        before it was checked against the cables, see scriba.checkpoint.
+        """
+        claimed = set()
+        self._contended = False
+        try:
+            for cs_id in self.owned(cs_ids):
+                if self.leases.try_lock('cs', cs_id):
+                    claimed.add(cs_id)
+                else:
+                    LOG.debug("CS %d is leased by another process, skipping it", cs_id)
+                    self._contended = True
+            claimed = frozenset(claimed)
+            self.gained = claimed - self._held if self._held is not None else frozenset()
+            self._held = claimed
+            yield claimed
+        finally:
+            for cs_id in claimed:
+                self.leases.unlock('cs', cs_id)
+
+    def close(self):
+        self.leases.close()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+What-if simulator for the CB patch strategy thresholds.
+
+    python -m scriba.simulator --strategy simple --min-cb-score 0.8,0.85,0.9,0.95
+
+History (poll feedback of our fieldings, patch scores, patch types) is
+read once from the database, then every combination of thresholds is
+replayed through the strategy on all cores. The replay is a model, not a
+game: a patch type scores what it scored when we really fielded it in
+that round, or its average observed score, or its estimated score; the
+round after a submission is down; security is 1 - exploitability of the
+fielded patch type, 0 for the original binary.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import bisect
+import itertools
+import multiprocessing
+import sys
+from collections import defaultdict, namedtuple
+
+# leave this import before everything else!
+import scriba.settings # pylint: disable=unused-import
+
+import scriba.log
+from scriba.submitters import cb as _cb
+from scriba.submitters import decision
+
+LOG = scriba.log.LOG.getChild('simulator')
+
+
+PatchTypeHistory = namedtuple('PatchTypeHistory', [
+    'name', 'exploitability', 'available_from', 'estimated', 'failed_polls', 'observed',
+])
+
+Thresholds = namedtuple('Thresholds', [
+    'min_cb_score', 'local_cb_score_threshold', 'min_rounds_online',
+])
+
+Projection = namedtuple('Projection', [
+    'strategy', 'thresholds', 'availability', 'security', 'submissions',
+])
+
+
+class History(object):
+    """
+    What happened to our CSes, as plain data that can be shipped to other
+    processes: rounds[cs_id] is the list of round numbers the CS was
+    fielded in, patches[cs_id] the PatchTypeHistory of every patch type:
+    estimated and failed_polls come from its latest PatchScore, observed
+    maps a round number to the cb_score of the poll feedback we got while
+    fielding it.
+    """
+
+    def __init__(self, rounds=None, patches=None):
+        self.rounds = rounds or {}
+        self.patches = patches or {}
+
+    @classmethod
+    def load(cls):
+        """
+        Read the history with a fixed number of queries. The rounds a CS
+        was fielded in are the ones we have a fielding of it for.
+        """
+        # pylint: disable=import-error
+        from farnsworth.models import (ChallengeBinaryNode, ChallengeSetFielding, PatchScore,
+                                       PatchType, PollFeedback, Round, Team)
+        from scriba.submitters.metadata import metadata_fields
+        # pylint: enable=import-error
+
+        starts = list(Round.select(Round.created_at, Round.num).order_by(Round.num).tuples())
+        start_times = [created_at for created_at, _ in starts]
+
+        rounds = defaultdict(set)
+        polled = {}
+        query = ChallengeSetFielding.select(ChallengeSetFielding.id,
+                                            ChallengeSetFielding.cs,
+                                            Round.num,
+                                            ChallengeSetFielding.poll_feedback) \
+                                    .join(Round, on=(ChallengeSetFielding.available_round == Round.id)) \
+                                    .where(ChallengeSetFielding.team == Team.get_our())
+        for fielding_id, cs_id, round_num, feedback_id in query.tuples():
+            rounds[cs_id].add(round_num)
+            if feedback_id is not None:
+                polled[fielding_id] = (cs_id, round_num, feedback_id)
+        if not rounds:
+            return cls()
+
+        # The latest PatchScore of every patch type is its estimated feedback
+        estimations = {}
+        for estimation in PatchScore.select().where(PatchScore.cs << list(rounds)) \
+                                    .order_by(PatchScore.id):
+            estimations[(estimation.cs_id, estimation.patch_type_id)] = estimation
+
+        # The first patched CBN of every patch type stands for it
+        patches = defaultdict(dict)
+        query = ChallengeBinaryNode.select(*(metadata_fields() + [PatchType])) \
+                                   .join(PatchType) \
+                                   .where(ChallengeBinaryNode.cs << list(rounds)) \
+                                   .order_by(ChallengeBinaryNode.id)
+        for cbn in query:
+            pt = cbn.patch_type
+            if pt.id in patches[cbn.cs_id]:
+                continue
+            # the round the CBN was created in
+            created = bisect.bisect_right(start_times, cbn.created_at)
+            estimation = estimations.get((cbn.cs_id, pt.id))
+            patches[cbn.cs_id][pt.id] = PatchTypeHistory(
+                pt.name, pt.exploitability,
+                starts[created - 1][1] if created > 0 else 0,
+                estimation.cb_score if estimation is not None else None,
+                estimation.has_failed_polls if estimation is not None else None, {})
+
+        if polled:
+            scores = dict((pf.id, pf.cb_score) for pf in PollFeedback.select().where(
+                PollFeedback.id << list(set(f[2] for f in polled.values()))))
+
+            through = ChallengeSetFielding.cbns.get_through_model()
+            fielding_fk = through._meta.rel_for_model(ChallengeSetFielding)
+            cbn_fk = through._meta.rel_for_model(ChallengeBinaryNode)
+            patch_types = {}
+            query = through.select(fielding_fk, ChallengeBinaryNode.patch_type) \
+                           .join(ChallengeBinaryNode, on=(cbn_fk == ChallengeBinaryNode.id)) \
+                           .where(fielding_fk << list(polled)) \
+                           .order_by(ChallengeBinaryNode.id)
+            for fielding_id, pt_id in query.tuples():
+                patch_types.setdefault(fielding_id, pt_id)
+
+            for fielding_id, (cs_id, round_num, feedback_id) in polled.items():
+                history = patches[cs_id].get(patch_types.get(fielding_id))
+                if history is not None:
+                    history.observed[round_num] = scores[feedback_id]
+
+        return cls(dict((cs_id, sorted(r)) for cs_id, r in rounds.items()), dict(patches))
+
+    def score(self, cs_id, pt_id, round_num):
+        """Projected cb_score of a patch type, 1 for the original binary."""
+        if pt_id is None:
+            return 1.
+        history = self.patches[cs_id][pt_id]
+        if round_num in history.observed:
+            return history.observed[round_num]
+        if history.observed:
+            return sum(history.observed.values()) / len(history.observed)
+        if history.estimated is not None:
+            return history.estimated
+        return 1.
+
+
+def _simple(history, cs_id, state, round_num, thresholds):
+    """The simple strategy, through the pure decision core."""
+    available = {pt_id: p for pt_id, p in history.patches[cs_id].items()
+                 if p.available_from <= round_num}
+    if not available:
+        return None
+
+    best = min(available, key=lambda pt_id: available[pt_id].exploitability)
+    known = [min(state['seen'][pt_id]) for pt_id in available if state['seen'].get(pt_id)]
+    features = decision.DEFAULT_FEATURES._replace(
+        fielded_before=state['rounds'] > 0,
+        downed=state['downed'],
+        min_score=min(known) if known else None,
+        best_is_manual=available[best].name == 'manual',
+        current_is_original=state['fielded'] is None,
+        best_is_prior=state['fielded'] == best,
+        original_is_prior=state['fielded'] is None,
+    )
+    _, choice = decision.decide(features, thresholds.min_cb_score)
+    if choice == decision.ORIGINAL:
+        return 'original'
+    if choice == decision.BEST_PATCH:
+        return best
+    return None
+
+
+def _scored(history, cs_id, state, round_num, thresholds):
+    """The blacklist-and-score strategy, through the pure decision core."""
+    patches = {}
+    for pt_id, p in history.patches[cs_id].items():
+        if p.available_from > round_num:
+            continue
+        seen = state['seen'].get(pt_id)
+        min_score = min(seen) if seen else None
+        patches[pt_id] = decision.PatchScores(
+            min_score, p.estimated, p.failed_polls,
+            min_score if seen else p.estimated, state['fieldings'][pt_id])
+    choice, pt_id = decision.decide_scored(patches, state['fielded'], thresholds.min_cb_score,
+                                           thresholds.local_cb_score_threshold,
+                                           thresholds.min_rounds_online)
+    if choice == decision.ORIGINAL:
+        return 'original'
+    if choice == decision.SCORED_PATCH:
+        return pt_id
+    return None
+
+
+STRATEGIES = {
+    'simple': _simple,
+    'scored': _scored,
+}
+
+# The Thresholds every strategy looks at
+AXES = {
+    'simple': ('min_cb_score',),
+    'scored': Thresholds._fields,
+}
+
+
+def grid(strategy, values):
+    """
+    The Thresholds to sweep for strategy, values maps every Thresholds field
+    to its candidate values. The fields the strategy does not look at keep
+    their first value, so that no two Thresholds replay the same.
+    """
+    axes = [values[f] if f in AXES[strategy] else values[f][:1] for f in Thresholds._fields]
+    return [Thresholds(*t) for t in itertools.product(*axes)]
+
+
+def simulate(history, strategy, thresholds):
+    """Replay history through strategy with thresholds, return a Projection."""
+    decide = STRATEGIES[strategy]
+    availability = security = 0.
+    cs_rounds = submissions = 0
+
+    for cs_id, round_nums in history.rounds.items():
+        state = {'fielded': None, 'downed': False, 'rounds': 0,
+                 'seen': defaultdict(list), 'fieldings': defaultdict(int)}
+        pending = None
+        for round_num in round_nums:
+            if pending is not None:
+                state['fielded'] = None if pending == 'original' else pending
+                state['downed'] = True
+                pending = None
+            else:
+                state['downed'] = False
+
+            fielded = state['fielded']
+            score = 0. if state['downed'] else history.score(cs_id, fielded, round_num)
+            if fielded is not None and not state['downed']:
+                state['seen'][fielded].append(score)
+            if fielded is not None:
+                state['fieldings'][fielded] += 1
+
+            availability += score
+            if fielded is not None:
+                security += 1. - history.patches[cs_id][fielded].exploitability
+            cs_rounds += 1
+
+            pending = decide(history, cs_id, state, round_num, thresholds)
+            if pending is not None:
+                submissions += 1
+            state['rounds'] += 1
+
+    cs_rounds = max(cs_rounds, 1)
+    return Projection(strategy, thresholds, availability / cs_rounds, security / cs_rounds,
+                      submissions)
+
+
+_HISTORY = None
+
+
+def _init_worker(history):
+    global _HISTORY # pylint: disable=global-statement
+    _HISTORY = history
+
+
+def _simulate_worker(args):
+    return simulate(_HISTORY, *args)
+
+
+def sweep(history, strategy, grid, processes=None):
+    """Simulate every Thresholds of grid, on processes cores."""
+    pool = multiprocessing.Pool(processes, _init_worker, (history,))
+    try:
+        return pool.map(_simulate_worker, [(strategy, t) for t in grid])
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _floats(value):
+    return [float(v) for v in value.split(',')]
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Sweep the CB strategy thresholds over history")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='simple')
+    parser.add_argument('--min-cb-score', type=_floats, default=[_cb.MIN_CB_SCORE])
+    parser.add_argument('--local-cb-score-threshold', type=_floats,
+                        default=[_cb.LOCAL_CB_SCORE_THRESHOLD])
+    parser.add_argument('--min-rounds-online', type=_ints, default=[_cb.MIN_ROUNDS_ONLINE])
+    parser.add_argument('--processes', type=int, default=None)
+    options = parser.parse_args(args)
+
+    history = History.load()
+    LOG.info("Loaded the history of %d CSes", len(history.rounds))
+
+    thresholds = grid(options.strategy, {
+        'min_cb_score': options.min_cb_score,
+        'local_cb_score_threshold': options.local_cb_score_threshold,
+        'min_rounds_online': options.min_rounds_online,
+    })
+    projections = sweep(history, options.strategy, thresholds, options.processes)
+
+    def axis(p, field, fmt):
+        return fmt % getattr(p.thresholds, field) if field in AXES[p.strategy] else '-'
+
+    print('%-12s %-10s %-10s %-10s %-13s %-10s %s' % ('strategy', 'min_score', 'local_thr',
+                                                      'min_online', 'availability',
+                                                      'security', 'submissions'))
+    for p in sorted(projections, key=lambda p: p.availability * p.security, reverse=True):
+        print('%-12s %-10s %-10s %-10s %-13.4f %-10.4f %d' % (
+            p.strategy, axis(p, 'min_cb_score', '%.3f'),
+            axis(p, 'local_cb_score_threshold', '%.3f'), axis(p, 'min_rounds_online', '%d'),
+            p.availability, p.security, p.submissions))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
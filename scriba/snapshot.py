@@ -0,0 +1,125 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Round-scoped snapshot of the farnsworth lookups done during a pass."""
+
+from __future__ import absolute_import, unicode_literals
+
+from farnsworth.models import ChallengeSet, Round, Team
+
+import scriba.log
+from scriba.submitters.scores import ScoreCache
+from scriba.submitters.timeline import ExploitTimeline
+
+LOG = scriba.log.LOG.getChild('snapshot')
+
+
+class RoundSnapshot(object):
+    """
+    Rows that do not change while a round is running: the round itself, the
+    previous round, the teams and the fielded ChallengeSets. Every lookup hits
+    the database at most once, a new snapshot has to be built when the round
+    number changes.
+    """
+
+    def __init__(self, round_=None):
+        self._round = round_
+        self._prev_round = None
+        self._prev_round_loaded = False
+        self._our_team = None
+        self._opponents = None
+        self._fielded = {}
+        self._exploit_timeline = None
+        self._scores = None
+        # ids of the CSes this process decides on, None for all of them
+        self.shard = None
+
+    @property
+    def round(self):
+        if self._round is None:
+            self._round = Round.current_round()
+        return self._round
+
+    @property
+    def num(self):
+        return self.round.num
+
+    @property
+    def prev_round(self):
+        """The round before the snapshot round, None for the first one."""
+        if not self._prev_round_loaded:
+            if self._round is None:
+                self._prev_round = Round.prev_round()
+            else:
+                self._prev_round = Round.select() \
+                                        .where(Round.num < self._round.num) \
+                                        .order_by(Round.num.desc()) \
+                                        .first()
+            self._prev_round_loaded = True
+        return self._prev_round
+
+    @property
+    def our_team(self):
+        if self._our_team is None:
+            self._our_team = Team.get_our()
+        return self._our_team
+
+    @property
+    def opponents(self):
+        if self._opponents is None:
+            self._opponents = list(Team.opponents())
+        return self._opponents
+
+    @property
+    def exploit_timeline(self):
+        """ExploitTimeline of the pass, loaded on first use unless one was set."""
+        if self._exploit_timeline is None:
+            self._exploit_timeline = ExploitTimeline().load()
+        return self._exploit_timeline
+
+    @exploit_timeline.setter
+    def exploit_timeline(self, timeline):
+        self._exploit_timeline = timeline
+
+    @property
+    def scores(self):
+        """ScoreCache of the pass, empty unless one was set."""
+        if self._scores is None:
+            self._scores = ScoreCache()
+        return self._scores
+
+    @scores.setter
+    def scores(self, scores):
+        self._scores = scores
+
+    def fielded_in_round(self, round_=None):
+        """List of ChallengeSets fielded in round_, defaults to the snapshot round."""
+        if round_ is None:
+            round_ = self.round
+        if round_.id not in self._fielded:
+            cses = list(ChallengeSet.fielded_in_round(round_))
+            self._fielded[round_.id] = (cses, frozenset(cs.id for cs in cses))
+        return self._fielded[round_.id][0]
+
+    def fielded_ids(self, round_=None):
+        """Set of ids of the ChallengeSets fielded in round_."""
+        if round_ is None:
+            round_ = self.round
+        self.fielded_in_round(round_)
+        return self._fielded[round_.id][1]
+
+    def in_shard(self, cs_id):
+        """Does this process decide on cs_id in this pass? See scriba.sharding."""
+        return self.shard is None or cs_id in self.shard
+
+    def load(self):
+        """Eagerly load everything, so that a pass only reads from memory."""
+        LOG.debug("Loading snapshot for round #%d", self.num)
+        _ = (self.prev_round, self.our_team, self.opponents)
+        self.fielded_in_round()
+        if self.prev_round is not None:
+            self.fielded_in_round(self.prev_round)
+        return self
+
+    def is_current(self, round_):
+        return round_ is not None and self.round.num == round_.num
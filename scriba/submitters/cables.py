@@ -0,0 +1,188 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Collect the cables decided in a pass and write them in one transaction."""
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import defaultdict
+
+from farnsworth.models import (ChallengeBinaryNode,
+                               CSSubmissionCable,
+                               ExploitSubmissionCable,
+                               IDSRule)
+
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('cables')
+
+
+class CableView(object):
+    """
+    The cables of the current round as far as this process knows: what it
+    wrote, and what it read back from the database. Used to drop writes
+    that would not change anything; applied and skipped count the writes
+    of the round.
+    """
+
+    def __init__(self):
+        self.round_num = None
+        self.exploits = {}
+        self.cbns = {}
+        self.applied = 0
+        self.skipped = 0
+
+    def for_round(self, round_num):
+        """Forget everything when the round changes."""
+        if round_num != self.round_num:
+            self.__init__()
+            self.round_num = round_num
+        return self
+
+    def forget(self, cs_ids):
+        """Forget the cables of cs_ids, e.g. when another process may have written them."""
+        cs_ids = set(cs_ids)
+        self.exploits = dict((k, v) for k, v in self.exploits.items() if k[1] not in cs_ids)
+        self.cbns = dict((k, v) for k, v in self.cbns.items() if k not in cs_ids)
+
+    @staticmethod
+    def cbns_key(cbns, ids):
+        return (ids.id if ids is not None else None, frozenset(c.id for c in cbns))
+
+
+class CableWriter(object):
+    """
+    Buffers the ExploitSubmissionCables and CSSubmissionCables of a round
+    and flushes them in a single transaction, so the ambassador never sees
+    half of a pass. The number of statements does not depend on the number
+    of teams and CSes:
+
+    - exploit cables: one UPDATE per exploit for the existing cables, one
+      multi-row INSERT for the new ones;
+    - CS cables: one query for the cables already in the round, one
+      multi-row INSERT for the cables and one for their CBNs.
+
+    CS cables follow CSSubmissionCable.get_or_create: a cable with the same
+    CS, IDS rule and CBNs in the round is not written again. A decision
+    without an IDS rule gets a new empty IDSRule, created one by one through
+    the model so that its derived columns are filled, and a new cable.
+
+    With a CableView, cables identical to the ones already written this
+    round are dropped before they reach the database.
+    """
+
+    def __init__(self, round_, view=None):
+        self.round = round_
+        self.view = view.for_round(round_.num) if view is not None else None
+        self._exploits = []
+        self._cses = []
+
+    def __len__(self):
+        return len(self._exploits) + len(self._cses)
+
+    def add_exploit(self, team, cs, exploit_id, throws, cable_id=None):
+        """Submit exploit_id against team on cs, cable_id is the cable to update."""
+        if self.view is not None and self.view.exploits.get((team.id, cs.id)) == exploit_id:
+            self.view.skipped += 1
+            return
+        self._exploits.append((team, cs, exploit_id, throws, cable_id))
+
+    def add_cbns(self, cs, cbns, ids=None):
+        """Submit cbns for cs, with an empty IDS rule if ids is None."""
+        cbns = list(cbns)
+        if self.view is not None and self.view.cbns.get(cs.id) == CableView.cbns_key(cbns, ids):
+            self.view.skipped += 1
+            return
+        self._cses.append((cs, cbns, ids))
+
+    def flush(self):
+        if not len(self):
+            return
+        with CSSubmissionCable._meta.database.atomic():
+            self._flush_exploits()
+            self._flush_cbns()
+
+        if self.view is not None:
+            for team, cs, exploit_id, _, _ in self._exploits:
+                self.view.exploits[(team.id, cs.id)] = exploit_id
+            for cs, cbns, ids in self._cses:
+                self.view.cbns[cs.id] = CableView.cbns_key(cbns, ids)
+            self.view.applied += len(self)
+        self._exploits = []
+        self._cses = []
+
+    def _flush_exploits(self):
+        updates = defaultdict(list)
+        inserts = []
+        for team, cs, exploit_id, throws, cable_id in self._exploits:
+            if cable_id is not None:
+                updates[exploit_id].append(cable_id)
+            else:
+                inserts.append({'team': team, 'cs': cs, 'exploit': exploit_id,
+                                'throws': throws, 'round': self.round})
+
+        for exploit_id, cable_ids in updates.items():
+            ExploitSubmissionCable.update(exploit=exploit_id) \
+                                  .where(ExploitSubmissionCable.id << cable_ids) \
+                                  .execute()
+        if inserts:
+            ExploitSubmissionCable.insert_many(inserts).execute()
+
+        LOG.debug("%d exploit cables updated, %d created",
+                  sum(len(v) for v in updates.values()), len(inserts))
+
+    def _existing_cbns_cables(self, through, cable_fk, cbn_fk):
+        """(cs id, ids id, frozenset of CBN ids) of the round's cables."""
+        cables = {}
+        query = CSSubmissionCable.select(CSSubmissionCable.id,
+                                         CSSubmissionCable.cs,
+                                         CSSubmissionCable.ids) \
+                                 .where((CSSubmissionCable.round == self.round) &
+                                        (CSSubmissionCable.cs << list(set(cs.id for cs, _, _ in self._cses))))
+        for cable_id, cs_id, ids_id in query.tuples():
+            cables[cable_id] = (cs_id, ids_id)
+        if not cables:
+            return set()
+
+        cbns = defaultdict(set)
+        for cable_id, cbn_id in through.select(cable_fk, cbn_fk) \
+                                       .where(cable_fk << list(cables)).tuples():
+            cbns[cable_id].add(cbn_id)
+
+        return set((cs_id, ids_id, frozenset(cbns[cable_id]))
+                   for cable_id, (cs_id, ids_id) in cables.items())
+
+    def _flush_cbns(self):
+        if not self._cses:
+            return
+
+        through = CSSubmissionCable.cbns.get_through_model()
+        cable_fk = through._meta.rel_for_model(CSSubmissionCable)
+        cbn_fk = through._meta.rel_for_model(ChallengeBinaryNode)
+        existing = set()
+        if any(ids is not None for _, _, ids in self._cses):
+            existing = self._existing_cbns_cables(through, cable_fk, cbn_fk)
+
+        pending = []
+        for cs, cbns, ids in self._cses:
+            if ids is None:
+                pending.append((cs, cbns, IDSRule.create(cs=cs, rules='')))
+                continue
+            key = (cs.id, ids.id, frozenset(c.id for c in cbns))
+            if key in existing:
+                LOG.debug("%s - cable already in place", cs.name)
+                continue
+            existing.add(key)
+            pending.append((cs, cbns, ids))
+        if not pending:
+            return
+
+        cable_ids = CSSubmissionCable.insert_many([
+            {'cs': cs, 'ids': ids, 'round': self.round} for cs, _, ids in pending
+        ]).return_id_list().execute()
+
+        through.insert_many([
+            {cable_fk.name: cable_id, cbn_fk.name: cbn.id}
+            for cable_id, (_, cbns, _) in zip(cable_ids, pending) for cbn in cbns
+        ]).execute()
+
+        LOG.debug("%d CS cables created", len(pending))
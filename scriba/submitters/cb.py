@@ -3,18 +3,26 @@
 
 from __future__ import absolute_import, unicode_literals
 
-from farnsworth.models import (ChallengeSet,
-                               CSSubmissionCable,
+import os
+
+from farnsworth.models import (ChallengeBinaryNode,
                                ChallengeSetFielding,
                                Crash,
-                               Exploit,
                                ExploitSubmissionCable,
                                PatcherexJob,
-                               PatchType,
-                               IDSRule,
-                               Round,
-                               Team)
-
+                               PatchScore,
+                               PollFeedback)
+
+from scriba.audit import AUDIT, CB
+from scriba.dirty import DIRTY_TRACKING, DirtyTracker
+from scriba.instrumentation import span
+from scriba.snapshot import RoundSnapshot
+from . import decision, digests, metadata, strategies
+from .cables import CableView, CableWriter
+from .engine import DecisionEngine
+from .rotation import rotation
+from .scores import ScoreCache
+from .timeline import ExploitTimeline
 from . import LOG as _PARENT_LOG
 LOG = _PARENT_LOG.getChild('cb')
 
@@ -36,85 +44,107 @@ LOCAL_CB_SCORE_THRESHOLD = 0.3
 # Expected number of rounds any CS will be available in future.
 MIN_CS_LIFE_ROUNDS = 10
 
+# Number of CSes evaluated in parallel, each worker holds a database connection.
+CB_WORKERS = int(os.environ.get('SCRIBA_CB_WORKERS', 1))
+
+SIMPLE_DECISION_LOGS = {
+    decision.NEW_CS: "not patching in the first round",
+    decision.NO_FIELDING: "hit the race condition for latest fielding being None",
+    decision.DOWNED_ROUND: "skipping 'downed' round",
+    decision.NO_PATCHES: "no patches ready yet",
+    decision.ALREADY_PATCHED: "already patched -- aborting!",
+    decision.RESUBMISSION: "nothing to do, this would be a resubmission",
+    decision.SUBMIT_PULL_BACK: "pulling back the patch :-(",
+    decision.SUBMIT_BEST_PATCH: "chose the best patch type, not yet submitted this round!",
+    decision.SUBMIT_CURRENT: "not patching because we first found an exploit last round",
+}
+
 ORIG_PATCH_ORDER = PatcherexJob.PATCH_TYPES.keys()
-NEXT_PATCH_ORDER = list(ORIG_PATCH_ORDER)
-ORDERS = { }
+ROTATION = rotation(ORIG_PATCH_ORDER)
 
 class CBSubmitter(object):
 
+    # Code of the submitter in the audit log and the checkpoints
+    AUDIT_KIND = CB
+
+    # Tables whose changes make a new run worthwhile, see scriba.scheduler
+    INPUTS = (ChallengeBinaryNode, ChallengeSetFielding, PollFeedback, PatchScore,
+              (ExploitSubmissionCable, ExploitSubmissionCable.processed_at))
+
+    # The same inputs per CS, see scriba.dirty
+    CS_INPUTS = ((ChallengeBinaryNode, ChallengeBinaryNode.cs),
+                 (ChallengeSetFielding, ChallengeSetFielding.cs),
+                 (PollFeedback, PollFeedback.cs),
+                 (PatchScore, PatchScore.cs),
+                 (ExploitSubmissionCable, ExploitSubmissionCable.cs,
+                  ExploitSubmissionCable.processed_at))
+
     def __init__(self):
         self.patch_submission_order = None
         self.submission_index = 0
         self.available_patch_types = set()
+        self.exploit_timeline = ExploitTimeline()
+        self.scores = ScoreCache()
+        self.cable_view = CableView()
+        self.tracker = DirtyTracker(self.CS_INPUTS)
 
     @staticmethod
-    def blacklisted(cbs):
-        LOG.debug("Checking CBS...")
-        actual_min = cbs[0].min_cb_score
-        if actual_min is not None:
-            LOG.debug("... have an actual poll")
-            return actual_min < MIN_CB_SCORE
-
-        estimation = cbs[0].estimated_feedback
-        if estimation is None:
-            LOG.debug("... no feedback yet")
-            return True
-        elif estimation.has_failed_polls:
-            LOG.debug("... has failed polls in estimation")
-            return True
-        elif estimation.cb_score < LOCAL_CB_SCORE_THRESHOLD:
-            LOG.debug("... estimated score %s too low", estimation.cb_score)
-            return True
+    def patch_scores(cbs, scores=None, fielded=False):
+        """decision.PatchScores of the patch type of cbs, fieldings are only counted if fielded."""
+        if scores is None:
+            scores = ScoreCache()
+        actual_min = scores.min_cb_score(cbs[0])
+        estimated = failed_polls = None
+        if actual_min is None:
+            estimation = scores.estimated_feedback(cbs[0])
+            if estimation is not None:
+                estimated, failed_polls = estimation.cb_score, estimation.has_failed_polls
+        return decision.PatchScores(actual_min, estimated, failed_polls, scores.cb_score(cbs[0]),
+                                    len(cbs[0].fieldings) if fielded else None)
 
-        return False
+    @staticmethod
+    def blacklisted(cbs, scores=None):
+        return decision.blacklisted(CBSubmitter.patch_scores(cbs, scores),
+                                    MIN_CB_SCORE, LOCAL_CB_SCORE_THRESHOLD)
 
     @staticmethod
-    def same_cbns(a_list, b_list):
-        b_ids = [b.sha256 for b in b_list]
-        return len(a_list) == len(b_list) and all(a.sha256 in b_ids for a in a_list)
+    def same_cbns(a, b):
+        """Are a and b, lists of CBNs, fieldings, cables or digests, the same CBNs?"""
+        return digests.same_cbns(a, b)
 
     @staticmethod
-    def cb_score(cb):
-        return cb.min_cb_score if len(cb.poll_feedbacks) else cb.estimated_cb_score
+    def cb_score(cb, scores=None):
+        if scores is None:
+            scores = ScoreCache()
+        return scores.cb_score(cb)
 
     @staticmethod
-    def patch_decision(target_cs):
+    def patch_decision(target_cs, snapshot=None):
         """
         Determines the CBNs to submit. Returns None if no submission should be made.
         """
-        fielding = ChallengeSetFielding.latest(target_cs, Team.get_our())
-        fielded_patch_type = fielding.cbns[0].patch_type
-        current_cbns = list(fielding.cbns)
-
-        all_patches = target_cs.cbns_by_patch_type()
-        allowed_patches = {
-            k:v for k,v in all_patches.items()
-            if not CBSubmitter.blacklisted(v)
-        }
-
-        if not allowed_patches:
-            # All of the patches are blacklisted, or none exist -- submit the originals
-            if not CBSubmitter.same_cbns(target_cs.cbns_original, current_cbns):
-                return list(target_cs.cbns_original)
-            else:
-                return
-
-        allowed_patch_type = fielded_patch_type in allowed_patches.keys()
-        if allowed_patch_type:
-            enough_data = len(allowed_patches[fielded_patch_type][0].fieldings) > MIN_ROUNDS_ONLINE
-            if not enough_data:
-                LOG.debug("Old patch (%s) too fresh on %s, leaving it in.",
-                          fielded_patch_type.name, target_cs.name)
-                return
-
-        to_submit_patch_type, _ = sorted(allowed_patches.items(),
-                                         key=lambda i: CBSubmitter.cb_score(i[1][0]),
-                                         reverse=True)[0]
-
-        if to_submit_patch_type is fielded_patch_type:
+        if snapshot is None:
+            snapshot = RoundSnapshot()
+        fielding = ChallengeSetFielding.latest(target_cs, snapshot.our_team)
+        fielding_cbns = metadata.fielding_cbns(fielding)
+        fielded_patch_type = fielding_cbns[0].patch_type
+        current_cbns = digests.cbns_digest(fielding, fielding_cbns)
+
+        all_patches = dict((pt.id, cbns)
+                           for pt, cbns in metadata.cbns_by_patch_type(target_cs).items())
+        fielded = fielded_patch_type.id if fielded_patch_type is not None else None
+        patches = dict((pt_id, CBSubmitter.patch_scores(cbns, snapshot.scores, pt_id == fielded))
+                       for pt_id, cbns in all_patches.items())
+        choice, pt_id = decision.decide_scored(patches, fielded, MIN_CB_SCORE,
+                                               LOCAL_CB_SCORE_THRESHOLD, MIN_ROUNDS_ONLINE)
+
+        if choice == decision.ORIGINAL:
+            new_cbns = metadata.original_cbns(target_cs)
+        elif choice == decision.SCORED_PATCH:
+            new_cbns = all_patches[pt_id]
+        else:
+            LOG.debug("Leaving the fielded CBNs of %s in place", target_cs.name)
             return
-
-        new_cbns = all_patches[to_submit_patch_type]
         if not CBSubmitter.same_cbns(new_cbns, current_cbns):
             return new_cbns
 
@@ -123,9 +153,11 @@ class CBSubmitter(object):
     #
 
     @staticmethod
-    def blacklisted_simple(cbs):
+    def blacklisted_simple(cbs, scores=None):
+        if scores is None:
+            scores = ScoreCache()
         LOG.debug("Checking CBS...")
-        actual_min = cbs[0].min_cb_score
+        actual_min = scores.min_cb_score(cbs[0])
         if actual_min is not None:
             LOG.debug("... have an actual poll")
             return actual_min < MIN_CB_SCORE
@@ -141,177 +173,177 @@ class CBSubmitter(object):
         return False
 
     @staticmethod
-    def patch_decision_simple(target_cs, round_):
+    def simple_features(target_cs, round_, snapshot):
         """
-        Determines the CBNs to submit. Returns None if no submission should be made.
-        We only submit 1 patch type per CS.
+        Extract the decision.CSFeatures of target_cs for patch_decision_simple.
+        Returns the features and the CBNs of every decision choice; the
+        extraction stops at the first feature that settles the decision.
         """
-        LOG.info("CB SUBMISSION START: %s (round %d)", target_cs.name, round_.num)
+        features = decision.DEFAULT_FEATURES
+        choices = {}
 
         # make sure that this binary is not new this round
         if not (
-            target_cs.id in [ cs.id for cs in ChallengeSet.fielded_in_round(round_) ] and
-            Round.prev_round() is not None and
-            target_cs.id in [ cs.id for cs in ChallengeSet.fielded_in_round(Round.prev_round()) ]
+            target_cs.id in snapshot.fielded_ids(round_) and
+            snapshot.prev_round is not None and
+            target_cs.id in snapshot.fielded_ids(snapshot.prev_round)
         ):
-            LOG.info("%s - not patching in the first round", target_cs.name)
-            return
+            return features._replace(fielded_before=False), choices
 
-        current_fielding = ChallengeSetFielding.latest(cs=target_cs, team=Team.get_our(), round=round_)
+        current_fielding = ChallengeSetFielding.latest(cs=target_cs, team=snapshot.our_team, round=round_)
 
         # Fielding should always be not None, or we are in a
         # race condition and do not want to do anything right
         # now, we will be run again, at which point fieldings
         # should be set.
         if current_fielding is None:
-            LOG.warning("%s - hit the race condition for latest fielding being None", target_cs.name)
-            return
+            return features._replace(has_fielding=False), choices
 
-        LOG.info(
+        current_cbns = metadata.fielding_cbns(current_fielding)
+        current_digest = digests.cbns_digest(current_fielding, current_cbns)
+        choices[decision.CURRENT] = current_cbns
+        LOG.debug(
             "%s - current patch type: %s", target_cs.name, (
-                current_fielding.cbns[0].patch_type.name
-                if current_fielding.cbns[0].patch_type is not None else
+                current_cbns[0].patch_type.name
+                if current_cbns[0].patch_type is not None else
                 "None"
             )
         )
 
         # if we just submitted, wait a round before making any decisions
-        if current_fielding.poll_feedback is not None and (
-            current_fielding.poll_feedback.timeout + current_fielding.poll_feedback.success +
-            current_fielding.poll_feedback.function + current_fielding.poll_feedback.connect == 0
+        feedback = current_fielding.poll_feedback
+        if feedback is not None and (
+            feedback.timeout + feedback.success + feedback.function + feedback.connect == 0
         ):
-            LOG.warning("%s - skipping 'downed' round", target_cs.name)
-            return
+            return features._replace(downed=True), choices
 
         # if we don't have any patches ready, let's wait
-        all_patches = target_cs.cbns_by_patch_type()
+        all_patches = metadata.cbns_by_patch_type(target_cs)
         if len(all_patches) == 0:
-            return
+            return features._replace(has_patches=False), choices
 
         best_patch_type = sorted(all_patches.keys(), key=lambda pt: pt.exploitability)[0]
-        has_feedback = { k:v for k,v in all_patches.iteritems() if len(v[0].poll_feedbacks) > 0 }
-        pull_back = any(
-            cbns[0].min_cb_score is not None and cbns[0].min_cb_score < MIN_CB_SCORE
-            for cbns in all_patches.values()
-        )
+        LOG.debug("%s - best patch type: %s", target_cs.name, best_patch_type.name)
+        min_scores = {k: snapshot.scores.min_cb_score(v[0]) for k, v in all_patches.iteritems()}
+        for k, min_score in min_scores.items():
+            if min_score is not None:
+                LOG.debug("%s - minimum score of patch %s is %s", target_cs.name, k.name, min_score)
+        known_scores = [m for m in min_scores.values() if m is not None]
 
-        for k,v in has_feedback.items():
-            LOG.info(
-                "%s - minimum score of patch %s is %s",
-                target_cs.name,
-                k.name,
-                v[0].min_cb_score
-            )
-
-        if pull_back:
-            LOG.info("%s - pulling back the patch :-(", target_cs.name)
-            new_cbns = target_cs.cbns_original
-        else:
-            # if we've already patched, and we're not pulling back, forget about it
-            if best_patch_type.name != 'manual' and not CBSubmitter.same_cbns(current_fielding.cbns, target_cs.cbns_original):
-                LOG.info("%s - already patched -- aborting!", target_cs.name)
-                return
-
-            LOG.info("%s - chose %s patch type!", target_cs.name, best_patch_type.name)
-            new_cbns = all_patches[best_patch_type]
+        original_cbns = metadata.original_cbns(target_cs)
+        choices[decision.ORIGINAL] = original_cbns
+        choices[decision.BEST_PATCH] = all_patches[best_patch_type]
 
         # Check if we have submitted in this round?
         submitted_fielding = ChallengeSetFielding.submissions(
-            cs=target_cs, team=Team.get_our(), round=round_
+            cs=target_cs, team=snapshot.our_team, round=round_
         )
-
         if submitted_fielding is not None:
-            LOG.info("%s - we have an earlier submission this round...", target_cs.name)
-            prior_submission = list(submitted_fielding.cbns)
-        else:
-            LOG.info("%s - submitting for the first time this round...", target_cs.name)
-            prior_submission = list(current_fielding.cbns)
-
-        # if we submitted an exploit for the first time this round, let's not patch
-        if not pull_back and ExploitSubmissionCable.select().join(Exploit).where(
-            (ExploitSubmissionCable.cs == target_cs) &
-            (ExploitSubmissionCable.processed_at != None) &
-            (ExploitSubmissionCable.processed_at >= round_.created_at) &
-            (Exploit.method != "backdoor")
-        ).exists() and not ExploitSubmissionCable.select().join(Exploit).where(
-                (ExploitSubmissionCable.cs == target_cs) &
-                (ExploitSubmissionCable.processed_at != None) &
-                (ExploitSubmissionCable.processed_at < round_.created_at) &
-                (Exploit.method != "backdoor")
-        ).exists():
-            LOG.info("%s - not submitting because we first found an exploit last round", target_cs.name)
-            new_cbns = list(current_fielding.cbns)
-
-        if CBSubmitter.same_cbns(new_cbns, prior_submission):
-            LOG.info("%s - nothing to do, this would be a resubmission", target_cs.name)
-            return
+            LOG.debug("%s - we have an earlier submission this round...", target_cs.name)
+            prior_digest = digests.cbns_digest(submitted_fielding)
         else:
-            LOG.info("%s - we have not yet submitted these CBNs this round!", target_cs.name)
+            LOG.debug("%s - submitting for the first time this round...", target_cs.name)
+            prior_digest = current_digest
+
+        original_digest = digests.digest(original_cbns)
+        best_digest = digests.digest(choices[decision.BEST_PATCH])
+        return decision.CSFeatures(
+            fielded_before=True,
+            has_fielding=True,
+            downed=False,
+            has_patches=True,
+            min_score=min(known_scores) if known_scores else None,
+            best_is_manual=best_patch_type.name == 'manual',
+            current_is_original=current_digest == original_digest,
+            exploit_found=snapshot.exploit_timeline.first_found_since(target_cs.id, round_.created_at),
+            best_is_prior=best_digest == prior_digest,
+            original_is_prior=original_digest == prior_digest,
+            current_is_prior=current_digest == prior_digest,
+        ), choices
 
-        return new_cbns
+    @staticmethod
+    def patch_decision_simple(target_cs, round_, snapshot=None, audit=True):
+        """
+        Determines the CBNs to submit. Returns None if no submission should be made.
+        We only submit 1 patch type per CS. The decision is recorded in the
+        audit log if audit.
+        """
+        LOG.debug("CB SUBMISSION START: %s (round %d)", target_cs.name, round_.num)
+
+        if snapshot is None:
+            snapshot = RoundSnapshot(round_)
+
+        features, choices = CBSubmitter.simple_features(target_cs, round_, snapshot)
+        reason, choice = decision.decide(features, MIN_CB_SCORE)
+        LOG.debug("%s - %s", target_cs.name, SIMPLE_DECISION_LOGS[reason])
+        cbns = choices.get(choice)
+        if audit:
+            AUDIT.cb(round_.num, target_cs.id, snapshot.our_team.id, features, reason, choice, cbns)
+
+        if choice == decision.NOTHING:
+            return
+        return cbns
 
     @staticmethod
-    def process_patch_submission(target_cs):
+    def process_patch_submission(target_cs, snapshot=None, strategy='simple'):
         """
         Process a patch submission request for the provided ChallengeSet
         :param target_cs: ChallengeSet for which the request needs to be processed.
+        :param snapshot: RoundSnapshot of the current pass, loaded if not provided.
+        :param strategy: name of the registered strategy deciding the submission,
+                         CBSubmitter.run goes by SCRIBA_CB_STRATEGY instead.
+        """
+        if snapshot is None:
+            snapshot = RoundSnapshot()
+        round_ = snapshot.round
+        with span('cb.process_patch_submission', cs=target_cs.name, round=round_.num):
+            cbns_to_submit = strategies.get(strategy).decide(target_cs, snapshot)
+            CBSubmitter.submit_cbns(target_cs, cbns_to_submit, round_)
+
+    @staticmethod
+    def submit_cbns(target_cs, cbns_to_submit, round_, writer=None):
+        """
+        Write the CSSubmissionCable for a decision of a strategy.
+        :param cbns_to_submit: CBNs to submit, None to leave the fielded ones.
+        :param writer: CableWriter of the pass, the cable is written right away if None.
         """
-        round_ = Round.current_round()
-        cbns_to_submit = CBSubmitter.patch_decision_simple(target_cs, round_)
         if cbns_to_submit is not None:
-            if cbns_to_submit[0].ids_rule is None:
-                ids = IDSRule.create(cs=target_cs, rules='')
-            else:
-                ids = cbns_to_submit[0].ids_rule
-            CSSubmissionCable.get_or_create(cs=target_cs, cbns=cbns_to_submit, ids=ids, round=round_)
+            flush = writer is None
+            if writer is None:
+                writer = CableWriter(round_)
+            # An empty IDS rule is created by the writer if the CBNs have none
+            writer.add_cbns(target_cs, cbns_to_submit, cbns_to_submit[0].ids_rule)
+            if flush:
+                writer.flush()
         else:
-            LOG.info("%s - leaving old CBNs in place for", target_cs.name)
+            LOG.debug("%s - leaving old CBNs in place for", target_cs.name)
 
     @staticmethod
-    def rotator_submission(target_cs):
-        global NEXT_PATCH_ORDER
-
-        round_ = Round.current_round()
-
-        if target_cs.name not in ORDERS or len(ORDERS[target_cs.name]) == 0:
-            ORDERS[target_cs.name] = list(NEXT_PATCH_ORDER)
-            #print target_cs.name, NEXT_PATCH_ORDER
-            NEXT_PATCH_ORDER = NEXT_PATCH_ORDER[1:] + NEXT_PATCH_ORDER[:1]
-
-        all_patches = target_cs.cbns_by_patch_type()
-        for n in ORDERS[target_cs.name]:
-            pt = PatchType.get(name=n)
-            if pt not in all_patches:
-                continue
-            ORDERS[target_cs.name].remove(n)
-            cbns = all_patches[pt]
-            print "SUBMITTING", target_cs.name, cbns[0].name, cbns[0].patch_type.name
-            c, _ = CSSubmissionCable.get_or_create(cs=target_cs,
-                                                   cbns=cbns,
-                                                   ids=cbns[0].ids_rule,
-                                                   round=round_)
-            print "...", c.id
-            break
+    def rotator_decision(target_cs):
+        """Next patch type of the rotation of target_cs that has CBNs, advances the rotation."""
+        all_patches = {pt.name: cbns for pt, cbns in metadata.cbns_by_patch_type(target_cs).items()}
+        name = ROTATION.advance(target_cs.name, all_patches)
+        if name is not None:
+            return all_patches[name]
 
     @staticmethod
-    def should_submit(target_cs):
+    def should_submit(target_cs, snapshot=None):
+        if snapshot is None:
+            snapshot = RoundSnapshot()
+
         # FIXME: this should be generalized per challenge set introduction
         # don't submit on the first round
-        if Round.current_round().num == 0:
+        if snapshot.num == 0:
             LOG.info("Not submitting on round 0.")
             return False
 
         # don't submit if we haven't submitted an exploit before this round
-        if ExploitSubmissionCable.select().join(Exploit).where(
-            (ExploitSubmissionCable.cs == target_cs) &
-            (ExploitSubmissionCable.processed_at != None) &
-            (ExploitSubmissionCable.processed_at <= Round.current_round().created_at) &
-            (Exploit.method != "backdoor")).exists():
+        if snapshot.exploit_timeline.exploited_by(target_cs.id, snapshot.round.created_at):
             LOG.info("There's an exploit that's over a round old!.")
             return True
 
         # don't submit if we haven't found an crash before the last round
-        prev_round = Round.prev_round()
+        prev_round = snapshot.prev_round
         if prev_round is not None and Crash.select().where(
                 (Crash.cs == target_cs) &
                 (Crash.created_at <= prev_round.created_at)).exists():
@@ -321,13 +353,103 @@ class CBSubmitter(object):
         LOG.info("Patch conditions not met!")
         return False
 
-    def run(self, current_round=None, random_submit=False): # pylint:disable=no-self-use,unused-argument
-        return
+    def run(self, current_round=None, random_submit=False, snapshot=None, deadline=None): # pylint:disable=unused-argument
         if current_round == 0:
             return
+        live = strategies.get(strategies.CB_STRATEGY)
+        shadows = [strategies.get(name, shadow=True) for name in strategies.CB_SHADOW_STRATEGIES]
+        if live.name == 'none' and not shadows:
+            return
+
+        if snapshot is None:
+            snapshot = RoundSnapshot()
+        self.submit(snapshot, deadline=deadline, live=live, shadows=shadows)
 
+    def submit(self, snapshot, deadline=None, live=None, shadows=()):
+        """
+        Decide and write the CB submissions of every CS fielded in the
+        snapshot round, with the live strategy. The shadow strategies decide
+        on the same snapshot, their decisions are only compared and logged.
+        """
+        round_ = snapshot.round
+        snapshot.exploit_timeline = self.exploit_timeline.refresh()
+        snapshot.scores = self.scores.refresh()
+        if live is None:
+            live = strategies.get('simple')
+        for shadow in shadows:
+            if shadow.stateful:
+                raise ValueError("Strategy %s is stateful, it cannot run in shadow mode" % shadow.name)
+            if not shadow.shadow:
+                raise ValueError("Strategy %s is not in shadow mode, see strategies.get" % shadow.name)
+        report = strategies.ShadowReport(live, shadows)
+
+        def decide(cs):
+            #if not self.should_submit(cs, snapshot=snapshot):
+            #   return
+            with span('cb.decide', cs=cs.name, round=round_.num, strategy=live.name):
+                live_decision = live.decide(cs, snapshot)
+            shadow_decisions = []
+            for shadow in shadows:
+                with span('cb.shadow', cs=cs.name, round=round_.num, strategy=shadow.name):
+                    shadow_decisions.append(shadow.decide(cs, snapshot))
+            return live_decision, shadow_decisions
+
+        # A stateful strategy moves on with every call, it decides on every CS
+        cses = [cs for cs in snapshot.fielded_in_round() if snapshot.in_shard(cs.id)]
+        self.tracker.enabled = DIRTY_TRACKING and not live.stateful
+        dirty, marks = self.tracker.changed([cs.id for cs in cses], round_.num)
+
+        # Decisions are only read from the database, and can be evaluated in
+        # parallel; the cables are written here, in fielding order.
         # As ambassador will take care of actually submitting the binary.
-        for cs in ChallengeSet.fielded_in_round():
-            #if not self.should_submit(cs):
-            #   continue
-            CBSubmitter.process_patch_submission(cs)
+        engine = DecisionEngine(decide, workers=1 if live.stateful else CB_WORKERS)
+        writer = CableWriter(round_, view=self.cable_view)
+        decided = []
+        cses = [cs for cs in cses if cs.id in dirty]
+        for cs, (cbns_to_submit, shadow_decisions) in engine.map(cses, deadline=deadline):
+            report.compare(cs, cbns_to_submit, shadow_decisions)
+            CBSubmitter.submit_cbns(cs, cbns_to_submit, round_, writer=writer)
+            decided.append(cs.id)
+        with span('cb.write', round=round_.num):
+            writer.flush()
+        for cs_id in decided:
+            self.tracker.done(cs_id, marks)
+        AUDIT.flush()
+        LOG.info("Round #%d: %d CB cable writes applied, %d skipped",
+                 snapshot.num, self.cable_view.applied, self.cable_view.skipped)
+        report.log(snapshot.num)
+
+
+@strategies.register('none')
+class NoStrategy(strategies.Strategy):
+    """Never submits anything, leaves the original binaries fielded."""
+
+    def decide(self, target_cs, snapshot):
+        return None
+
+
+@strategies.register('simple')
+class SimpleStrategy(strategies.Strategy):
+    """Best exploitability patch, pulled back below MIN_CB_SCORE."""
+
+    def decide(self, target_cs, snapshot):
+        return CBSubmitter.patch_decision_simple(target_cs, snapshot.round, snapshot=snapshot,
+                                                 audit=not self.shadow)
+
+
+@strategies.register('scored')
+class ScoredStrategy(strategies.Strategy):
+    """Best cb_score among the patch types that are not blacklisted."""
+
+    def decide(self, target_cs, snapshot):
+        return CBSubmitter.patch_decision(target_cs, snapshot=snapshot)
+
+
+@strategies.register('rotator')
+class RotatorStrategy(strategies.Strategy):
+    """Every patch type in turn, for testing."""
+
+    stateful = True
+
+    def decide(self, target_cs, snapshot):
+        return CBSubmitter.rotator_decision(target_cs)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Database-free core of the CB submission strategies.
+
+CBSubmitter.patch_decision_simple extracts a CSFeatures record per CS and
+hands it to decide(); decide_batch() evaluates a whole FeatureTable, e.g.
+to simulate thousands of game states without a database.
+CBSubmitter.patch_decision does the same with the PatchScores of every
+patch type and decide_scored().
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+from array import array
+from collections import namedtuple
+
+# Why a decision was taken. The first four settle the decision before any
+# patch is looked at; SUBMIT_* mean a cable has to be written.
+NEW_CS = 1
+NO_FIELDING = 2
+DOWNED_ROUND = 3
+NO_PATCHES = 4
+ALREADY_PATCHED = 5
+RESUBMISSION = 6
+SUBMIT_PULL_BACK = 7
+SUBMIT_BEST_PATCH = 8
+SUBMIT_CURRENT = 9
+
+REASONS = {
+    NEW_CS: 'new_cs',
+    NO_FIELDING: 'no_fielding',
+    DOWNED_ROUND: 'downed_round',
+    NO_PATCHES: 'no_patches',
+    ALREADY_PATCHED: 'already_patched',
+    RESUBMISSION: 'resubmission',
+    SUBMIT_PULL_BACK: 'submit_pull_back',
+    SUBMIT_BEST_PATCH: 'submit_best_patch',
+    SUBMIT_CURRENT: 'submit_current',
+}
+
+# What to submit: nothing, the original CBNs, the CBNs of the patch type
+# with the best exploitability, the currently fielded CBNs, or the CBNs of
+# the patch type with the best score.
+NOTHING = 0
+ORIGINAL = 1
+BEST_PATCH = 2
+CURRENT = 3
+SCORED_PATCH = 4
+
+CSFeatures = namedtuple('CSFeatures', [
+    'fielded_before',       # fielded in this round and in the previous one
+    'has_fielding',         # our latest fielding is known
+    'downed',               # the fielding got no polls at all, we just submitted
+    'has_patches',          # at least one patch type is ready
+    'min_score',            # lowest min_cb_score over the patch types, None if unknown
+    'best_is_manual',       # the best patch type is the manual one
+    'current_is_original',  # the fielded CBNs are the original ones
+    'exploit_found',        # we threw our first exploit this round
+    'best_is_prior',        # the best patch CBNs are the ones already submitted
+    'original_is_prior',    # the original CBNs are the ones already submitted
+    'current_is_prior',     # the fielded CBNs are the ones already submitted
+])
+
+# Features of a CS with nothing special about it, _replace() what differs
+DEFAULT_FEATURES = CSFeatures(True, True, False, True, None, False, True, False,
+                              False, False, True)
+
+Decision = namedtuple('Decision', ['reason', 'choice'])
+
+
+def _decide(fielded_before, has_fielding, downed, has_patches, min_score, best_is_manual,
+            current_is_original, exploit_found, best_is_prior, original_is_prior,
+            current_is_prior, min_cb_score):
+    # pylint: disable=too-many-arguments,too-many-return-statements
+    if not fielded_before:
+        return NEW_CS, NOTHING
+    if not has_fielding:
+        return NO_FIELDING, NOTHING
+    if downed:
+        return DOWNED_ROUND, NOTHING
+    if not has_patches:
+        return NO_PATCHES, NOTHING
+
+    # NaN, the array representation of None, is never lower than anything
+    pull_back = min_score is not None and min_score < min_cb_score
+    if pull_back:
+        reason, choice, is_prior = SUBMIT_PULL_BACK, ORIGINAL, original_is_prior
+    elif not best_is_manual and not current_is_original:
+        return ALREADY_PATCHED, NOTHING
+    else:
+        reason, choice, is_prior = SUBMIT_BEST_PATCH, BEST_PATCH, best_is_prior
+
+    # if we submitted an exploit for the first time this round, let's not patch
+    if not pull_back and exploit_found:
+        reason, choice, is_prior = SUBMIT_CURRENT, CURRENT, current_is_prior
+
+    if is_prior:
+        return RESUBMISSION, NOTHING
+    return reason, choice
+
+
+def decide(features, min_cb_score):
+    """Decision for one CS, pull back any patch scoring below min_cb_score."""
+    return Decision(*_decide(*features, min_cb_score=min_cb_score))
+
+
+class FeatureTable(object):
+    """CSFeatures of many CSes, one compact array per field."""
+
+    def __init__(self, records=()):
+        self.columns = [array(b'd') if field == 'min_score' else array(b'B')
+                        for field in CSFeatures._fields]
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def append(self, features):
+        for column, value in zip(self.columns, features):
+            if column.typecode == 'd':
+                column.append(float('nan') if value is None else value)
+            else:
+                column.append(1 if value else 0)
+
+    def column(self, field):
+        return self.columns[CSFeatures._fields.index(field)]
+
+
+def decide_batch(table, min_cb_score):
+    """
+    Decisions for every CS of table, as two arrays: the reasons and the
+    choices, in table order.
+    """
+    reasons = array(b'B')
+    choices = array(b'B')
+    for row in zip(*table.columns):
+        reason, choice = _decide(*row, min_cb_score=min_cb_score)
+        reasons.append(reason)
+        choices.append(choice)
+    return reasons, choices
+
+
+PatchScores = namedtuple('PatchScores', [
+    'min_score',            # lowest polled cb_score, None before the first poll
+    'estimated',            # cb_score of the estimated feedback, None without one
+    'failed_polls',         # the estimated feedback has failed polls
+    'cb_score',             # min_score once polled, the estimated cb_score until then
+    'fieldings',            # number of fieldings, only looked at for the fielded type
+])
+
+
+def blacklisted(patch, min_cb_score, local_cb_score_threshold):
+    """Should the patch type with PatchScores patch never be submitted?"""
+    if patch.min_score is not None:
+        return patch.min_score < min_cb_score
+    if patch.estimated is None or patch.failed_polls:
+        return True
+    return patch.estimated < local_cb_score_threshold
+
+
+def decide_scored(patches, fielded, min_cb_score, local_cb_score_threshold, min_rounds_online):
+    """
+    Blacklist-and-score decision for one CS. patches maps every patch type
+    to its PatchScores, fielded is the fielded patch type, None for the
+    original CBNs. Returns (ORIGINAL, None), (SCORED_PATCH, patch type)
+    or (NOTHING, None).
+    """
+    allowed = [pt for pt in sorted(patches)
+               if not blacklisted(patches[pt], min_cb_score, local_cb_score_threshold)]
+    if not allowed:
+        # All of the patches are blacklisted, or none exist -- submit the originals
+        return (ORIGINAL, None) if fielded is not None else (NOTHING, None)
+
+    # leave a fresh patch in until it was fielded long enough
+    if fielded in allowed and patches[fielded].fieldings <= min_rounds_online:
+        return NOTHING, None
+
+    best = sorted(allowed, key=lambda pt: patches[pt].cb_score, reverse=True)[0]
+    if best == fielded:
+        return NOTHING, None
+    return SCORED_PATCH, best
@@ -0,0 +1,35 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""CBN sets as frozensets of their sha256, compared in O(1)."""
+
+from __future__ import absolute_import, unicode_literals
+
+from farnsworth.models import ChallengeBinaryNode
+
+
+def cbns_digest(owner, cbns=None):
+    """
+    Digest of the CBNs of a fielding or a cable, cached on owner. Computed
+    from cbns when they are already loaded, otherwise from a query for
+    their sha256 alone, which does not load the blobs.
+    """
+    digest = getattr(owner, '_cbns_digest', None)
+    if digest is None:
+        if cbns is None:
+            cbns = owner.cbns.select(ChallengeBinaryNode.sha256)
+        digest = owner._cbns_digest = frozenset(c.sha256 for c in cbns)
+    return digest
+
+
+def digest(cbns):
+    """Digest of a list of CBNs, a fielding or a cable, or a digest."""
+    if isinstance(cbns, frozenset):
+        return cbns
+    if hasattr(cbns, '_cbns_digest') or hasattr(cbns, 'cbns'):
+        return cbns_digest(cbns)
+    return frozenset(c.sha256 for c in cbns)
+
+
+def same_cbns(a, b):
+    return digest(a) == digest(b)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Evaluate per-ChallengeSet decisions on a bounded pool of worker threads."""
+
+from __future__ import absolute_import, unicode_literals
+
+import sys
+import threading
+from Queue import Queue, Empty
+
+from farnsworth.models import Round
+
+from scriba.instrumentation import METRICS
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('engine')
+
+
+class DecisionEngine(object):
+    """
+    Maps a read-only decision function over a list of items. Every worker
+    thread holds at most one database connection, so workers bounds the
+    database concurrency. Results come back in input order, whatever order
+    the workers finish in, so merging them is deterministic. With a single
+    worker the items are evaluated in the calling thread. The queries of
+    the workers count in the spans open in the calling thread.
+    """
+
+    def __init__(self, decide, workers=1, database=None):
+        self.decide = decide
+        self.workers = max(int(workers), 1)
+        self.database = database if database is not None else Round._meta.database
+
+    def map(self, items, deadline=None):
+        """
+        Return [(item, decision)], items not evaluated before deadline
+        expired are left out.
+        """
+        items = list(items)
+        results = [None] * len(items)
+
+        if self.workers == 1 or len(items) <= 1:
+            for i, item in enumerate(items):
+                if deadline is not None and deadline.expired():
+                    LOG.warning("Deadline expired, %d items left", len(items) - i)
+                    break
+                results[i] = (item, self.decide(item))
+            return [r for r in results if r is not None]
+
+        queue = Queue()
+        for i, item in enumerate(items):
+            queue.put((i, item))
+        errors = []
+        parents = METRICS.current()
+
+        def worker():
+            try:
+                with METRICS.adopt(parents):
+                    self._work(queue, results, errors, deadline)
+            except Exception: # pylint:disable=broad-except
+                errors.append(sys.exc_info())
+            finally:
+                self.database.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(min(self.workers, len(items)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0][0], errors[0][1], errors[0][2]
+
+        done = [r for r in results if r is not None]
+        if len(done) < len(items):
+            LOG.warning("Deadline expired, %d items left", len(items) - len(done))
+        return done
+
+    def _work(self, queue, results, errors, deadline):
+        while not errors:
+            if deadline is not None and deadline.expired():
+                return
+            try:
+                i, item = queue.get_nowait()
+            except Empty:
+                return
+            results[i] = (item, self.decide(item))
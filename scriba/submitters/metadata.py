@@ -0,0 +1,56 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+CBNs without their blob. Scriba only looks at names, hashes, patch types,
+IDS rules and scores; with CBN_METADATA_ONLY the queries below leave the
+blob out, and it is None on the CBNs they return.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+
+from farnsworth.models import ChallengeBinaryNode, PatchType
+
+
+# Load CBNs without their blob, 0 loads the full rows.
+CBN_METADATA_ONLY = os.environ.get('SCRIBA_CBN_METADATA_ONLY', '1') != '0'
+
+
+def metadata_fields():
+    return [f for f in ChallengeBinaryNode._meta.sorted_fields if f.name != 'blob']
+
+
+def _metadata(query):
+    if not CBN_METADATA_ONLY:
+        return query
+    return query.select(*metadata_fields())
+
+
+def fielding_cbns(fielding):
+    """CBNs of a fielding or a cable."""
+    return list(_metadata(fielding.cbns))
+
+
+def original_cbns(cs):
+    """The original CBNs of cs."""
+    return list(_metadata(cs.cbns_original))
+
+
+def cbns_by_patch_type(cs):
+    """
+    Like ChallengeSet.cbns_by_patch_type: the patched CBNs of cs grouped
+    by patch type, with the patch types loaded by the same query.
+    """
+    if not CBN_METADATA_ONLY:
+        return cs.cbns_by_patch_type()
+
+    query = ChallengeBinaryNode.select(*(metadata_fields() + [PatchType])) \
+                               .join(PatchType) \
+                               .where(ChallengeBinaryNode.cs == cs) \
+                               .order_by(ChallengeBinaryNode.id)
+    by_patch_type = {}
+    for cbn in query:
+        by_patch_type.setdefault(cbn.patch_type, []).append(cbn)
+    return by_patch_type
@@ -3,83 +3,237 @@
 
 from __future__ import absolute_import, unicode_literals
 
-from farnsworth.models.challenge_set import ChallengeSet
+import os
+from collections import namedtuple
+
 from farnsworth.models.challenge_set_fielding import ChallengeSetFielding
+from farnsworth.models.exploit import Exploit
 from farnsworth.models.exploit_submission_cable import ExploitSubmissionCable
+from farnsworth.models.ids_rule import IDSRule
 from farnsworth.models.ids_rule_fielding import IDSRuleFielding
 from farnsworth.models.pov_test_result import PovTestResult
-from farnsworth.models.team import Team
 from farnsworth.models.round import Round
 
 import scriba.submitters
+from scriba.audit import AUDIT, POV
+from scriba.dirty import DirtyTracker
+from scriba.instrumentation import span
+from scriba.snapshot import RoundSnapshot
+from scriba.submitters.cables import CableView, CableWriter
+from scriba.submitters.povtests import PovTestMatrix
+from scriba.submitters.ranking import ExploitCandidate, ExploitRanking
 
 LOG = scriba.submitters.LOG.getChild('pov')
 
 
-class POVSubmitter(object):
-
-    def run(self, current_round=None, random_submit=False):
-        for team in Team.opponents():
-            throws = 10
-            for cs in ChallengeSet.fielded_in_round():
-                target_cs_fielding = ChallengeSetFielding.latest(cs, team)
-                target_ids_fielding = IDSRuleFielding.latest(cs, team)
+# Pick the PoV per opponent from the PovTestResults before the most reliable one.
+POV_TEAM_SPECIFIC = os.environ.get('SCRIBA_POV_TEAM_SPECIFIC', '0') == '1'
+
+# Why a PoV was chosen for a (team, CS) pair, recorded in the audit log
+MOST_RELIABLE = 1
+NO_POV = 2
+TESTED = 3
+
+POV_REASONS = {
+    MOST_RELIABLE: 'most_reliable',
+    NO_POV: 'no_pov',
+    TESTED: 'tested',
+}
+
+# The ids of a CS or IDS rule fielding, as PovTestMatrix.lookup needs them
+Fielding = namedtuple('Fielding', ['id', 'cs_id'])
+
+# One planned ExploitSubmissionCable, cable_id is None if it has to be created
+POVSubmission = namedtuple('POVSubmission', ['team', 'cs', 'exploit_id', 'throws', 'cable_id'])
+
+
+class POVPlanner(object):
+    """
+    Plans the PoV submissions for every (opponent, fielded CS) pair of a
+    round. Everything the plan needs is loaded with a few set-based queries
+    instead of a handful of queries per pair.
+    """
+
+    def __init__(self, snapshot, throws=10, ranking=None, view=None, tests=None, cs_ids=None):
+        self.snapshot = snapshot
+        self.cs_ids = cs_ids
+        self.throws = throws
+        self.ranking = ranking
+        self.view = view.for_round(snapshot.num) if view is not None else None
+        self.tests = tests
+        self.cs_fieldings = {}
+        self.ids_fieldings = {}
+        self.cables = {}
+        self.complete = False
+
+    def load(self):
+        round_ = self.snapshot.round
+        if self.cs_ids is None:
+            self.cs_ids = self.snapshot.fielded_ids()
+        cs_ids = self.cs_ids
+        team_ids = [t.id for t in self.snapshot.opponents]
+        if not cs_ids or not team_ids:
+            self.ranking = ExploitRanking([])
+            return self
+
+        # Only the team-specific PoVs look at what the opponents fielded
+        if self.tests is not None:
+            self.cs_fieldings = self._latest(ChallengeSetFielding, ChallengeSetFielding.cs,
+                                             cs_ids, team_ids)
+            self.ids_fieldings = self._latest(IDSRuleFielding, IDSRule.cs, cs_ids, team_ids)
+
+        if self.ranking is None:
+            self.ranking = ExploitRanking(cs_ids).load()
+
+        for cable in ExploitSubmissionCable.select(ExploitSubmissionCable.id,
+                                                   ExploitSubmissionCable.team,
+                                                   ExploitSubmissionCable.cs,
+                                                   ExploitSubmissionCable.exploit) \
+                                           .where(ExploitSubmissionCable.round == round_) \
+                                           .order_by(ExploitSubmissionCable.id):
+            if (cable.team_id, cable.cs_id) not in self.cables:
+                self.cables[(cable.team_id, cable.cs_id)] = cable.id
+                if self.view is not None:
+                    self.view.exploits[(cable.team_id, cable.cs_id)] = cable.exploit_id
+
+        return self
+
+    def _latest(self, model, cs_field, cs_ids, team_ids):
+        """
+        {(team id, cs id): Fielding} of the most recent fielding of model at
+        or before the round, as model.latest(cs, team) would return, in one
+        query for all the pairs.
+        """
+        query = model.select(model.id, model.team, cs_field)
+        if cs_field.model_class is not model:
+            query = query.join(cs_field.model_class).switch(model)
+        query = query.join(Round, on=(model.available_round == Round.id)) \
+                     .where((cs_field << list(cs_ids)) &
+                            (model.team << team_ids) &
+                            (Round.num <= self.snapshot.num)) \
+                     .order_by(Round.num, model.id)
+        # later rounds come last and win
+        return dict(((team_id, cs_id), Fielding(id_, cs_id))
+                    for id_, team_id, cs_id in query.tuples())
+
+    def plan(self, deadline=None):
+        """
+        Compute the submission matrix of the fielded CSes in cs_ids, in
+        memory. Once deadline expires, only the submissions planned so far
+        are returned, and complete stays False.
+        """
+        submissions = []
+        no_fielding = no_pov = 0
+        cses = [cs for cs in self.snapshot.fielded_in_round() if cs.id in self.cs_ids]
+        for team in self.snapshot.opponents:
+            if deadline is not None and deadline.expired():
+                LOG.warning("Deadline expired, submitting what we have")
+                break
+
+            for cs in cses:
                 to_submit_pov = None
-                results = None
-
-                """
-                if target_cs_fielding is not None:
-                    results = PovTestResult.best(target_cs_fielding, target_ids_fielding)
-
-                    if results is None:
-                        results = PovTestResult.best_against_cs_fielding(target_cs_fielding)
-
-                    if results is None:
-                        results = PovTestResult.best_against_cs(target_cs_fielding.cs)
-
-                    if results is not None:
-                        # Good, we have a PovTestResult to submit.
-                        # FIXME: Should we take the most reliable against this CS and IDS?
-                        to_submit_pov = results.exploit
-                        LOG.info("Submitting a tested PoV %s against team=%s cs=%s",
-                                 to_submit_pov.id, team.name, cs.name)
-
-                else:
-                    # No, latest CS fielding, something wrong!!
-                    LOG.warn("No CS fielding available for team=%s cs=%s", team.name, cs.name)
-
-
-                # if the best PoV we have has absolutely no successes, it may as well be nothing
-                if to_submit_pov is not None and results.num_success == 0:
-                    to_submit_pov = None
-                """
+                candidate = None
+
+                if self.tests is not None:
+                    target_cs_fielding = self.cs_fieldings.get((team.id, cs.id))
+                    target_ids_fielding = self.ids_fieldings.get((team.id, cs.id))
+                    if target_cs_fielding is not None:
+                        result = self.tests.lookup(target_cs_fielding, target_ids_fielding)
+                        if result is not None:
+                            # Good, we have a PovTestResult to submit.
+                            # FIXME: Should we take the most reliable against this CS and IDS?
+                            to_submit_pov = result.exploit_id
+                            candidate = self._candidate(cs.id, result.exploit_id)
+                            LOG.debug("Submitting a tested PoV %s against team=%s cs=%s",
+                                      to_submit_pov, team.name, cs.name)
+                    else:
+                        # No, latest CS fielding, something wrong!!
+                        LOG.debug("No CS fielding available for team=%s cs=%s", team.name, cs.name)
+                        no_fielding += 1
 
                 # We do not have a specific PoV, hence submit the most reliable PoV we have
-                if to_submit_pov is None and cs.exploits:
-                    most_reliable = cs.most_reliable_exploit
-                    if most_reliable is not None:
-                        to_submit_pov = most_reliable
-                        LOG.info("Submitting most reliable POV %s against team=%s cs=%s",
-                                    to_submit_pov.id, team.name, cs.name)
-
-                # Submit our PoV
+                reason = TESTED
+                if to_submit_pov is None:
+                    reason = MOST_RELIABLE
+                    candidate = self.ranking.best(cs.id, team.id)
+                    if candidate is not None:
+                        to_submit_pov = candidate.id
+
                 if to_submit_pov is not None:
-                    LOG.info("Submitting PoV %s against team=%s cs=%s",
-                             to_submit_pov.id, team.name, cs.name)
+                    LOG.debug("Submitting PoV %s against team=%s cs=%s",
+                              to_submit_pov, team.name, cs.name)
+                    AUDIT.pov(self.snapshot.num, cs.id, team.id, reason,
+                              len(self.ranking.ranked(cs.id)), candidate)
+                    submissions.append(POVSubmission(team, cs, to_submit_pov, self.throws,
+                                                     self.cables.get((team.id, cs.id))))
+                else:
+                    LOG.debug("No POV to submit for team=%s cs=%s", team.name, cs.name)
+                    no_pov += 1
+                    AUDIT.pov(self.snapshot.num, cs.id, team.id, NO_POV, 0)
+        else:
+            self.complete = True
+
+        if no_fielding:
+            LOG.warning("No CS fielding available for %d team/CS pairs", no_fielding)
+        if no_pov:
+            LOG.warning("No POV to submit for %d team/CS pairs", no_pov)
+        return submissions
+
+    def _candidate(self, cs_id, exploit_id):
+        for candidate in self.ranking.ranked(cs_id):
+            if candidate.id == exploit_id:
+                return candidate
+        return ExploitCandidate(exploit_id, None)
+
+    def write(self, submissions, writer=None):
+        """
+        Upsert the planned cables, in a single transaction. If a CableWriter
+        is given, the cables are only added to it, and the caller flushes.
+        """
+        flush = writer is None
+        if writer is None:
+            writer = CableWriter(self.snapshot.round, view=self.view)
+        for s in submissions:
+            writer.add_exploit(s.team, s.cs, s.exploit_id, s.throws, s.cable_id)
+        if flush:
+            writer.flush()
 
-                    round_ = Round.current_round()
 
-                    if ExploitSubmissionCable.cable_exists(team, cs, round_=round_):
-                        existing_cable = ExploitSubmissionCable.get(team=team, cs=cs, round=round_)
-                        existing_cable.exploit = to_submit_pov
-                        existing_cable.save()
-                    else:
-                        ExploitSubmissionCable.create(team=team,
-                                                      cs=cs,
-                                                      exploit=to_submit_pov,
-                                                      throws=throws,
-                                                      round=Round.current_round())
+class POVSubmitter(object):
 
-                    LOG.debug("POV %s marked for submission", to_submit_pov.id)
-                else:
-                    LOG.warn("No POV to submit for team=%s cs=%s", team.name, cs.name)
+    # Code of the submitter in the audit log and the checkpoints
+    AUDIT_KIND = POV
+
+    # Tables whose changes make a new run worthwhile, see scriba.scheduler
+    INPUTS = (Exploit, ChallengeSetFielding, IDSRuleFielding, PovTestResult)
+
+    # The same inputs per CS, see scriba.dirty
+    CS_INPUTS = ((Exploit, Exploit.cs),
+                 (ChallengeSetFielding, ChallengeSetFielding.cs),
+                 (IDSRuleFielding, IDSRule.cs),
+                 (PovTestResult, ChallengeSetFielding.cs))
+
+    def __init__(self, team_specific=POV_TEAM_SPECIFIC):
+        self.cable_view = CableView()
+        self.pov_tests = PovTestMatrix() if team_specific else None
+        self.tracker = DirtyTracker(self.CS_INPUTS if team_specific else self.CS_INPUTS[:-1])
+
+    def run(self, current_round=None, random_submit=False, snapshot=None, deadline=None):
+        if snapshot is None:
+            snapshot = RoundSnapshot()
+
+        with span('pov.load', round=snapshot.num):
+            cs_ids = [cs_id for cs_id in snapshot.fielded_ids() if snapshot.in_shard(cs_id)]
+            dirty, marks = self.tracker.changed(cs_ids, snapshot.num)
+            tests = self.pov_tests.refresh() if self.pov_tests is not None else None
+            planner = POVPlanner(snapshot, view=self.cable_view, tests=tests, cs_ids=dirty).load()
+        with span('pov.plan', round=snapshot.num):
+            submissions = planner.plan(deadline=deadline)
+        with span('pov.write', round=snapshot.num):
+            planner.write(submissions)
+        if planner.complete:
+            for cs_id in dirty:
+                self.tracker.done(cs_id, marks)
+        AUDIT.flush()
+        LOG.info("Round #%d: %d POV cable writes applied, %d skipped",
+                 snapshot.num, self.cable_view.applied, self.cable_view.skipped)
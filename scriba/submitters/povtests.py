@@ -0,0 +1,97 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Best PovTestResults per CS fielding and IDS fielding, in memory."""
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+
+from farnsworth.models import ChallengeSetFielding, PovTestResult
+
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('povtests')
+
+
+TestResult = namedtuple('TestResult', ['id', 'exploit_id', 'num_success'])
+
+
+class PovTestMatrix(object):
+    """
+    The PovTestResult with the most successes for every (CS fielding, IDS
+    fielding) pair, every CS fielding and every CS, i.e. the answers of
+    PovTestResult.best, best_against_cs_fielding and best_against_cs. Ties
+    go to the oldest result. Loaded with one query, refresh() only pulls
+    the results added since the previous load.
+    """
+
+    def __init__(self):
+        self._by_pair = {}
+        self._by_cs_fielding = {}
+        self._by_cs = {}
+        self._high_water = None
+
+    def _query(self, since=None):
+        query = PovTestResult.select(PovTestResult.id,
+                                     PovTestResult.exploit,
+                                     PovTestResult.cs_fielding,
+                                     PovTestResult.ids_fielding,
+                                     PovTestResult.num_success,
+                                     ChallengeSetFielding.cs) \
+                             .join(ChallengeSetFielding,
+                                   on=(PovTestResult.cs_fielding == ChallengeSetFielding.id))
+        if since is not None:
+            query = query.where(PovTestResult.id > since)
+        return query.order_by(PovTestResult.id).tuples()
+
+    def _merge(self, rows):
+        merged = 0
+        for id_, exploit_id, cs_fielding_id, ids_fielding_id, num_success, cs_id in rows:
+            result = TestResult(id_, exploit_id, num_success)
+            for index, key in ((self._by_pair, (cs_fielding_id, ids_fielding_id)),
+                               (self._by_cs_fielding, cs_fielding_id),
+                               (self._by_cs, cs_id)):
+                best = index.get(key)
+                if best is None or num_success > best.num_success:
+                    index[key] = result
+            self._high_water = id_
+            merged += 1
+        return merged
+
+    def load(self):
+        self.__init__()
+        merged = self._merge(self._query())
+        LOG.debug("Loaded %d PoV test results", merged)
+        return self
+
+    def refresh(self):
+        if self._high_water is None:
+            return self.load()
+        merged = self._merge(self._query(since=self._high_water))
+        if merged:
+            LOG.debug("Merged %d new PoV test results", merged)
+        return self
+
+    def best(self, cs_fielding_id, ids_fielding_id):
+        return self._by_pair.get((cs_fielding_id, ids_fielding_id))
+
+    def best_against_cs_fielding(self, cs_fielding_id):
+        return self._by_cs_fielding.get(cs_fielding_id)
+
+    def best_against_cs(self, cs_id):
+        return self._by_cs.get(cs_id)
+
+    def lookup(self, cs_fielding, ids_fielding):
+        """
+        The best result against the fielded CS and IDS rule, falling back to
+        the best one against the CS fielding, then against the CS. None if
+        there is none, or if it never succeeded.
+        """
+        result = self.best(cs_fielding.id, ids_fielding.id if ids_fielding is not None else None)
+        if result is None:
+            result = self.best_against_cs_fielding(cs_fielding.id)
+        if result is None:
+            result = self.best_against_cs(cs_fielding.cs_id)
+        if result is not None and result.num_success == 0:
+            return None
+        return result
@@ -0,0 +1,61 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Exploit ranking shared by every opponent during a pass."""
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+
+from farnsworth.models.exploit import Exploit
+
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('ranking')
+
+
+ExploitCandidate = namedtuple('ExploitCandidate', ['id', 'reliability'])
+
+
+class ExploitRanking(object):
+    """
+    Exploit candidates of a set of ChallengeSets, most reliable first.
+
+    The candidates are loaded with a single query and ranked once per CS;
+    the ranking does not depend on the opponent, so it is shared by all of
+    them. Team-specific rankings subclass this and override rank_for_team(),
+    which gets the shared ranking as a starting point.
+    """
+
+    def __init__(self, cs_ids):
+        self.cs_ids = list(cs_ids)
+        self._candidates = {}
+
+    def load(self):
+        self._candidates = {}
+        if not self.cs_ids:
+            return self
+
+        query = Exploit.select(Exploit.id, Exploit.cs, Exploit.reliability) \
+                       .where(Exploit.cs << self.cs_ids) \
+                       .order_by(Exploit.cs, Exploit.reliability.desc(), Exploit.id)
+        for exploit in query:
+            self._candidates.setdefault(exploit.cs_id, []).append(
+                ExploitCandidate(exploit.id, exploit.reliability))
+
+        LOG.debug("Ranked %d exploits for %d CSes",
+                  sum(len(c) for c in self._candidates.values()), len(self._candidates))
+        return self
+
+    def ranked(self, cs_id):
+        """Candidates for cs_id, most reliable first."""
+        return self._candidates.get(cs_id, [])
+
+    def rank_for_team(self, cs_id, team_id, candidates): # pylint:disable=unused-argument,no-self-use
+        return candidates
+
+    def best(self, cs_id, team_id=None):
+        """The exploit to submit against team_id on cs_id, or None."""
+        candidates = self.ranked(cs_id)
+        if team_id is not None:
+            candidates = self.rank_for_team(cs_id, team_id, candidates)
+        return candidates[0] if candidates else None
@@ -0,0 +1,105 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Rotation state of the rotator CB strategy."""
+
+from __future__ import absolute_import, unicode_literals
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('rotation')
+
+
+# Keep the rotation in this file, shared by every scriba process of the host.
+ROTATION_FILE = os.environ.get('SCRIBA_ROTATION_FILE')
+
+
+def _advance(state, cs_name, available):
+    """
+    Pick the next patch type in the rotation of cs_name among the available
+    names, state is {'next': [...], 'orders': {cs_name: [...]}}. Every CS
+    starts from the order of the previous one, shifted by one.
+    """
+    orders = state['orders']
+    if not orders.get(cs_name):
+        orders[cs_name] = list(state['next'])
+        state['next'] = state['next'][1:] + state['next'][:1]
+
+    for name in orders[cs_name]:
+        if name in available:
+            orders[cs_name].remove(name)
+            return name
+    return None
+
+
+class MemoryRotation(object):
+    """Rotation kept in this process, lost on restart."""
+
+    def __init__(self, patch_order):
+        self.state = {'next': list(patch_order), 'orders': {}}
+        self._lock = threading.Lock()
+
+    def advance(self, cs_name, available):
+        """Next patch type name of cs_name among available, None if there is none."""
+        with self._lock:
+            return _advance(self.state, cs_name, available)
+
+
+class FileRotation(object):
+    """
+    Rotation kept as JSON in a file. Every advance reads, updates and
+    atomically replaces the file under an exclusive lock, so processes
+    sharing the file never hand out the same step twice.
+    """
+
+    def __init__(self, path, patch_order):
+        self.path = path
+        self.patch_order = list(patch_order)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path) as state:
+                return json.load(state)
+        except IOError:
+            return {'next': list(self.patch_order), 'orders': {}}
+        except ValueError:
+            LOG.warning("Rotation state in %s is corrupt, starting over", self.path)
+            return {'next': list(self.patch_order), 'orders': {}}
+
+    def _write(self, state):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as tmp:
+            json.dump(state, tmp, separators=(',', ':'))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.rename(tmp_path, self.path)
+
+    def advance(self, cs_name, available):
+        """Next patch type name of cs_name among available, None if there is none."""
+        with self._locked():
+            state = self._read()
+            name = _advance(state, cs_name, available)
+            self._write(state)
+            return name
+
+
+def rotation(patch_order, path=ROTATION_FILE):
+    """The rotation store configured by SCRIBA_ROTATION_FILE."""
+    if path:
+        return FileRotation(path, patch_order)
+    return MemoryRotation(patch_order)
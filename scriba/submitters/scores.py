@@ -0,0 +1,112 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Scores of the CBNs, kept until new feedback for their CS arrives."""
+
+from __future__ import absolute_import, unicode_literals
+
+import threading
+from collections import defaultdict
+
+from farnsworth.models import ChallengeSetFielding, PatchScore, PollFeedback
+
+from scriba.watermarks import watermarks
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('scores')
+
+
+class ScoreCache(object):
+    """
+    min_cb_score, estimated_feedback, estimated_cb_score and the presence
+    of poll feedback of every CBN, computed on first use. They only change
+    when a PollFeedback or PatchScore row arrives for the CS of the CBN, or
+    when one of its ChallengeSetFieldings changes: min_cb_score reads the
+    feedback through their poll_feedback link.
+
+    refresh() compares the high-water marks of the SPECS with the ones of
+    the previous refresh, and forgets the scores of the CSes that got rows
+    in between. Without refresh() nothing is ever forgotten.
+    """
+
+    # Highest ids: new feedback and scores arrive as new rows. Fieldings are
+    # updated in place when their feedback is linked, save() bumps updated_at.
+    SPECS = ((PollFeedback, PollFeedback.id), (PatchScore, PatchScore.id),
+             (ChallengeSetFielding, ChallengeSetFielding.updated_at))
+
+    def __init__(self):
+        self._marks = None
+        self._values = {}
+        self._by_cs = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+            self._by_cs = defaultdict(set)
+
+    def _dirty(self, spec, old, new):
+        """Ids of the CSes with rows of spec in (old, new]."""
+        model, field = spec
+        query = model.select(model.cs).distinct().where(field <= new)
+        if old is not None:
+            query = query.where(field > old)
+        return set(cs_id for cs_id, in query.tuples())
+
+    def refresh(self):
+        """Forget the scores of the CSes with new rows since the last refresh."""
+        marks = watermarks(self.SPECS)
+        if self._marks is None:
+            self.clear()
+            self._marks = marks
+            return self
+
+        dirty = set()
+        for spec in self.SPECS:
+            old, new = self._marks[spec], marks[spec]
+            if new == old:
+                continue
+            if new is None or (old is not None and new < old):
+                # rows went away, the database was reset
+                LOG.warning("%s high-water mark went back, dropping all scores", spec[0].__name__)
+                self.clear()
+                self._marks = marks
+                return self
+            dirty |= self._dirty(spec, old, new)
+
+        with self._lock:
+            for cs_id in dirty:
+                for key in self._by_cs.pop(cs_id, ()):
+                    self._values.pop(key, None)
+        if dirty:
+            LOG.debug("Scores of %d CSes are out of date", len(dirty))
+        self._marks = marks
+        return self
+
+    def _get(self, cbn, name, compute):
+        key = (cbn.id, name)
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+        value = compute(cbn)
+        with self._lock:
+            self._values[key] = value
+            self._by_cs[cbn.cs_id].add(key)
+        return value
+
+    def min_cb_score(self, cbn):
+        return self._get(cbn, 'min_cb_score', lambda c: c.min_cb_score)
+
+    def has_polls(self, cbn):
+        return self._get(cbn, 'has_polls', lambda c: len(c.poll_feedbacks) > 0)
+
+    def estimated_feedback(self, cbn):
+        return self._get(cbn, 'estimated_feedback', lambda c: c.estimated_feedback)
+
+    def estimated_cb_score(self, cbn):
+        return self._get(cbn, 'estimated_cb_score', lambda c: c.estimated_cb_score)
+
+    def cb_score(self, cbn):
+        """The actual min_cb_score once polled, the estimated one until then."""
+        if self.has_polls(cbn):
+            return self.min_cb_score(cbn)
+        return self.estimated_cb_score(cbn)
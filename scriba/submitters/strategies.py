@@ -0,0 +1,95 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Registry of the CB submission strategies."""
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+
+from . import digests
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('strategies')
+
+
+# Strategy whose decisions are written as cables, none disables CB submissions.
+CB_STRATEGY = os.environ.get('SCRIBA_CB_STRATEGY', 'none')
+
+# Comma-separated strategies evaluated next to the live one, only logged.
+CB_SHADOW_STRATEGIES = [s.strip() for s in os.environ.get('SCRIBA_CB_SHADOW_STRATEGIES', '').split(',')
+                        if s.strip()]
+
+STRATEGIES = {}
+
+
+def register(name):
+    """Class decorator registering a Strategy under name."""
+    def _register(cls):
+        cls.name = name
+        STRATEGIES[name] = cls
+        return cls
+    return _register
+
+
+def get(name, shadow=False):
+    """A new instance of the strategy registered under name, in shadow mode if shadow."""
+    try:
+        strategy = STRATEGIES[name]()
+    except KeyError:
+        raise ValueError("Unknown CB strategy %s, known: %s" % (name, ', '.join(sorted(STRATEGIES))))
+    strategy.shadow = shadow
+    return strategy
+
+
+class Strategy(object):
+    """
+    Decides the CBNs to submit for a CS, from the round snapshot. A
+    stateful strategy changes its own state while deciding, and cannot run
+    in shadow mode. The decisions of a shadow strategy are not written
+    anywhere, including the audit log.
+    """
+
+    name = None
+    stateful = False
+    shadow = False
+
+    def decide(self, target_cs, snapshot):
+        """CBNs to submit for target_cs, None to leave the fielded ones."""
+        raise NotImplementedError()
+
+
+def same_decision(a, b):
+    """Do two decisions submit the same CBNs?"""
+    if a is None or b is None:
+        return a is None and b is None
+    return digests.same_cbns(a, b)
+
+
+class ShadowReport(object):
+    """Agreement of every shadow strategy with the live one over a pass."""
+
+    def __init__(self, live, shadows):
+        self.live = live
+        self.shadows = shadows
+        self.agreed = dict((s.name, 0) for s in shadows)
+        self.disagreed = dict((s.name, 0) for s in shadows)
+
+    def compare(self, target_cs, live_decision, shadow_decisions):
+        for shadow, shadow_decision in zip(self.shadows, shadow_decisions):
+            if same_decision(live_decision, shadow_decision):
+                self.agreed[shadow.name] += 1
+                continue
+            self.disagreed[shadow.name] += 1
+            LOG.info("%s - shadow strategy %s would submit %s, %s submits %s", target_cs.name,
+                     shadow.name, _describe(shadow_decision), self.live.name, _describe(live_decision))
+
+    def log(self, round_num):
+        for shadow in self.shadows:
+            LOG.info("Round #%d: shadow strategy %s agreed on %d CSes, disagreed on %d",
+                     round_num, shadow.name, self.agreed[shadow.name], self.disagreed[shadow.name])
+
+
+def _describe(cbns):
+    if cbns is None:
+        return "nothing"
+    return ', '.join(c.name for c in cbns)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""When did we first throw a real exploit at every ChallengeSet?"""
+
+from __future__ import absolute_import, unicode_literals
+
+from datetime import timedelta
+
+from peewee import fn
+
+from farnsworth.models import Exploit, ExploitSubmissionCable
+
+from . import LOG as _PARENT_LOG
+LOG = _PARENT_LOG.getChild('timeline')
+
+
+class ExploitTimeline(object):
+    """
+    Maps every CS to the processed_at of its first processed, non-backdoor
+    ExploitSubmissionCable. Built with one grouped query, refresh() only
+    pulls cables processed since the previous load, minus GRACE.
+
+    processed_at is set before the cable is committed, so a cable can show
+    up after a cable processed later than it. refresh() reads back the
+    cables processed up to GRACE before the latest one it has seen; a
+    cable committed more than GRACE after its processed_at is only seen by
+    the next load().
+    """
+
+    # How late a processed cable may be committed and still be seen by refresh()
+    GRACE = timedelta(seconds=60)
+
+    def __init__(self):
+        self._first = {}
+        self._high_water = None
+
+    def _query(self, since=None):
+        where = (ExploitSubmissionCable.processed_at != None) & (Exploit.method != "backdoor")
+        if since is not None:
+            where &= ExploitSubmissionCable.processed_at >= since
+        return ExploitSubmissionCable.select(ExploitSubmissionCable.cs,
+                                             fn.MIN(ExploitSubmissionCable.processed_at).alias('first'),
+                                             fn.MAX(ExploitSubmissionCable.processed_at).alias('last')) \
+                                     .join(Exploit) \
+                                     .where(where) \
+                                     .group_by(ExploitSubmissionCable.cs) \
+                                     .tuples()
+
+    def _merge(self, rows):
+        for cs_id, first, last in rows:
+            if cs_id not in self._first or first < self._first[cs_id]:
+                self._first[cs_id] = first
+            if self._high_water is None or last > self._high_water:
+                self._high_water = last
+
+    def load(self):
+        self._first = {}
+        self._high_water = None
+        self._merge(self._query())
+        LOG.debug("Exploit timeline loaded for %d CSes", len(self._first))
+        return self
+
+    def refresh(self):
+        if self._high_water is None:
+            return self.load()
+        self._merge(self._query(since=self._high_water - self.GRACE))
+        return self
+
+    def first_processed(self, cs_id):
+        """processed_at of the first exploit submitted against cs_id, or None."""
+        return self._first.get(cs_id)
+
+    def first_found_since(self, cs_id, when):
+        """Did we throw the first exploit against cs_id at or after when?"""
+        first = self.first_processed(cs_id)
+        return first is not None and first >= when
+
+    def exploited_by(self, cs_id, when):
+        """Did we throw an exploit against cs_id at or before when?"""
+        first = self.first_processed(cs_id)
+        return first is not None and first <= when
@@ -0,0 +1,60 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+High-water marks of the farnsworth tables scriba decisions depend on.
+
+A spec is either a model or a (model, field) pair. A (model, field) pair
+is marked by the highest value of field. A model is marked by its number
+of rows, its highest id and its highest updated_at, so the mark moves on
+inserts, deletes and on updates through save(), which bumps updated_at.
+Models without an updated_at column are insert-only as far as the mark
+goes, and so are bulk Model.update() queries, which leave updated_at as
+it is.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+from farnsworth.models import Round
+
+
+def aggregates(model):
+    """(SQL function, field) pairs that mark a whole model, see above."""
+    pk = model._meta.primary_key
+    marks = [('COUNT', pk), ('MAX', pk)]
+    updated_at = model._meta.fields.get('updated_at')
+    if updated_at is not None:
+        marks.append(('MAX', updated_at))
+    return marks
+
+
+def _columns(spec):
+    if isinstance(spec, tuple):
+        model, field = spec
+        marks = [('MAX', field)]
+    else:
+        model = spec
+        marks = aggregates(model)
+    return ['(SELECT %s("%s") FROM "%s")' % (func.lower(), f.db_column, model._meta.db_table)
+            for func, f in marks]
+
+
+def watermarks(specs, database=None):
+    """
+    Current watermark of every spec, in a single query. Returns a dict
+    keyed by spec: the highest value for (model, field) pairs, None on an
+    empty table, and a tuple of the aggregates() for models.
+    """
+    specs = list(specs)
+    if not specs:
+        return {}
+    if database is None:
+        database = Round._meta.database
+    columns = [_columns(s) for s in specs]
+    cursor = database.execute_sql('SELECT %s' % ', '.join(c for cols in columns for c in cols))
+    row = iter(cursor.fetchone())
+    marks = {}
+    for spec, cols in zip(specs, columns):
+        values = tuple(next(row) for _ in cols)
+        marks[spec] = values[0] if isinstance(spec, tuple) else values
+    return marks
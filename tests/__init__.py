@@ -20,11 +20,23 @@ def setup():
     farnsworth.config.master_db.set_autocommit(False)
 
 
+# The transaction of the running test
+_TRANSACTIONS = []
+
+
 def setup_each():
-    """Start a transaction before each test, so it can be rollbacked later."""
-    farnsworth.config.master_db.begin()
+    """
+    Start a transaction before each test, so it can be rollbacked later.
+    It is a peewee transaction, so that the atomic() blocks of the code
+    under test become savepoints instead of committing.
+    """
+    transaction = farnsworth.config.master_db.transaction()
+    transaction.__enter__()
+    _TRANSACTIONS.append(transaction)
 
 
 def teardown_each():
     """Rollback the transaction after each test to get a clean database."""
-    farnsworth.config.master_db.rollback()
+    transaction = _TRANSACTIONS.pop()
+    transaction.rollback(False)
+    transaction.__exit__(None, None, None)
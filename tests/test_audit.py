@@ -0,0 +1,61 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import math
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+from nose.tools import *
+
+from scriba import audit
+from scriba.submitters import decision
+
+Row = namedtuple('Row', ['id', 'reliability'])
+
+
+class TestAudit():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'audit.bin')
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        log = audit.AuditLog(self.path)
+        features = decision.DEFAULT_FEATURES._replace(min_score=0.5)
+        log.cb(3, 10, 1, features, decision.SUBMIT_PULL_BACK, decision.ORIGINAL,
+               [Row(7, None), Row(8, None)])
+        log.pov(3, 10, 2, 1, 4, Row(42, 0.75))
+        log.flush()
+        log.pov(4, 11, 2, 2, 0)
+        log.flush()
+
+        cb, pov, nothing = list(audit.read(self.path))
+        assert_equals((cb.kind, cb.round, cb.cs, cb.team, cb.reason, cb.choice, cb.value, cb.ids),
+                      (audit.CB, 3, 10, 1, decision.SUBMIT_PULL_BACK, decision.ORIGINAL, 0.5, [7, 8]))
+        assert_equals(cb.flags, audit.features_flags(features))
+        assert_equals((pov.kind, pov.team, pov.choice, pov.flags, pov.value, pov.ids),
+                      (audit.POV, 2, 1, 4, 0.75, [42]))
+        assert_equals((nothing.round, nothing.choice, nothing.ids), (4, 0, []))
+        assert_true(math.isnan(nothing.value))
+
+    def test_truncated_record_is_dropped(self):
+        log = audit.AuditLog(self.path)
+        log.pov(3, 10, 2, 1, 4, Row(42, 0.75))
+        log.pov(3, 11, 2, 1, 4, Row(43, 0.75))
+        log.flush()
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        assert_equals([r.cs for r in audit.read(self.path)], [10])
+
+    def test_disabled(self):
+        log = audit.AuditLog(None)
+        log.pov(3, 10, 2, 1, 4, Row(42, 0.75))
+        log.flush()
+        assert_false(os.path.exists(self.path))
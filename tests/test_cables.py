@@ -0,0 +1,137 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from nose.tools import *
+
+from farnsworth.models import Team
+from farnsworth.models import Round
+from farnsworth.models import ChallengeSet as CS
+from farnsworth.models import ChallengeBinaryNode as CBN
+from farnsworth.models import CSSubmissionCable as CSSC
+from farnsworth.models import Exploit
+from farnsworth.models import ExploitSubmissionCable as ESC
+from farnsworth.models import IDSRule
+from farnsworth.models import Job
+
+from . import setup_each, teardown_each
+from scriba.submitters.cables import CableView, CableWriter
+
+
+class TestCableWriter():
+
+    def setup(self):
+        setup_each()
+        self.team = Team.create(name='other')
+        self.round = Round.create(num=0)
+        self.cs = CS.create(name='x')
+        self.cbn = CBN.create(cs=self.cs, name="unpatched", blob="XXXX")
+        self.patched = CBN.create(cs=self.cs, name="patched", blob="XXXY")
+        job = Job.create(cs=self.cs, worker='rex')
+        self.exploits = [Exploit.create(cs=self.cs, job=job, pov_type='type1', method='rop',
+                                        blob=b'Z', c_code='', reliability=r)
+                         for r in (0.5, 0.9)]
+
+    def teardown(self):
+        teardown_each()
+
+    def cables(self):
+        return list(CSSC.select().where((CSSC.cs == self.cs) & (CSSC.round == self.round))
+                                 .order_by(CSSC.id))
+
+    def test_existing_cs_cables_are_not_written_again(self):
+        ids = IDSRule.create(cs=self.cs, rules="alert")
+        CSSC.get_or_create(cs=self.cs, cbns=[self.patched], ids=ids, round=self.round)
+
+        writer = CableWriter(self.round)
+        writer.add_cbns(self.cs, [self.patched], ids)
+        writer.flush()
+        assert_equals(len(self.cables()), 1)
+
+        writer = CableWriter(self.round)
+        writer.add_cbns(self.cs, [self.cbn], ids)
+        writer.flush()
+        cables = self.cables()
+        assert_equals(len(cables), 2)
+        assert_equals([c.id for c in cables[1].cbns], [self.cbn.id])
+        assert_equals(cables[1].ids.id, ids.id)
+
+    def test_cs_cable_without_ids_gets_a_new_rule(self):
+        for _ in range(2):
+            writer = CableWriter(self.round)
+            writer.add_cbns(self.cs, [self.cbn])
+            writer.flush()
+
+        # like IDSRule.create before every get_or_create, one cable per decision
+        cables = self.cables()
+        assert_equals(len(cables), 2)
+        assert_not_equal(cables[0].ids.id, cables[1].ids.id)
+        for cable in cables:
+            assert_equals(cable.ids.rules, '')
+            assert_is_not_none(cable.ids.sha256)
+            assert_equals([c.id for c in cable.cbns], [self.cbn.id])
+
+    def test_exploit_cables_insert_then_update(self):
+        writer = CableWriter(self.round)
+        writer.add_exploit(self.team, self.cs, self.exploits[0].id, 10)
+        writer.flush()
+        cable = ESC.get(team=self.team, cs=self.cs, round=self.round)
+        assert_equals(cable.exploit.id, self.exploits[0].id)
+        assert_equals(cable.throws, 10)
+
+        writer = CableWriter(self.round)
+        writer.add_exploit(self.team, self.cs, self.exploits[1].id, 10, cable_id=cable.id)
+        writer.flush()
+        cables = list(ESC.select().where((ESC.team == self.team) & (ESC.round == self.round)))
+        assert_equals(len(cables), 1)
+        assert_equals(cables[0].id, cable.id)
+        assert_equals(cables[0].exploit.id, self.exploits[1].id)
+
+    def test_view_skips_identical_writes(self):
+        view = CableView()
+        writer = CableWriter(self.round, view=view)
+        writer.add_exploit(self.team, self.cs, self.exploits[0].id, 10)
+        writer.add_cbns(self.cs, [self.patched])
+        assert_equals(len(writer), 2)
+        writer.flush()
+        assert_equals((view.applied, view.skipped), (2, 0))
+
+        cable = ESC.get(team=self.team, cs=self.cs, round=self.round)
+        writer = CableWriter(self.round, view=view)
+        writer.add_exploit(self.team, self.cs, self.exploits[0].id, 10, cable_id=cable.id)
+        writer.add_cbns(self.cs, [self.patched])
+        assert_equals(len(writer), 0)
+        writer.flush()
+        assert_equals((view.applied, view.skipped), (2, 2))
+        assert_equals(len(self.cables()), 1)
+
+        # a different decision goes through
+        writer = CableWriter(self.round, view=view)
+        writer.add_exploit(self.team, self.cs, self.exploits[1].id, 10, cable_id=cable.id)
+        writer.flush()
+        assert_equals((view.applied, view.skipped), (3, 2))
+        assert_equals(ESC.get(id=cable.id).exploit.id, self.exploits[1].id)
+
+
+class TestCableView():
+
+    def test_new_round_resets(self):
+        view = CableView().for_round(1)
+        view.exploits[(1, 2)] = 3
+        view.cbns[2] = CableView.cbns_key([], None)
+        view.applied, view.skipped = 4, 5
+        assert_is(view.for_round(1), view)
+        assert_equals(view.exploits, {(1, 2): 3})
+
+        view.for_round(2)
+        assert_equals((view.round_num, view.exploits, view.cbns, view.applied, view.skipped),
+                      (2, {}, {}, 0, 0))
+
+    def test_forget(self):
+        view = CableView().for_round(1)
+        view.exploits = {(1, 2): 3, (1, 4): 5, (2, 2): 6}
+        view.cbns = {2: CableView.cbns_key([], None), 4: CableView.cbns_key([], None)}
+        view.forget([2])
+        assert_equals(view.exploits, {(1, 4): 5})
+        assert_equals(list(view.cbns), [4])
@@ -17,6 +17,7 @@ from farnsworth.models import PatchType as PT
 from farnsworth.models import IDSRule
 
 from . import setup_each, teardown_each
+from scriba.snapshot import RoundSnapshot
 import scriba.submitters.cb
 
 
@@ -162,7 +163,8 @@ class TestCBSubmitter():
         # run the scheduler
         for _ in scriba.submitters.cb.ORIG_PATCH_ORDER:
             for c in cses:
-                scriba.submitters.cb.CBSubmitter.rotator_submission(c)
+                scriba.submitters.cb.CBSubmitter.process_patch_submission(
+                    c, snapshot=RoundSnapshot(r0), strategy='rotator')
 
         # make sure they got rotated correctly
         for n,cs in enumerate(cses):
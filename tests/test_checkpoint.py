@@ -0,0 +1,96 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from nose.tools import *
+
+import scriba.checkpoint
+from scriba.audit import CB
+from scriba.checkpoint import Checkpoint
+from scriba.submitters.cables import CableView
+
+from .test_dirty import FakeTracker
+
+
+class Submitter(object):
+    AUDIT_KIND = CB
+
+    def __init__(self):
+        self.tracker = FakeTracker(enabled=True)
+        self.cable_view = CableView()
+
+
+class TestCheckpoint():
+
+    def setup(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'checkpoint.bin')
+        self.cables = 10
+        self._cable_digest = scriba.checkpoint.cable_digest
+        scriba.checkpoint.cable_digest = lambda round_num: self.cables
+
+    def teardown(self):
+        scriba.checkpoint.cable_digest = self._cable_digest
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        checkpoint = Checkpoint(7, marks={1: {3: 2 ** 64 - 1, 4: 5}},
+                                exploits={2: {(1, 3): 9, (2, 3): 11}},
+                                cbns={1: {3: (None, frozenset([5, 6])), 4: (8, frozenset([7]))}},
+                                cables=2 ** 64 - 2)
+        checkpoint.write(self.path)
+        read = Checkpoint.read(self.path)
+        assert_equals(read.round_num, 7)
+        assert_equals(read.marks, checkpoint.marks)
+        assert_equals(read.exploits, checkpoint.exploits)
+        assert_equals(read.cbns, checkpoint.cbns)
+        assert_equals(read.cables, 2 ** 64 - 2)
+
+    def test_truncated_is_ignored(self):
+        Checkpoint(7, marks={1: {3: 4}}).write(self.path)
+        with open(self.path, 'r+b') as checkpoint:
+            checkpoint.truncate(os.path.getsize(self.path) - 1)
+        assert_is_none(Checkpoint.read(self.path))
+        assert_is_none(Checkpoint.read(os.path.join(self.dir, 'missing')))
+
+    def _decided(self, round_num):
+        submitter = Submitter()
+        submitter.tracker.current = {1: (1,), 2: (2,)}
+        _, marks = submitter.tracker.changed([1, 2], round_num)
+        for cs_id in (1, 2):
+            submitter.tracker.done(cs_id, marks)
+        submitter.cable_view.for_round(round_num)
+        submitter.cable_view.cbns[1] = (None, frozenset([4]))
+        return submitter
+
+    def test_restore(self):
+        scriba.checkpoint.save(5, [self._decided(5)], path=self.path)
+
+        submitter = Submitter()
+        assert_true(scriba.checkpoint.restore(5, [submitter], path=self.path))
+        submitter.tracker.current = {1: (1,), 2: (3,)}
+        assert_equals(submitter.tracker.changed([1, 2], 5)[0], set([2]))
+        assert_equals(submitter.cable_view.cbns, {1: (None, frozenset([4]))})
+
+    def test_stale_checkpoint_is_ignored(self):
+        scriba.checkpoint.save(5, [self._decided(5)], path=self.path)
+        assert_false(scriba.checkpoint.restore(6, [Submitter()], path=self.path))
+
+        # an exploit cable of the round was updated in place
+        self.cables = 11
+        submitter = Submitter()
+        assert_false(scriba.checkpoint.restore(5, [submitter], path=self.path))
+        assert_equals(submitter.tracker.state(), {})
+
+    def test_submitters_without_a_kind_are_left_out(self):
+        unknown = Submitter()
+        unknown.AUDIT_KIND = None
+        scriba.checkpoint.save(5, [self._decided(5), unknown], path=self.path)
+        assert_equals(list(Checkpoint.read(self.path).marks), [CB])
+        assert_true(scriba.checkpoint.restore(5, [unknown], path=self.path))
+        assert_equals(unknown.tracker.state(), {})
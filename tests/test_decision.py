@@ -0,0 +1,106 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import itertools
+
+from nose.tools import *
+
+from scriba.submitters import decision
+from scriba.submitters.decision import DEFAULT_FEATURES, CSFeatures, PatchScores
+
+THRESHOLDS = (0.8, 0.85, 1)
+
+
+class TestDecision():
+
+    def test_settled_early(self):
+        assert_equals(decision.decide(DEFAULT_FEATURES._replace(fielded_before=False), 0.9),
+                      (decision.NEW_CS, decision.NOTHING))
+        assert_equals(decision.decide(DEFAULT_FEATURES._replace(has_fielding=False), 0.9),
+                      (decision.NO_FIELDING, decision.NOTHING))
+        assert_equals(decision.decide(DEFAULT_FEATURES._replace(downed=True), 0.9),
+                      (decision.DOWNED_ROUND, decision.NOTHING))
+        assert_equals(decision.decide(DEFAULT_FEATURES._replace(has_patches=False), 0.9),
+                      (decision.NO_PATCHES, decision.NOTHING))
+
+    def test_best_patch(self):
+        assert_equals(decision.decide(DEFAULT_FEATURES, 0.9),
+                      (decision.SUBMIT_BEST_PATCH, decision.BEST_PATCH))
+        assert_equals(decision.decide(DEFAULT_FEATURES._replace(best_is_prior=True), 0.9),
+                      (decision.RESUBMISSION, decision.NOTHING))
+        assert_equals(decision.decide(DEFAULT_FEATURES._replace(current_is_original=False), 0.9),
+                      (decision.ALREADY_PATCHED, decision.NOTHING))
+        assert_equals(decision.decide(DEFAULT_FEATURES._replace(current_is_original=False,
+                                                                best_is_manual=True), 0.9),
+                      (decision.SUBMIT_BEST_PATCH, decision.BEST_PATCH))
+
+    def test_pull_back(self):
+        features = DEFAULT_FEATURES._replace(min_score=0.5, current_is_original=False,
+                                             current_is_prior=True, exploit_found=True)
+        assert_equals(decision.decide(features, 0.9),
+                      (decision.SUBMIT_PULL_BACK, decision.ORIGINAL))
+        assert_equals(decision.decide(features, 0.4),
+                      (decision.ALREADY_PATCHED, decision.NOTHING))
+        assert_equals(decision.decide(features._replace(original_is_prior=True), 0.9),
+                      (decision.RESUBMISSION, decision.NOTHING))
+
+    def test_exploit_found(self):
+        features = DEFAULT_FEATURES._replace(exploit_found=True)
+        assert_equals(decision.decide(features, 0.9), (decision.RESUBMISSION, decision.NOTHING))
+        assert_equals(decision.decide(features._replace(current_is_prior=False), 0.9),
+                      (decision.SUBMIT_CURRENT, decision.CURRENT))
+
+    def test_batch_matches_scalar(self):
+        records = []
+        for flags in itertools.product([False, True], repeat=len(CSFeatures._fields) - 1):
+            for min_score in (None, 0.5, 0.95):
+                values = list(flags)
+                values.insert(CSFeatures._fields.index('min_score'), min_score)
+                records.append(CSFeatures(*values))
+
+        table = decision.FeatureTable(records)
+        assert_equals(len(table), len(records))
+
+        reasons, choices = decision.decide_batch(table, 0.9)
+        for record, reason, choice in zip(records, reasons, choices):
+            assert_equals(decision.decide(record, 0.9), (reason, choice))
+
+
+class TestDecideScored():
+
+    def test_blacklisted(self):
+        assert_false(decision.blacklisted(PatchScores(0.9, None, None, 0.9, None), 0.8, 0.85))
+        assert_true(decision.blacklisted(PatchScores(0.7, None, None, 0.7, None), 0.8, 0.85))
+        # the estimation only counts until the first poll
+        assert_false(decision.blacklisted(PatchScores(0.9, 0.1, True, 0.9, None), 0.8, 0.85))
+        assert_true(decision.blacklisted(PatchScores(None, None, None, None, None), 0.8, 0.85))
+        assert_true(decision.blacklisted(PatchScores(None, 0.9, True, 0.9, None), 0.8, 0.85))
+        assert_true(decision.blacklisted(PatchScores(None, 0.8, False, 0.8, None), 0.8, 0.85))
+        assert_false(decision.blacklisted(PatchScores(None, 0.9, False, 0.9, None), 0.8, 0.85))
+
+    def test_best_score(self):
+        patches = {1: PatchScores(None, 0.9, False, 0.9, 3),
+                   2: PatchScores(0.95, None, None, 0.95, 5),
+                   3: PatchScores(None, 0.99, True, 0.99, None)}
+        assert_equals(decision.decide_scored(patches, None, *THRESHOLDS),
+                      (decision.SCORED_PATCH, 2))
+        assert_equals(decision.decide_scored(patches, 2, *THRESHOLDS), (decision.NOTHING, None))
+        assert_equals(decision.decide_scored(patches, 1, *THRESHOLDS),
+                      (decision.SCORED_PATCH, 2))
+
+    def test_fresh_patch_is_left_in(self):
+        patches = {1: PatchScores(0.9, None, None, 0.9, 1),
+                   2: PatchScores(0.95, None, None, 0.95, None)}
+        assert_equals(decision.decide_scored(patches, 1, *THRESHOLDS), (decision.NOTHING, None))
+        patches[1] = patches[1]._replace(fieldings=2)
+        assert_equals(decision.decide_scored(patches, 1, *THRESHOLDS),
+                      (decision.SCORED_PATCH, 2))
+
+    def test_all_blacklisted(self):
+        patches = {1: PatchScores(0.5, None, None, 0.5, 4)}
+        assert_equals(decision.decide_scored(patches, 1, *THRESHOLDS), (decision.ORIGINAL, None))
+        assert_equals(decision.decide_scored(patches, None, *THRESHOLDS),
+                      (decision.NOTHING, None))
+        assert_equals(decision.decide_scored({}, None, *THRESHOLDS), (decision.NOTHING, None))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+
+from nose.tools import *
+
+from scriba.submitters import digests
+
+CBN = namedtuple('CBN', ['name', 'sha256'])
+
+
+class Fielding(object):
+    """Just enough of a fielding, its CBNs can only be loaded once."""
+
+    def __init__(self, cbns):
+        self._cbns = cbns
+
+    @property
+    def cbns(self):
+        cbns, self._cbns = self._cbns, None
+        return Query(cbns)
+
+
+class Query(list):
+    def select(self, *_):
+        return self
+
+
+class TestDigests():
+
+    def test_same_cbns(self):
+        a, b = CBN('a', 'aa'), CBN('b', 'bb')
+        assert_true(digests.same_cbns([a, b], [b, a]))
+        assert_false(digests.same_cbns([a, b], [a]))
+        assert_true(digests.same_cbns(frozenset(['aa']), [a]))
+
+    def test_digest_is_cached_on_the_fielding(self):
+        fielding = Fielding([CBN('a', 'aa')])
+        assert_equals(digests.cbns_digest(fielding), frozenset(['aa']))
+        assert_true(digests.same_cbns(fielding, [CBN('a2', 'aa')]))
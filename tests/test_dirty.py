@@ -0,0 +1,125 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from nose.tools import *
+
+from farnsworth.models import ChallengeSet as CS
+from farnsworth.models import ChallengeBinaryNode as CBN
+
+from . import setup_each, teardown_each
+from scriba.dirty import DirtyTracker, _spec
+
+
+class Field(object):
+    pass
+
+
+class Model(object):
+
+    class _meta(object):
+        primary_key = Field()
+        fields = {'id': primary_key, 'updated_at': Field()}
+
+
+class FakeTracker(DirtyTracker):
+    """Marks come from a dict instead of the database."""
+
+    def __init__(self, **kwargs):
+        super(FakeTracker, self).__init__([], **kwargs)
+        self.current = {}
+
+    def marks(self, cs_ids):
+        return dict((cs_id, self.current.get(cs_id)) for cs_id in cs_ids)
+
+
+class TestSpecs():
+
+    def test_models_are_marked_like_watermarks(self):
+        cs_field, meta = Field(), Model._meta
+        assert_equals(_spec((Model, cs_field)),
+                      (Model, cs_field, [('COUNT', meta.primary_key), ('MAX', meta.primary_key),
+                                         ('MAX', meta.fields['updated_at'])]))
+
+    def test_mark_field(self):
+        cs_field, mark_field = Field(), Field()
+        assert_equals(_spec((Model, cs_field, mark_field)),
+                      (Model, cs_field, [('MAX', mark_field)]))
+
+
+class TestDirtyTracker():
+
+    def test_only_changed_cses_are_dirty(self):
+        tracker = FakeTracker(enabled=True)
+        tracker.current = {1: (1, 1), 2: (2, 2)}
+        dirty, marks = tracker.changed([1, 2], 5)
+        assert_equals(dirty, set([1, 2]))
+        for cs_id in dirty:
+            tracker.done(cs_id, marks)
+
+        tracker.current[2] = (2, 3)
+        dirty, marks = tracker.changed([1, 2, 3], 5)
+        assert_equals(dirty, set([2, 3]))
+
+    def test_undecided_cses_stay_dirty(self):
+        tracker = FakeTracker(enabled=True)
+        tracker.current = {1: (1,), 2: (2,)}
+        _, marks = tracker.changed([1, 2], 5)
+        tracker.done(1, marks)
+        assert_equals(tracker.changed([1, 2], 5)[0], set([2]))
+
+    def test_new_round_resets(self):
+        tracker = FakeTracker(enabled=True)
+        tracker.current = {1: (1,)}
+        _, marks = tracker.changed([1], 5)
+        tracker.done(1, marks)
+        assert_equals(tracker.changed([1], 5)[0], set())
+        assert_equals(tracker.changed([1], 6)[0], set([1]))
+
+    def test_forgotten_cses_are_dirty(self):
+        tracker = FakeTracker(enabled=True)
+        tracker.current = {1: (1,), 2: (2,)}
+        _, marks = tracker.changed([1, 2], 5)
+        tracker.done(1, marks)
+        tracker.done(2, marks)
+        tracker.forget([2, 3])
+        assert_equals(tracker.changed([1, 2], 5)[0], set([2]))
+
+    def test_disabled(self):
+        tracker = FakeTracker(enabled=False)
+        _, marks = tracker.changed([1], 5)
+        tracker.done(1, marks)
+        assert_equals(tracker.changed([1], 5)[0], set([1]))
+
+
+class TestDirtyTrackerMarks():
+
+    def setup(self):
+        setup_each()
+        self.cs = CS.create(name='x')
+        self.other = CS.create(name='y')
+        self.cbns = [CBN.create(cs=self.cs, name="cbn%d" % i, blob="XXXX") for i in range(2)]
+        self.tracker = DirtyTracker([(CBN, CBN.cs)], enabled=True)
+        self.decide()
+
+    def teardown(self):
+        teardown_each()
+
+    def decide(self):
+        dirty, marks = self.tracker.changed([self.cs.id, self.other.id], 1)
+        for cs_id in dirty:
+            self.tracker.done(cs_id, marks)
+        return dirty
+
+    def test_unchanged(self):
+        assert_equals(self.decide(), set())
+
+    def test_delete_below_the_highest_id(self):
+        self.cbns[0].delete_instance()
+        assert_equals(self.decide(), set([self.cs.id]))
+
+    def test_update_through_save(self):
+        self.cbns[0].blob = "XXXY"
+        self.cbns[0].save()
+        assert_equals(self.decide(), set([self.cs.id]))
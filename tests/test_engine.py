@@ -0,0 +1,80 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import random
+import threading
+import time
+
+from nose.tools import *
+
+from scriba.submitters.engine import DecisionEngine
+
+
+class Database(object):
+    """Counts the connections given back."""
+
+    def __init__(self):
+        self.closed = 0
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self.closed += 1
+
+
+class Deadline(object):
+    """Expires after a number of checks."""
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    def expired(self):
+        self.checks -= 1
+        return self.checks < 0
+
+
+def slow_square(x):
+    time.sleep(random.random() / 100)
+    return x * x
+
+
+class TestDecisionEngine():
+
+    def test_results_in_input_order(self):
+        database = Database()
+        items = list(range(20))
+        engine = DecisionEngine(slow_square, workers=4, database=database)
+        assert_equals(engine.map(items), [(x, x * x) for x in items])
+        assert_equals(database.closed, 4)
+
+    def test_same_as_sequential(self):
+        items = list(range(10))
+        sequential = DecisionEngine(slow_square, workers=1, database=Database())
+        parallel = DecisionEngine(slow_square, workers=3, database=Database())
+        assert_equals(sequential.map(items), parallel.map(items))
+
+    def test_errors_propagate(self):
+        def decide(x):
+            if x == 3:
+                raise ValueError("bad item %d" % x)
+            return x
+
+        database = Database()
+        engine = DecisionEngine(decide, workers=3, database=database)
+        with assert_raises(ValueError):
+            engine.map(range(10))
+        # every worker gave its connection back
+        assert_equals(database.closed, 3)
+
+        with assert_raises(ValueError):
+            DecisionEngine(decide, workers=1, database=Database()).map(range(10))
+
+    def test_deadline(self):
+        engine = DecisionEngine(lambda x: x, workers=1, database=Database())
+        assert_equals(engine.map(range(10), deadline=Deadline(3)), [(0, 0), (1, 1), (2, 2)])
+
+        engine = DecisionEngine(lambda x: x, workers=2, database=Database())
+        done = engine.map(range(10), deadline=Deadline(0))
+        assert_equals(done, [])
@@ -0,0 +1,130 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from datetime import datetime, timedelta
+
+from nose.tools import *
+
+import scriba.scheduler
+from scriba.executor import SubmitterExecutor
+from scriba.scheduler import RoundScheduler
+
+
+def model(name):
+    """A model spec, marked by name."""
+    class Meta(object):
+        primary_key = '%s.id' % name
+    return type(str(name), (object,), {'_meta': Meta})
+
+
+EXPLOITS = model('exploits')
+FEEDBACK = model('feedback')
+
+
+class Database(object):
+
+    def close(self):
+        pass
+
+
+class Round(object):
+
+    def __init__(self, num, age):
+        self.num = num
+        self.created_at = datetime.now() - timedelta(seconds=age)
+
+
+class Snapshot(object):
+
+    def __init__(self, round_):
+        self.round = round_
+        self.num = round_.num
+
+
+class POVSubmitter(object):
+    DEADLINE = 60
+    INPUTS = (EXPLOITS,)
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.deadlines = []
+
+    def run(self, current_round=None, snapshot=None, deadline=None):
+        if self.fail:
+            raise RuntimeError("boom")
+        self.deadlines.append(deadline)
+
+
+class CBSubmitter(POVSubmitter):
+    INPUTS = (FEEDBACK,)
+
+
+def run_pass(executor, scheduler, due, snapshot):
+    for submitter, token in executor.run(due, snapshot):
+        scheduler.done(submitter, snapshot.num, token)
+
+
+class TestSubmitterExecutor():
+
+    def setup(self):
+        self.marks = {EXPLOITS: 1, FEEDBACK: 1}
+        self._watermarks = scriba.scheduler.watermarks
+        scriba.scheduler.watermarks = lambda specs: dict(
+            (s, self.marks[s[0] if isinstance(s, tuple) else s]) for s in specs)
+        self.scheduler = RoundScheduler(policy='on-change')
+
+    def teardown(self):
+        scriba.scheduler.watermarks = self._watermarks
+
+    def test_deadline_is_relative_to_the_pass(self):
+        executor = SubmitterExecutor(hard_deadline=240, database=Database())
+        pov = POVSubmitter()
+        # the round is older than the submitter deadline, the run still gets its time
+        snapshot = Snapshot(Round(1, 100))
+        assert_equals(executor.run([(pov, None)], snapshot), [(pov, None)])
+        assert_false(pov.deadlines[0].expired())
+        assert_greater(pov.deadlines[0].remaining(), 50)
+
+        # but never past the hard deadline
+        snapshot = Snapshot(Round(2, 220))
+        executor.run([(pov, None)], snapshot)
+        assert_less(pov.deadlines[1].remaining(), 21)
+
+    def test_late_changes_run_again(self):
+        executor = SubmitterExecutor(hard_deadline=240, database=Database())
+        pov, cb = POVSubmitter(), CBSubmitter()
+        snapshot = Snapshot(Round(1, 100))
+
+        run_pass(executor, self.scheduler, self.scheduler.due([pov, cb], 1), snapshot)
+        assert_equals(self.scheduler.due([pov, cb], 1), [])
+
+        # a new exploit arrives after the POV deadline, before the hard one
+        self.marks[EXPLOITS] = 2
+        due = self.scheduler.due([pov, cb], 1)
+        assert_equals([s for s, _ in due], [pov])
+        run_pass(executor, self.scheduler, due, snapshot)
+        assert_equals(len(pov.deadlines), 2)
+        assert_equals(self.scheduler.due([pov, cb], 1), [])
+
+    def test_closed_window_is_not_done(self):
+        executor = SubmitterExecutor(hard_deadline=240, database=Database())
+        pov = POVSubmitter()
+        snapshot = Snapshot(Round(1, 300))
+        assert_true(executor.closed(snapshot.round))
+
+        due = self.scheduler.due([pov], 1)
+        run_pass(executor, self.scheduler, due, snapshot)
+        assert_equals(pov.deadlines, [])
+        # the change is not swallowed, it is still due
+        assert_equals(self.scheduler.due([pov], 1), due)
+
+    def test_concurrent(self):
+        executor = SubmitterExecutor(mode='concurrent', hard_deadline=240, database=Database())
+        pov, cb = POVSubmitter(), CBSubmitter(fail=True)
+        snapshot = Snapshot(Round(1, 0))
+        done = executor.run([(pov, 'a'), (cb, 'b')], snapshot)
+        # the failed submitter is not done, and runs again
+        assert_equals(done, [(pov, 'a')])
+        assert_equals(len(pov.deadlines), 1)
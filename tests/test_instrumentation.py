@@ -0,0 +1,149 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from nose.tools import *
+
+from scriba.instrumentation import Instrumentation
+
+
+class Cursor(object):
+
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+class Database(object):
+
+    def execute_sql(self, sql, rows=1):
+        return Cursor(rows)
+
+
+class TestInstrumentation():
+
+    def setup(self):
+        self.dir = tempfile.mkdtemp()
+        self.jsonl = os.path.join(self.dir, 'metrics.jsonl')
+        self.prom = os.path.join(self.dir, 'scriba.prom')
+        self.metrics = Instrumentation(jsonl_path=self.jsonl, prom_path=self.prom)
+        self.database = Database()
+        self.metrics.hook(self.database)
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def test_nested_spans(self):
+        with self.metrics.span('pass', round=1):
+            self.database.execute_sql('SELECT 1', rows=3)
+            with self.metrics.span('submitter', submitter='CBSubmitter'):
+                self.database.execute_sql('SELECT 2', rows=2)
+        # outside of any span
+        self.database.execute_sql('SELECT 3')
+
+        records = dict((r['span'], r) for r in self.metrics.drain())
+        assert_equals((records['pass']['queries'], records['pass']['rows']), (2, 5))
+        assert_equals((records['submitter']['queries'], records['submitter']['rows']), (1, 2))
+        assert_equals(records['pass']['round'], 1)
+        assert_equals(records['submitter']['submitter'], 'CBSubmitter')
+
+    def test_spans_are_per_thread(self):
+        started = threading.Event()
+        resume = threading.Event()
+
+        def worker():
+            with self.metrics.span('cb.decide', cs=1):
+                self.database.execute_sql('SELECT 1')
+                started.set()
+                resume.wait(5)
+
+        with self.metrics.span('pass'):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            started.wait(5)
+            # the queries of the worker do not count in our span, and ours not in the worker's
+            self.database.execute_sql('SELECT 2', rows=4)
+            resume.set()
+            thread.join()
+
+        records = dict((r['span'], r) for r in self.metrics.drain())
+        assert_equals((records['pass']['queries'], records['pass']['rows']), (1, 4))
+        assert_equals((records['cb.decide']['queries'], records['cb.decide']['rows']), (1, 1))
+
+    def test_adopted_spans(self):
+        def worker(parents):
+            with self.metrics.adopt(parents):
+                with self.metrics.span('cb.decide', cs=1):
+                    self.database.execute_sql('SELECT 1', rows=2)
+
+        with self.metrics.span('pass'):
+            with self.metrics.span('submitter', submitter='CBSubmitter'):
+                threads = [threading.Thread(target=worker, args=(self.metrics.current(),))
+                           for _ in range(3)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+        records = self.metrics.drain()
+        totals = dict((r['span'], (0, 0)) for r in records)
+        for r in records:
+            queries, rows = totals[r['span']]
+            totals[r['span']] = (queries + r['queries'], rows + r['rows'])
+        assert_equals(totals, {'pass': (3, 6), 'submitter': (3, 6), 'cb.decide': (3, 6)})
+
+    def test_totals_per_submitter(self):
+        for name, queries in (('POVSubmitter', 1), ('CBSubmitter', 2)):
+            with self.metrics.span('submitter', submitter=name, round=1):
+                for _ in range(queries):
+                    self.database.execute_sql('SELECT 1')
+        self.metrics.flush()
+
+        with open(self.prom) as prom:
+            lines = prom.read().splitlines()
+        assert_in('scriba_span_count{span="submitter",submitter="POVSubmitter"} 1', lines)
+        assert_in('scriba_span_queries_total{span="submitter",submitter="POVSubmitter"} 1', lines)
+        assert_in('scriba_span_queries_total{span="submitter",submitter="CBSubmitter"} 2', lines)
+
+    def test_export(self):
+        for _ in range(2):
+            with self.metrics.span('pass', round=1):
+                self.database.execute_sql('SELECT 1', rows=2)
+        self.metrics.flush()
+
+        with open(self.jsonl) as jsonl:
+            records = [json.loads(line) for line in jsonl]
+        assert_equals([(r['span'], r['round'], r['queries'], r['rows']) for r in records],
+                      [('pass', 1, 1, 2)] * 2)
+
+        with open(self.prom) as prom:
+            lines = prom.read().splitlines()
+        assert_in('# TYPE scriba_span_count counter', lines)
+        assert_in('scriba_span_count{span="pass"} 2', lines)
+        assert_in('scriba_span_queries_total{span="pass"} 2', lines)
+        assert_in('scriba_span_rows_total{span="pass"} 4', lines)
+        assert_false(any('submitter=' in line for line in lines))
+        assert_false(os.path.exists(self.prom + '.tmp'))
+
+        # records are only written once, totals keep adding up
+        with self.metrics.span('pass', round=2):
+            pass
+        self.metrics.flush()
+        with open(self.jsonl) as jsonl:
+            assert_equals(len(jsonl.readlines()), 3)
+        with open(self.prom) as prom:
+            assert_in('scriba_span_count{span="pass"} 3', prom.read().splitlines())
+
+    def test_disabled(self):
+        metrics = Instrumentation(enabled=False)
+        database = Database()
+        metrics.hook(database)
+        with metrics.span('pass') as span:
+            assert_is_none(span)
+        assert_equals(metrics.drain(), [])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import threading
+import time
+
+from nose.tools import *
+
+from scriba.log import AsyncHandler, RateLimitFilter
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self, gate=None):
+        super(ListHandler, self).__init__()
+        self.messages = []
+        self.gate = gate
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait()
+        self.messages.append(record.getMessage())
+
+
+def record(msg, *args, **kwargs):
+    return logging.makeLogRecord(dict({'name': 'scriba.test', 'levelno': logging.INFO,
+                                       'msg': msg, 'args': args}, **kwargs))
+
+
+class TestLog():
+
+    def test_async_handler_keeps_order(self):
+        target = ListHandler()
+        handler = AsyncHandler(target)
+        for i in range(100):
+            handler.handle(record("message %d", i))
+        handler.close()
+        assert_equals(target.messages, ["message %d" % i for i in range(100)])
+
+    def test_async_handler_drops_when_full(self):
+        gate = threading.Event()
+        target = ListHandler(gate)
+        handler = AsyncHandler(target, maxsize=2)
+        for i in range(10):
+            handler.handle(record("message %d", i))
+        gate.set()
+        while not handler.queue.empty():
+            time.sleep(.01)
+        handler.handle(record("last"))
+        handler.close()
+        assert_greater(handler.dropped, 0)
+        assert_in("Log queue full, dropped %d records" % handler.dropped, target.messages)
+        assert_equals(target.messages[-1], "last")
+
+    def test_rate_limit(self):
+        limit = RateLimitFilter(2, 10)
+        passed = [limit.filter(record("Checking CBS...", created=t)) for t in (0, 1, 2, 3)]
+        assert_equals(passed, [True, True, False, False])
+        assert_true(limit.filter(record("other", created=4)))
+
+        late = record("Checking CBS...", created=11)
+        assert_true(limit.filter(late))
+        assert_equals(late.getMessage(), "Checking CBS... [2 similar messages suppressed]")
+        assert_equals(limit.suppressed, 2)
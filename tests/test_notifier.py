@@ -0,0 +1,60 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import tempfile
+import threading
+import time
+
+from nose.tools import *
+
+from scriba.notifier import FileBackend, RoundNotifier
+
+
+class FakeRound(object):
+
+    def __init__(self, num, ready=True):
+        self.num = num
+        self.ready = ready
+
+    def is_ready(self):
+        return self.ready
+
+
+class TestRoundNotifier():
+
+    def setup(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def teardown(self):
+        os.unlink(self.path)
+
+    def test_ready_round_returns_immediately(self):
+        notifier = RoundNotifier(FileBackend(self.path), current_round=lambda: FakeRound(3))
+        assert_equals(notifier.wait_for_ready().num, 3)
+
+    def test_file_notification_wakes_up(self):
+        rounds = [FakeRound(1)]
+        notifier = RoundNotifier(FileBackend(self.path), current_round=lambda: rounds[-1],
+                                 min_interval=5, max_interval=5)
+
+        def new_round():
+            time.sleep(0.1)
+            rounds.append(FakeRound(2))
+            os.utime(self.path, (time.time() + 1, time.time() + 1))
+
+        threading.Thread(target=new_round).start()
+
+        start = time.time()
+        assert_equals(notifier.wait_for_ready(after=1).num, 2)
+        assert_less(time.time() - start, 1)
+
+    def test_backoff_without_notifications(self):
+        rounds = [None, FakeRound(1, ready=False), FakeRound(1)]
+        notifier = RoundNotifier(FileBackend(self.path), current_round=lambda: rounds.pop(0),
+                                 min_interval=0.01, max_interval=0.02)
+        assert_equals(notifier.wait_for_ready().num, 1)
+        assert_equals(rounds, [])
@@ -0,0 +1,210 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+
+from nose.tools import *
+
+from farnsworth.models import Team
+from farnsworth.models import Round
+from farnsworth.models import ChallengeSet as CS
+from farnsworth.models import ChallengeBinaryNode as CBN
+from farnsworth.models import ChallengeSetFielding as CSF
+from farnsworth.models import Exploit
+from farnsworth.models import ExploitSubmissionCable as ESC
+from farnsworth.models import Job
+
+from . import setup_each, teardown_each
+from scriba.snapshot import RoundSnapshot
+from scriba.submitters import pov
+from scriba.submitters.pov import POVPlanner
+from scriba.submitters.povtests import PovTestMatrix
+from scriba.submitters.ranking import ExploitCandidate, ExploitRanking
+
+FakeTeam = namedtuple('FakeTeam', ['id', 'name'])
+FakeCS = namedtuple('FakeCS', ['id', 'name'])
+FakeRound = namedtuple('FakeRound', ['num'])
+TestResult = namedtuple('TestResult', ['exploit_id'])
+
+
+class Snapshot(object):
+
+    def __init__(self, cses, opponents):
+        self.round = FakeRound(3)
+        self.num = 3
+        self.cses = cses
+        self.opponents = opponents
+
+    def fielded_in_round(self):
+        return self.cses
+
+
+class Ranking(ExploitRanking):
+    """Candidates given per CS instead of loaded."""
+
+    def __init__(self, candidates):
+        super(Ranking, self).__init__(candidates)
+        self._candidates = candidates
+
+
+class Tests(object):
+    """PovTestResults of the (CS fielding, IDS fielding) pairs."""
+
+    def __init__(self, results):
+        self.results = results
+
+    def lookup(self, cs_fielding, ids_fielding):
+        return self.results.get(cs_fielding.id)
+
+
+class AuditLog(object):
+
+    def __init__(self):
+        self.records = []
+
+    def pov(self, round_num, cs_id, team_id, reason, candidates, exploit=None):
+        self.records.append((cs_id, team_id, reason, exploit.id if exploit else None))
+
+
+class Writer(object):
+
+    def __init__(self):
+        self.cables = []
+
+    def add_exploit(self, team, cs, exploit_id, throws, cable_id=None):
+        self.cables.append((team.id, cs.id, exploit_id, throws, cable_id))
+
+
+class Deadline(object):
+    """Expires after calls checks."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def expired(self):
+        self.calls -= 1
+        return self.calls < 0
+
+
+class TestPOVPlan():
+
+    def setup(self):
+        self.teams = [FakeTeam(1, 'a'), FakeTeam(2, 'b')]
+        self.cses = [FakeCS(10, 'x'), FakeCS(20, 'y'), FakeCS(30, 'z')]
+        self.ranking = Ranking({10: [ExploitCandidate(100, 0.9), ExploitCandidate(101, 0.5)],
+                                20: [ExploitCandidate(200, 0.7)]})
+        self._audit = pov.AUDIT
+        pov.AUDIT = AuditLog()
+
+    def teardown(self):
+        pov.AUDIT = self._audit
+
+    def planner(self, **kwargs):
+        planner = POVPlanner(Snapshot(self.cses, self.teams), ranking=self.ranking,
+                             cs_ids=[10, 20], **kwargs)
+        return planner
+
+    def test_submission_matrix(self):
+        planner = self.planner(throws=5)
+        # an earlier cable of the round against team a on x is updated
+        planner.cables = {(1, 10): 1000}
+        submissions = planner.plan()
+        assert_true(planner.complete)
+        assert_equals([(s.team.id, s.cs.id, s.exploit_id, s.throws, s.cable_id)
+                       for s in submissions],
+                      [(1, 10, 100, 5, 1000), (1, 20, 200, 5, None),
+                       (2, 10, 100, 5, None), (2, 20, 200, 5, None)])
+        assert_equals(pov.AUDIT.records,
+                      [(10, 1, pov.MOST_RELIABLE, 100), (20, 1, pov.MOST_RELIABLE, 200),
+                       (10, 2, pov.MOST_RELIABLE, 100), (20, 2, pov.MOST_RELIABLE, 200)])
+
+        writer = Writer()
+        planner.write(submissions, writer=writer)
+        assert_equals(writer.cables, [(1, 10, 100, 5, 1000), (1, 20, 200, 5, None),
+                                      (2, 10, 100, 5, None), (2, 20, 200, 5, None)])
+
+    def test_no_pov(self):
+        self.ranking._candidates.pop(20)
+        submissions = self.planner().plan()
+        assert_equals([(s.team.id, s.cs.id) for s in submissions], [(1, 10), (2, 10)])
+        assert_in((20, 1, pov.NO_POV, None), pov.AUDIT.records)
+        assert_in((20, 2, pov.NO_POV, None), pov.AUDIT.records)
+
+    def test_tested_pov(self):
+        planner = self.planner(tests=Tests({7: TestResult(101)}))
+        planner.cs_fieldings = {(2, 10): pov.Fielding(7, 10), (1, 10): pov.Fielding(8, 10)}
+        submissions = planner.plan()
+        exploits = dict(((s.team.id, s.cs.id), s.exploit_id) for s in submissions)
+        # tested against the fielding of b, the most reliable otherwise
+        assert_equals(exploits, {(1, 10): 100, (2, 10): 101, (1, 20): 200, (2, 20): 200})
+        assert_in((10, 2, pov.TESTED, 101), pov.AUDIT.records)
+
+    def test_deadline(self):
+        planner = self.planner()
+        submissions = planner.plan(deadline=Deadline(1))
+        # only the first opponent was planned
+        assert_false(planner.complete)
+        assert_equals([(s.team.id, s.cs.id) for s in submissions], [(1, 10), (1, 20)])
+
+
+class TestPOVPlanner():
+
+    def setup(self):
+        setup_each()
+
+    def teardown(self):
+        teardown_each()
+
+    def test_latest_fieldings(self):
+        Team.create(name=Team.OUR_NAME)
+        other = Team.create(name='other')
+        rounds = [Round.create(num=i) for i in range(4)]
+        cs = CS.create(name='x')
+        cbn = CBN.create(cs=cs, name="unpatched", blob="XXXX")
+
+        CSF.create(cs=cs, cbns=[cbn], team=other, available_round=rounds[0])
+        csf1 = CSF.create(cs=cs, cbns=[cbn], team=other, available_round=rounds[1])
+        CSF.create(cs=cs, cbns=[cbn], team=other, submission_round=rounds[1])
+        CSF.create(cs=cs, cbns=[cbn], team=other, available_round=rounds[3])
+
+        # the fielding of round 2 is not in yet, the one of round 1 is still the latest
+        planner = POVPlanner(RoundSnapshot(rounds[2]), tests=PovTestMatrix(), cs_ids=[cs.id])
+        planner.load()
+        assert_equals(planner.cs_fieldings[(other.id, cs.id)].id, csf1.id)
+        assert_equals(planner.cs_fieldings[(other.id, cs.id)].cs_id, cs.id)
+
+    def test_fieldings_only_for_team_specific_pov(self):
+        Team.create(name=Team.OUR_NAME)
+        other = Team.create(name='other')
+        r0 = Round.create(num=0)
+        cs = CS.create(name='x')
+        cbn = CBN.create(cs=cs, name="unpatched", blob="XXXX")
+        CSF.create(cs=cs, cbns=[cbn], team=other, available_round=r0)
+
+        planner = POVPlanner(RoundSnapshot(r0), cs_ids=[cs.id]).load()
+        assert_equals(planner.cs_fieldings, {})
+
+    def test_plan_and_write(self):
+        Team.create(name=Team.OUR_NAME)
+        teams = [Team.create(name='a'), Team.create(name='b')]
+        r0 = Round.create(num=0)
+        cs = CS.create(name='x')
+        cbn = CBN.create(cs=cs, name="unpatched", blob="XXXX")
+        CSF.create(cs=cs, cbns=[cbn], team=teams[0], available_round=r0)
+        job = Job.create(cs=cs, worker='rex')
+        low, high = [Exploit.create(cs=cs, job=job, pov_type='type1', method='rop', blob=b'Z',
+                                    c_code='', reliability=r) for r in (0.5, 0.9)]
+        existing = ESC.create(team=teams[0], cs=cs, exploit=low, throws=10, round=r0)
+
+        snapshot = RoundSnapshot(r0)
+        snapshot.fielded_in_round = lambda: [cs]
+        planner = POVPlanner(snapshot, cs_ids=[cs.id]).load()
+        planner.write(planner.plan())
+
+        cables = list(ESC.select().where(ESC.round == r0).order_by(ESC.id))
+        # the cable against a is updated, the one against b is created
+        assert_equals([(c.id, c.team.id, c.exploit.id) for c in cables],
+                      [(existing.id, teams[0].id, high.id),
+                       (cables[1].id, teams[1].id, high.id)])
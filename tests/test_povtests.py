@@ -0,0 +1,44 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+
+from nose.tools import *
+
+from scriba.submitters.povtests import PovTestMatrix
+
+Fielding = namedtuple('Fielding', ['id', 'cs_id'])
+
+
+class TestPovTestMatrix():
+
+    def setup(self):
+        self.matrix = PovTestMatrix()
+        # id, exploit, CS fielding, IDS fielding, successes, CS
+        self.matrix._merge([
+            (1, 100, 10, 20, 3, 1),
+            (2, 101, 10, 20, 5, 1),
+            (3, 102, 10, 21, 7, 1),
+            (4, 103, 11, None, 0, 1),
+            (5, 104, 12, 22, 1, 2),
+        ])
+
+    def test_fallback_chain(self):
+        assert_equals(self.matrix.lookup(Fielding(10, 1), Fielding(20, 1)).exploit_id, 101)
+        # no result against this IDS fielding, best against the CS fielding
+        assert_equals(self.matrix.lookup(Fielding(10, 1), Fielding(29, 1)).exploit_id, 102)
+        # no result against this CS fielding, best against the CS
+        assert_equals(self.matrix.lookup(Fielding(13, 1), None).exploit_id, 102)
+        assert_is_none(self.matrix.lookup(Fielding(14, 3), None))
+
+    def test_never_succeeded(self):
+        assert_is_none(self.matrix.lookup(Fielding(11, 1), None))
+
+    def test_incremental_merge(self):
+        self.matrix._merge([(6, 105, 10, 20, 9, 1), (7, 106, 12, 22, 1, 2)])
+        assert_equals(self.matrix.lookup(Fielding(10, 1), Fielding(20, 1)).exploit_id, 105)
+        # ties go to the oldest result
+        assert_equals(self.matrix.lookup(Fielding(12, 2), Fielding(22, 2)).exploit_id, 104)
+        assert_equals(self.matrix._high_water, 7)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from nose.tools import *
+
+from farnsworth.models import ChallengeSet as CS
+from farnsworth.models import Exploit
+from farnsworth.models import Job
+
+from . import setup_each, teardown_each
+from scriba.submitters.ranking import ExploitCandidate, ExploitRanking
+
+
+class TeamRanking(ExploitRanking):
+    """Least reliable first against team 2."""
+
+    def rank_for_team(self, cs_id, team_id, candidates):
+        if team_id == 2:
+            return list(reversed(candidates))
+        return candidates
+
+
+class TestExploitRanking():
+
+    def setup(self):
+        setup_each()
+        self.cs = CS.create(name='x')
+        self.other = CS.create(name='y')
+        self.empty = CS.create(name='z')
+        self.job = Job.create(cs=self.cs, worker='rex')
+
+    def teardown(self):
+        teardown_each()
+
+    def exploit(self, cs, reliability):
+        return Exploit.create(cs=cs, job=self.job, pov_type='type1', method='rop',
+                              blob=b'Z', c_code='', reliability=reliability)
+
+    def test_most_reliable_first(self):
+        low = self.exploit(self.cs, 0.2)
+        high = self.exploit(self.cs, 0.9)
+        tie = self.exploit(self.cs, 0.9)
+        other = self.exploit(self.other, 0.5)
+
+        ranking = ExploitRanking([self.cs.id, self.other.id]).load()
+        # ties are broken by id, the oldest exploit first
+        assert_equals(ranking.ranked(self.cs.id),
+                      [ExploitCandidate(high.id, 0.9), ExploitCandidate(tie.id, 0.9),
+                       ExploitCandidate(low.id, 0.2)])
+        assert_equals(ranking.best(self.cs.id), ExploitCandidate(high.id, 0.9))
+        assert_equals(ranking.best(self.other.id, team_id=1), ExploitCandidate(other.id, 0.5))
+
+    def test_cs_without_exploits(self):
+        self.exploit(self.cs, 0.5)
+        ranking = ExploitRanking([self.cs.id, self.empty.id]).load()
+        assert_equals(ranking.ranked(self.empty.id), [])
+        assert_is_none(ranking.best(self.empty.id))
+        assert_is_none(ranking.best(self.empty.id, team_id=1))
+
+        # CSes that were not loaded have no candidates either
+        assert_is_none(ranking.best(self.other.id))
+        assert_equals(ExploitRanking([]).load().ranked(self.cs.id), [])
+
+    def test_rank_for_team(self):
+        low = self.exploit(self.cs, 0.2)
+        high = self.exploit(self.cs, 0.9)
+
+        ranking = TeamRanking([self.cs.id]).load()
+        assert_equals(ranking.best(self.cs.id, team_id=1).id, high.id)
+        assert_equals(ranking.best(self.cs.id, team_id=2).id, low.id)
+        # without a team, the shared ranking
+        assert_equals(ranking.best(self.cs.id).id, high.id)
+        # the shared ranking is left as it is
+        assert_equals([c.id for c in ranking.ranked(self.cs.id)], [high.id, low.id])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from nose.tools import *
+
+from scriba.submitters.rotation import FileRotation, MemoryRotation
+
+ORDER = ['a', 'b', 'c']
+
+
+class TestRotation():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'rotation.json')
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def rotate(self, store):
+        picked = {}
+        for _ in ORDER:
+            for cs in ('x', 'y'):
+                picked.setdefault(cs, []).append(store.advance(cs, ORDER))
+        return picked
+
+    def test_memory(self):
+        assert_equals(self.rotate(MemoryRotation(ORDER)),
+                      {'x': ['a', 'b', 'c'], 'y': ['b', 'c', 'a']})
+
+    def test_unavailable_patch_types_are_skipped(self):
+        store = MemoryRotation(ORDER)
+        assert_equals(store.advance('x', ['b']), 'b')
+        assert_equals(store.advance('x', ['b']), None)
+        assert_equals(store.advance('x', ['a', 'c']), 'a')
+
+    def test_file_survives_restarts(self):
+        picked = {}
+        for _ in ORDER:
+            for cs in ('x', 'y'):
+                # a new store every time, as a restarted or another process would
+                picked.setdefault(cs, []).append(FileRotation(self.path, ORDER).advance(cs, ORDER))
+        assert_equals(picked, self.rotate(MemoryRotation(ORDER)))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from nose.tools import *
+
+import scriba.scheduler
+from scriba.scheduler import RoundScheduler
+
+from .test_executor import EXPLOITS, FEEDBACK, CBSubmitter, POVSubmitter
+
+
+class TestRoundScheduler():
+
+    def setup(self):
+        # highest ids, and full marks of the models
+        self.ids = {EXPLOITS: 1, FEEDBACK: 1}
+        self.full = {EXPLOITS: (1, 1), FEEDBACK: (1, 1)}
+        self.queries = []
+        self._watermarks = scriba.scheduler.watermarks
+        scriba.scheduler.watermarks = self.watermarks
+
+    def teardown(self):
+        scriba.scheduler.watermarks = self._watermarks
+
+    def watermarks(self, specs):
+        specs = list(specs)
+        self.queries.append(specs)
+        return dict((s, self.ids[s[0]] if isinstance(s, tuple) else self.full[s])
+                    for s in specs)
+
+    def run_all(self, scheduler, round_num):
+        due = scheduler.due([self.pov, self.cb], round_num)
+        for submitter, token in due:
+            scheduler.done(submitter, round_num, token)
+        return [s for s, _ in due]
+
+    def test_full_marks_are_throttled(self):
+        self.pov, self.cb = POVSubmitter(), CBSubmitter()
+        scheduler = RoundScheduler(policy='on-change', recheck=3600)
+        assert_equals(self.run_all(scheduler, 1), [self.pov, self.cb])
+        assert_equals(len(self.queries[0]), 4)
+
+        # only the indexed highest ids are read until the next full check
+        assert_equals(self.run_all(scheduler, 1), [])
+        assert_true(all(isinstance(s, tuple) for s in self.queries[-1]))
+
+        # a new row shows right away
+        self.ids[EXPLOITS] = 2
+        assert_equals(self.run_all(scheduler, 1), [self.pov])
+
+        # an in-place update only shows on the next full check
+        self.full[FEEDBACK] = (1, 2)
+        assert_equals(self.run_all(scheduler, 1), [])
+        scheduler.recheck = 0
+        assert_equals(self.run_all(scheduler, 1), [self.cb])
+        assert_equals(len(self.queries[-1]), 4)
+
+    def test_other_policies_read_nothing(self):
+        self.pov, self.cb = POVSubmitter(), CBSubmitter()
+        scheduler = RoundScheduler(policy='once')
+        assert_equals(self.run_all(scheduler, 1), [self.pov, self.cb])
+        assert_equals(self.run_all(scheduler, 1), [])
+        assert_equals(self.queries, [])
@@ -0,0 +1,90 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from nose.tools import *
+
+import scriba.submitters.scores
+from farnsworth.models import ChallengeSetFielding
+
+from scriba.submitters.scores import ScoreCache
+
+
+class CBN(object):
+    """Counts how often its scores are computed."""
+
+    def __init__(self, id_, cs_id, polls):
+        self.id = id_
+        self.cs_id = cs_id
+        self.poll_feedbacks = polls
+        self.computed = 0
+
+    @property
+    def min_cb_score(self):
+        self.computed += 1
+        return min(self.poll_feedbacks) if self.poll_feedbacks else None
+
+    @property
+    def estimated_cb_score(self):
+        self.computed += 1
+        return 0.5
+
+
+class TestScoreCache():
+
+    def test_scores_are_computed_once(self):
+        scores = ScoreCache()
+        cbn = CBN(1, 1, [0.9, 0.8])
+        assert_equals(scores.cb_score(cbn), 0.8)
+        assert_equals(scores.cb_score(cbn), 0.8)
+        assert_equals(cbn.computed, 1)
+
+        unpolled = CBN(2, 1, [])
+        assert_equals(scores.cb_score(unpolled), 0.5)
+
+    def test_dirty_cses_are_forgotten(self):
+        scores = ScoreCache()
+        cbns = [CBN(1, 1, [0.9]), CBN(2, 2, [0.7])]
+        for cbn in cbns:
+            scores.min_cb_score(cbn)
+
+        # a PollFeedback row of CS 1 arrives
+        scores._marks = {m: 1 for m in ScoreCache.SPECS}
+        scores._dirty = lambda spec, old, new: set([1])
+        watermarks = scriba.submitters.scores.watermarks
+        scriba.submitters.scores.watermarks = lambda specs: {m: 2 for m in specs}
+        try:
+            scores.refresh()
+        finally:
+            scriba.submitters.scores.watermarks = watermarks
+
+        cbns[0].poll_feedbacks = [0.6]
+        assert_equals(scores.min_cb_score(cbns[0]), 0.6)
+        assert_equals(scores.min_cb_score(cbns[1]), 0.7)
+        assert_equals(cbns[1].computed, 1)
+
+    def test_fieldings_dirty_their_cs(self):
+        scores = ScoreCache()
+        cbn = CBN(1, 1, [])
+        assert_is_none(scores.min_cb_score(cbn))
+
+        # the poll feedback of CS 1 is linked to its fielding, no other mark moves
+        spec = (ChallengeSetFielding, ChallengeSetFielding.updated_at)
+        assert_in(spec, ScoreCache.SPECS)
+        marks = {m: 1 for m in ScoreCache.SPECS}
+        scores._marks = dict(marks)
+        marks[spec] = 2
+        seen = []
+        scores._dirty = lambda spec, old, new: seen.append((spec, old, new)) or set([1])
+        watermarks = scriba.submitters.scores.watermarks
+        scriba.submitters.scores.watermarks = lambda specs: marks
+        try:
+            scores.refresh()
+        finally:
+            scriba.submitters.scores.watermarks = watermarks
+
+        assert_equals(seen, [(spec, 1, 2)])
+        cbn.poll_feedbacks = [0.6]
+        assert_equals(scores.min_cb_score(cbn), 0.6)
+        assert_equals(cbn.computed, 2)
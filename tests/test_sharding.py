@@ -0,0 +1,115 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import shutil
+import tempfile
+
+from nose.tools import *
+
+from scriba.sharding import FileLeases, PostgresLeases, ShardRouter
+
+CS_IDS = range(1, 101)
+
+
+class TestSharding():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.routers = []
+
+    def teardown(self):
+        for router in self.routers:
+            router.close()
+        shutil.rmtree(self.tmpdir)
+
+    def router(self):
+        router = ShardRouter(FileLeases(self.tmpdir), slots=4).join()
+        self.routers.append(router)
+        return router
+
+    def test_members_split_the_cses(self):
+        a, b = self.router(), self.router()
+        assert_equals((a.slot, b.slot), (0, 1))
+        owned_a, owned_b = a.owned(CS_IDS), b.owned(CS_IDS)
+        assert_equals(owned_a & owned_b, set())
+        assert_equals(owned_a | owned_b, set(CS_IDS))
+        assert_true(owned_a and owned_b)
+
+    def test_rebalance_when_a_member_dies(self):
+        a, b = self.router(), self.router()
+        owned_a = a.owned(CS_IDS)
+        assert_false(a.rebalanced())
+
+        b.close()
+        assert_true(a.rebalanced())
+        assert_equals(a.owned(CS_IDS), set(CS_IDS))
+
+        c = self.router()
+        assert_equals(c.slot, 1)
+        assert_equals(a.owned(CS_IDS), owned_a)
+
+    def test_claimed_cses_are_skipped_by_others(self):
+        a, b = self.router(), self.router()
+        with a.claim(CS_IDS) as claimed_a:
+            # b still believes it is alone
+            b.leases.members = lambda: [b.slot]
+            with b.claim(CS_IDS) as claimed_b:
+                assert_equals(claimed_a & claimed_b, frozenset())
+                assert_equals(claimed_a | claimed_b, frozenset(CS_IDS))
+            assert_true(b.rebalanced())
+
+    def test_cses_taken_back_are_gained(self):
+        a, b = self.router(), self.router()
+        with a.claim(CS_IDS) as first:
+            assert_equals(a.gained, frozenset())
+        moved = set(CS_IDS) - first
+
+        # b dies, its CSes move to a
+        b.close()
+        with a.claim(CS_IDS) as claimed:
+            assert_equals(claimed, frozenset(CS_IDS))
+            assert_equals(a.gained, moved)
+
+        # b comes back, and leaves again: the CSes of b are new to a again
+        c = self.router()
+        with a.claim(CS_IDS) as claimed:
+            assert_equals(claimed, first)
+            assert_equals(a.gained, frozenset())
+        c.close()
+        with a.claim(CS_IDS):
+            assert_equals(a.gained, moved)
+
+        with a.claim(CS_IDS):
+            assert_equals(a.gained, frozenset())
+
+
+class TestPostgresLeases():
+
+    def setup(self):
+        self.leases = [PostgresLeases(namespace=0x7e57) for _ in range(2)]
+
+    def teardown(self):
+        for leases in self.leases:
+            leases.close()
+
+    def test_leases(self):
+        a, b = self.leases
+        assert_true(a.try_lock('member', 0))
+        assert_false(b.try_lock('member', 0))
+        assert_true(b.try_lock('member', 1))
+        assert_equals(a.members(), [0, 1])
+
+        # CS leases are apart from the membership ones
+        assert_true(a.try_lock('cs', 1))
+        assert_false(b.try_lock('cs', 1))
+        assert_equals(b.members(), [0, 1])
+
+        a.unlock('cs', 1)
+        assert_true(b.try_lock('cs', 1))
+
+        # and everything goes away with the connection
+        a.close()
+        assert_equals(b.members(), [1])
+        assert_true(b.try_lock('member', 0))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from nose.tools import *
+
+from scriba.simulator import History, PatchTypeHistory, Thresholds, grid, simulate
+
+THRESHOLDS = Thresholds(min_cb_score=0.8, local_cb_score_threshold=0.85, min_rounds_online=1)
+
+
+def history(observed=None, failed_polls=False):
+    """One CS fielded in rounds 0 to 5, one patch type ready from round 1."""
+    return History(rounds={1: list(range(6))},
+                   patches={1: {7: PatchTypeHistory('pt', 0.2, 1, 0.9, failed_polls,
+                                                    observed or {})}})
+
+
+class TestSimulator():
+
+    def test_score(self):
+        h = history({3: 0.5, 4: 0.7})
+        assert_equals(h.score(1, None, 3), 1.)
+        assert_equals(h.score(1, 7, 3), 0.5)
+        assert_almost_equal(h.score(1, 7, 5), 0.6)
+        assert_equals(history().score(1, 7, 5), 0.9)
+
+    def test_patch_and_keep_it(self):
+        for strategy in ('simple', 'scored'):
+            p = simulate(history(), strategy, THRESHOLDS)
+            # patched in round 1, down in round 2, then scoring its estimate
+            assert_equals(p.submissions, 1)
+            assert_almost_equal(p.availability, (1 + 1 + 0 + 0.9 * 3) / 6)
+            assert_almost_equal(p.security, 0.8 * 4 / 6)
+
+    def test_pull_back_bad_patch(self):
+        for strategy in ('simple', 'scored'):
+            p = simulate(history({3: 0.5}), strategy, THRESHOLDS)
+            # the patch scores 0.5 in round 3, the original is back in round 4, down
+            assert_equals(p.submissions, 2)
+            assert_almost_equal(p.availability, (1 + 1 + 0 + 0.5 + 0 + 1) / 6)
+            assert_almost_equal(p.security, 0.8 * 2 / 6)
+
+    def test_failed_polls_are_blacklisted(self):
+        p = simulate(history(failed_polls=True), 'scored', THRESHOLDS)
+        assert_equals(p.submissions, 0)
+        assert_equals(simulate(history(failed_polls=True), 'simple', THRESHOLDS).submissions, 1)
+
+    def test_fresh_patch_is_left_in(self):
+        h = History(rounds={1: list(range(8))},
+                    patches={1: {7: PatchTypeHistory('a', 0.2, 1, 0.9, False, {}),
+                                 8: PatchTypeHistory('b', 0.2, 4, 0.95, False, {})}})
+        # a is submitted in round 1 and fielded from round 2, b scores
+        # better from round 4 on, and replaces a once a was fielded more
+        # than min_rounds_online times
+        assert_equals(simulate(h, 'scored', THRESHOLDS._replace(min_rounds_online=2)).submissions, 2)
+        assert_equals(simulate(h, 'scored', THRESHOLDS._replace(min_rounds_online=5)).submissions, 2)
+        assert_equals(simulate(h, 'scored', THRESHOLDS._replace(min_rounds_online=6)).submissions, 1)
+
+    def test_unused_axes_are_collapsed(self):
+        values = {'min_cb_score': [0.8, 0.9],
+                  'local_cb_score_threshold': [0.85, 0.9],
+                  'min_rounds_online': [1, 2]}
+        assert_equals(grid('simple', values), [Thresholds(0.8, 0.85, 1), Thresholds(0.9, 0.85, 1)])
+        assert_equals(len(grid('scored', values)), 8)
+
+    def test_empty_history(self):
+        p = simulate(History(), 'scored', THRESHOLDS)
+        assert_equals((p.availability, p.security, p.submissions), (0., 0., 0))
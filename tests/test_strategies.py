@@ -0,0 +1,67 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+
+from nose.tools import *
+
+from scriba.submitters import cb, decision, strategies
+
+CBN = namedtuple('CBN', ['name', 'sha256'])
+CS = namedtuple('CS', ['id', 'name'])
+Round = namedtuple('Round', ['num'])
+Team = namedtuple('Team', ['id'])
+Snapshot = namedtuple('Snapshot', ['round', 'our_team'])
+
+
+class AuditLog(object):
+
+    def __init__(self):
+        self.records = []
+
+    def cb(self, *args):
+        self.records.append(args)
+
+
+class TestStrategies():
+
+    def test_register(self):
+        @strategies.register('test')
+        class TestStrategy(strategies.Strategy):
+            def decide(self, target_cs, snapshot):
+                return None
+
+        try:
+            assert_equals(TestStrategy.name, 'test')
+            assert_is_instance(strategies.get('test'), TestStrategy)
+        finally:
+            del strategies.STRATEGIES['test']
+        assert_raises(ValueError, strategies.get, 'test')
+
+    def test_same_decision(self):
+        a, b = CBN('a', 'aa'), CBN('b', 'bb')
+        assert_true(strategies.same_decision(None, None))
+        assert_false(strategies.same_decision(None, [a]))
+        assert_false(strategies.same_decision([a], None))
+        assert_true(strategies.same_decision([a, b], [CBN('b2', 'bb'), CBN('a2', 'aa')]))
+        assert_false(strategies.same_decision([a, b], [a]))
+
+    def test_shadow_mode(self):
+        assert_false(strategies.get('simple').shadow)
+        assert_true(strategies.get('simple', shadow=True).shadow)
+
+    def test_shadow_decisions_are_not_audited(self):
+        features = decision.DEFAULT_FEATURES._replace(current_is_original=False)
+        simple_features, audit = cb.CBSubmitter.simple_features, cb.AUDIT
+        cb.CBSubmitter.simple_features = staticmethod(lambda cs, round_, snapshot: (features, {}))
+        cb.AUDIT = AuditLog()
+        try:
+            snapshot = Snapshot(Round(3), Team(1))
+            assert_is_none(strategies.get('simple', shadow=True).decide(CS(10, 'x'), snapshot))
+            assert_equals(cb.AUDIT.records, [])
+            assert_is_none(strategies.get('simple').decide(CS(10, 'x'), snapshot))
+            assert_equals(len(cb.AUDIT.records), 1)
+        finally:
+            cb.CBSubmitter.simple_features, cb.AUDIT = simple_features, audit
@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from datetime import datetime, timedelta
+
+from nose.tools import *
+
+from farnsworth.models import Team
+from farnsworth.models import Round
+from farnsworth.models import ChallengeSet as CS
+from farnsworth.models import Exploit
+from farnsworth.models import ExploitSubmissionCable as ESC
+from farnsworth.models import Job
+
+from . import setup_each, teardown_each
+from scriba.submitters.timeline import ExploitTimeline
+
+T0 = datetime(2016, 8, 5, 12, 0, 0)
+
+
+def exists(cs, where):
+    """The exists() queries the timeline replaced."""
+    return ESC.select().join(Exploit).where(
+        (ESC.cs == cs) & (ESC.processed_at != None) & (Exploit.method != "backdoor") & where
+    ).exists()
+
+
+class TestExploitTimeline():
+
+    def setup(self):
+        setup_each()
+        self.team = Team.create(name='other')
+        self.round = Round.create(num=0)
+        self.cs = CS.create(name='x')
+        self.other = CS.create(name='y')
+        self.job = Job.create(cs=self.cs, worker='rex')
+
+    def teardown(self):
+        teardown_each()
+
+    def cable(self, cs, processed_at, method='rop'):
+        exploit = Exploit.create(cs=cs, job=self.job, pov_type='type1', method=method,
+                                 blob=b'Z', c_code='', reliability=0.5)
+        return ESC.create(team=self.team, cs=cs, exploit=exploit, throws=10, round=self.round,
+                          processed_at=processed_at)
+
+    def test_same_as_exists(self):
+        self.cable(self.cs, T0)
+        self.cable(self.cs, T0 + timedelta(seconds=30))
+        self.cable(self.cs, None)
+        timeline = ExploitTimeline().load()
+
+        for cs in (self.cs, self.other):
+            for seconds in (-1, 0, 1, 30, 31):
+                when = T0 + timedelta(seconds=seconds)
+                assert_equals(timeline.first_found_since(cs.id, when),
+                              exists(cs, ESC.processed_at >= when) and
+                              not exists(cs, ESC.processed_at < when))
+                assert_equals(timeline.exploited_by(cs.id, when),
+                              exists(cs, ESC.processed_at <= when))
+
+        # at the boundary, both hold
+        assert_true(timeline.first_found_since(self.cs.id, T0))
+        assert_true(timeline.exploited_by(self.cs.id, T0))
+
+    def test_backdoors_do_not_count(self):
+        self.cable(self.cs, T0, method='backdoor')
+        self.cable(self.cs, T0 + timedelta(seconds=10))
+        self.cable(self.other, T0, method='backdoor')
+        timeline = ExploitTimeline().load()
+        assert_equals(timeline.first_processed(self.cs.id), T0 + timedelta(seconds=10))
+        assert_is_none(timeline.first_processed(self.other.id))
+
+    def test_refresh(self):
+        self.cable(self.cs, T0)
+        timeline = ExploitTimeline().load()
+        assert_is_none(timeline.first_processed(self.other.id))
+
+        self.cable(self.other, T0 + timedelta(seconds=10))
+        self.cable(self.cs, T0 + timedelta(seconds=20))
+        timeline.refresh()
+        assert_equals(timeline.first_processed(self.cs.id), T0)
+        assert_equals(timeline.first_processed(self.other.id), T0 + timedelta(seconds=10))
+
+    def test_late_cables(self):
+        self.cable(self.cs, T0 + ExploitTimeline.GRACE * 2)
+        timeline = ExploitTimeline().load()
+
+        # committed after a cable processed later, within the grace period
+        late = T0 + ExploitTimeline.GRACE + timedelta(seconds=1)
+        self.cable(self.other, late)
+        assert_equals(timeline.refresh().first_processed(self.other.id), late)
+
+        # too late for refresh(), only load() sees it
+        self.cable(self.cs, T0)
+        assert_equals(timeline.refresh().first_processed(self.cs.id),
+                      T0 + ExploitTimeline.GRACE * 2)
+        assert_equals(timeline.load().first_processed(self.cs.id), T0)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from datetime import datetime
+
+from nose.tools import *
+
+from scriba.watermarks import aggregates, watermarks
+
+
+class Field(object):
+
+    def __init__(self, db_column):
+        self.db_column = db_column
+
+
+def model(name, *columns):
+    fields = dict((c, Field(c)) for c in columns)
+
+    class Meta(object):
+        db_table = name
+        primary_key = fields['id']
+    Meta.fields = fields
+    return type(str(name), (object,), {'_meta': Meta})
+
+
+class Database(object):
+    """Answers every SELECT with row, and remembers it."""
+
+    def __init__(self, row):
+        self.row = row
+        self.sql = None
+
+    def execute_sql(self, sql):
+        self.sql = sql
+        return self
+
+    def fetchone(self):
+        return self.row
+
+
+class TestWatermarks():
+
+    def setup(self):
+        self.updated = model('exploit', 'id', 'updated_at', 'processed_at')
+        self.insert_only = model('round', 'id')
+
+    def test_aggregates(self):
+        fields = self.updated._meta.fields
+        assert_equals(aggregates(self.updated),
+                      [('COUNT', fields['id']), ('MAX', fields['id']), ('MAX', fields['updated_at'])])
+        # no updated_at: only inserts and deletes move the mark
+        assert_equals([f for f, _ in aggregates(self.insert_only)], ['COUNT', 'MAX'])
+
+    def test_watermarks(self):
+        now = datetime(2016, 8, 5)
+        pair = (self.updated, self.updated._meta.fields['processed_at'])
+        database = Database((3, 7, now, now, 2, 2))
+        marks = watermarks([self.updated, pair, self.insert_only], database=database)
+        assert_equals(marks, {self.updated: (3, 7, now), pair: now, self.insert_only: (2, 2)})
+        assert_equals(database.sql,
+                      'SELECT (SELECT count("id") FROM "exploit"), (SELECT max("id") FROM "exploit"), '
+                      '(SELECT max("updated_at") FROM "exploit"), '
+                      '(SELECT max("processed_at") FROM "exploit"), '
+                      '(SELECT count("id") FROM "round"), (SELECT max("id") FROM "round")')
+
+    def test_no_specs(self):
+        assert_equals(watermarks([], database=None), {})